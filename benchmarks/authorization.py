@@ -0,0 +1,101 @@
+# Per-request cost of facility/patient authorization. Compares resolving a
+# staff user's permissions on every request (what enforcing them without a
+# cache costs) with reading them from the principal cache, and times patient
+# reads in a scoped session against unscoped ones and against filtering with
+# joins to the assignment tables on every query.
+#
+#   DATABASE_URL=... python -m benchmarks.authorization --facilities 20 --patients 500
+import argparse
+import asyncio
+from datetime import date, datetime
+from sqlalchemy import exists, insert, or_, select
+
+from postgre_app import authorization, charts, crud, models, principals
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+async def seed(facilities: int, patients: int) -> tuple[str, list]:
+    stamp = f"{datetime.now().timestamp():.0f}"
+    now = datetime.now()
+    async with engine.begin() as conn:
+        users = [{"username": f"bench_authz_{stamp}_{n}", "user_first_name": "Bench", "user_last_name": f"Authz{n}",
+                  "user_date_of_birth": date(1970, 1, 1), "user_date_created": now,
+                  "facility_id": f"BENCH-AUTHZ-{stamp}-{n % (facilities + 1)}", "is_active": True, "hashed_password": "x"}
+                 for n in range(patients + 1)]
+        result = await conn.execute(insert(models.User).returning(models.User.user_id, sort_by_parameter_order=True), users)
+        staff_id, *patient_ids = result.scalars().all()
+        await conn.execute(insert(models.Nonpatient), {"user_id": staff_id, "nonpatient_organization": "Bench"})
+        await conn.execute(insert(models.UserAuthorizedFacility), [
+            {"user_id": staff_id, "facility_id": f"BENCH-AUTHZ-{stamp}-{n}"} for n in range(1, facilities + 1)])
+        await conn.execute(insert(models.PhysicianAssignedPatient), [
+            {"staff_user_id": staff_id, "patient_user_id": patient_id} for patient_id in patient_ids])
+        result = await conn.execute(
+            insert(models.MedicalRecord).returning(models.MedicalRecord.medical_record_id, sort_by_parameter_order=True), [
+                {"user_id": patient_id, "patient_condition": "admitted", "medical_record_created": now,
+                 "is_active": True, "blood_transfusion_status": "none"}
+                for patient_id in patient_ids])
+        record_ids = result.scalars().all()
+    return users[0]["username"], record_ids
+
+# The uncached alternative: the same record read, filtered with EXISTS
+# subqueries against the assignment tables on every request.
+def joined_record_query(staff_id: int, medical_record_id: int):
+    record, user = models.MedicalRecord, models.User
+    facility, assignment = models.UserAuthorizedFacility, models.PhysicianAssignedPatient
+    return charts.record_query(medical_record_id).join(user, user.user_id == record.user_id).where(or_(
+        user.facility_id == select(models.User.facility_id).where(models.User.user_id == staff_id).scalar_subquery(),
+        exists().where(facility.user_id == staff_id, facility.facility_id == user.facility_id),
+        exists().where(assignment.staff_user_id == staff_id, assignment.patient_user_id == record.user_id),
+    ))
+
+async def timed(samples: list, operation):
+    with Timer() as timer:
+        result = await operation()
+    samples.append(timer.elapsed)
+    return result
+
+async def main(facilities: int, patients: int, repeat: int):
+    username, record_ids = await seed(facilities, patients)
+    async with SessionLocal() as db:
+        user = await crud.get_user_by_username(db, username)
+        permissions = await authorization.load_permissions(db, user)
+    principals.cache.put(principals.Principal.from_user(user, *permissions))
+
+    samples = {name: [] for name in ("resolve_uncached", "resolve_cached", "record_unscoped", "record_scoped",
+                                     "record_joined", "user_page_unscoped", "user_page_scoped")}
+    for n in range(repeat):
+        medical_record_id = record_ids[n % len(record_ids)]
+        async with SessionLocal() as db:
+            async def resolve():
+                staff = await crud.get_user_by_username(db, username)
+                return await authorization.load_permissions(db, staff)
+            await timed(samples["resolve_uncached"], resolve)
+        with Timer() as timer:
+            principal = principals.cache.get(username)
+        samples["resolve_cached"].append(timer.elapsed)
+        async with SessionLocal() as db:
+            await timed(samples["record_unscoped"], lambda: db.execute(charts.record_query(medical_record_id)))
+            await timed(samples["user_page_unscoped"], lambda: crud.get_users_page(db, limit=50))
+        async with SessionLocal() as db:
+            authorization.scope(db, principal)
+            await timed(samples["record_scoped"], lambda: db.execute(charts.record_query(medical_record_id)))
+            await timed(samples["user_page_scoped"], lambda: crud.get_users_page(db, limit=50))
+        async with SessionLocal() as db:
+            await timed(samples["record_joined"],
+                        lambda: db.execute(joined_record_query(principal.user_id, medical_record_id)))
+    await engine.dispose()
+    report({
+        "authorized_facilities": facilities,
+        "assigned_patients": patients,
+        "repeat": repeat,
+        **{name: summarize(values) for name, values in samples.items()},
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--facilities", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.facilities, args.patients, args.repeat))
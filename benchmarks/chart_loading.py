@@ -0,0 +1,99 @@
+# Load one synthetic chart with thousands of child rows through the chart
+# loader and through a nested selectinload chain, reporting statements issued,
+# load latency and schemas.MedicalRecord serialization time for each.
+#
+#   DATABASE_URL=... python -m benchmarks.chart_loading --child-rows 5000
+import argparse
+import asyncio
+from datetime import date, datetime
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+
+from postgre_app import charts, crud, models, schemas
+from postgre_app.database import SessionLocal, engine
+
+from .common import QueryCounter, Timer, report, summarize, synthetic_row
+
+COMPLAINTS = 20
+
+async def seed_chart(child_rows: int) -> int:
+    async with SessionLocal() as db:
+        user = models.User(
+            username=f"bench_chart_{datetime.now().timestamp()}", user_first_name="Bench",
+            user_last_name="Chart", user_date_of_birth=date(1970, 1, 1), user_date_created=datetime.now(),
+            facility_id="BENCH", is_active=True, hashed_password="x")
+        db.add(user)
+        await db.flush()
+        record = models.MedicalRecord(
+            user_id=user.user_id, patient_condition="stable", medical_record_created=datetime.now(),
+            is_active=True, blood_transfusion_status="none")
+        db.add(record)
+        await db.flush()
+        complaint_ids = []
+        for n in range(COMPLAINTS):
+            complaint = models.ChiefComplaint(
+                medical_record_id=record.medical_record_id,
+                chief_complaint_statement=f"complaint {n}", chief_complaint_date=datetime.now())
+            db.add(complaint)
+            await db.flush()
+            complaint_ids.append(complaint.chief_complaint_id)
+        tables = [table for table in charts.CHART_TABLES if table is not models.ChiefComplaint]
+        per_table = child_rows // len(tables)
+        for table in tables:
+            fixed = {"medical_record_id": record.medical_record_id}
+            rows = []
+            for n in range(per_table):
+                if "chief_complaint_id" in table.__table__.columns:
+                    fixed["chief_complaint_id"] = complaint_ids[n % COMPLAINTS]
+                rows.append(synthetic_row(table, n, **fixed))
+            await db.execute(insert(table), rows)
+        await db.commit()
+        return record.medical_record_id
+
+# The straightforward alternative: one selectinload per relationship on the
+# record and again per relationship on its chief complaints.
+def nested_selectin_query(medical_record_id: int):
+    options = [selectinload(getattr(models.MedicalRecord, key)) for key in charts.RECORD_RELATIONSHIPS]
+    options += [
+        selectinload(models.MedicalRecord.chief_complaints).selectinload(getattr(models.ChiefComplaint, key))
+        for key in charts.COMPLAINT_RELATIONSHIPS
+    ]
+    return select(models.MedicalRecord).options(*options).where(
+        models.MedicalRecord.medical_record_id == medical_record_id)
+
+async def measure(load, repeat: int) -> dict:
+    load_samples, serialize_samples, queries = [], [], 0
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            with QueryCounter(engine) as counter, Timer() as timer:
+                record = await load(db)
+            load_samples.append(timer.elapsed)
+            queries = counter.count
+            with Timer() as timer:
+                schemas.MedicalRecord.model_validate(record, from_attributes=True)
+            serialize_samples.append(timer.elapsed)
+    return {"queries": queries, "load": summarize(load_samples), "serialize": summarize(serialize_samples)}
+
+async def main(child_rows: int, repeat: int):
+    medical_record_id = await seed_chart(child_rows)
+
+    async def chart_loader(db):
+        return await crud.get_medical_record(db, medical_record_id)
+
+    async def nested_selectin(db):
+        result = await db.execute(nested_selectin_query(medical_record_id))
+        return result.scalars().first()
+
+    report({
+        "medical_record_id": medical_record_id,
+        "child_rows": child_rows,
+        "chart_loader": await measure(chart_loader, repeat),
+        "nested_selectin": await measure(nested_selectin, repeat),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child-rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.child_rows, args.repeat))
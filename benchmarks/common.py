@@ -0,0 +1,91 @@
+import json
+from datetime import date, datetime, timedelta
+import statistics
+import time
+from sqlalchemy import event
+
+from postgre_app import crud, schemas
+from postgre_app.database import SessionLocal, engine
+
+# Nearest-rank percentile over a list of samples.
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+# Latency summary in milliseconds for a list of samples in seconds.
+def summarize(samples: list[float]) -> dict:
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+def report(result: dict):
+    print(json.dumps(result, indent=2, default=str))
+
+# Count SQL statements sent through an engine while the block runs.
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine.sync_engine if hasattr(engine, "sync_engine") else engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+# A row dict for model with every non-key column filled with a placeholder of
+# its type. Columns named in fixed (usually foreign keys) are set as given.
+def synthetic_row(model, n: int, **fixed) -> dict:
+    row = {}
+    for column in model.__table__.columns:
+        if column.name in fixed:
+            row[column.name] = fixed[column.name]
+        elif column.primary_key or column.foreign_keys:
+            continue
+        else:
+            python_type = column.type.python_type
+            if python_type is str:
+                value = f"{column.name} {n}"
+                length = getattr(column.type, "length", None)
+                row[column.name] = value[:length] if length else value
+            elif python_type is bool:
+                row[column.name] = n % 2 == 0
+            elif python_type is int:
+                row[column.name] = n % 100
+            elif python_type is float:
+                row[column.name] = float(n % 100)
+            elif python_type is datetime:
+                row[column.name] = datetime(2020, 1, 1) + timedelta(minutes=n)
+            elif python_type is date:
+                row[column.name] = date(2020, 1, 1) + timedelta(days=n % 3650)
+    return row
+
+# Create users straight in the server's database (DATABASE_URL), since
+# registering through the API takes a staff login. Usernames that already
+# exist are left as they are.
+async def ensure_users(users: list[dict]):
+    async with SessionLocal() as db:
+        for user in users:
+            if await crud.get_user_by_username(db, user["username"]) is None:
+                await crud.create_user(db, schemas.UserCreate(**user))
+    await engine.dispose()
@@ -0,0 +1,58 @@
+# EXPLAIN every statement the chart loader issues and check that each one
+# reaches its table through an index rather than a full scan. Exits non-zero if
+# any of them would scan. Run it against a migrated database; sequential scans
+# are disabled on Postgres so an empty table still shows whether an index applies.
+#
+#   DATABASE_URL=... python -m benchmarks.explain_chart
+import asyncio
+import sys
+from sqlalchemy import text
+
+from postgre_app import charts, migrate, models
+from postgre_app.database import engine
+
+from .common import report
+
+MEDICAL_RECORD_ID = 1
+
+def _postgres_scans(plan: dict, table: str) -> list:
+    scans = []
+    if plan.get("Relation Name") == table:
+        scans.append(plan["Node Type"])
+    for child in plan.get("Plans", []):
+        scans.extend(_postgres_scans(child, table))
+    return scans
+
+async def explain(conn, statement, table: str) -> list:
+    sql = str(statement.compile(engine.sync_engine, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+        return _postgres_scans(result.scalar()[0]["Plan"], table)
+    result = await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+    return [detail for _, _, _, detail in result if f" {table} " in f" {detail} "]
+
+# A Postgres bitmap heap scan is always fed by a bitmap index scan.
+def uses_index(scans: list) -> bool:
+    return bool(scans) and all(
+        "Index" in scan or scan == "Bitmap Heap Scan" or "INDEX" in scan or "PRIMARY KEY" in scan for scan in scans)
+
+async def main() -> int:
+    await migrate.upgrade_database()
+    statements = [(models.MedicalRecord, charts.record_query(MEDICAL_RECORD_ID))]
+    statements += [(table, charts.chart_table_query(table, MEDICAL_RECORD_ID)) for table in charts.CHART_TABLES]
+    results, failed = {}, False
+    async with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("SET enable_seqscan = off"))
+        for model, statement in statements:
+            table = model.__tablename__
+            scans = await explain(conn, statement, table)
+            ok = uses_index(scans)
+            failed |= not ok
+            results[table] = {"plan": scans, "ok": ok}
+    await engine.dispose()
+    report(results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,286 @@
+# Drive every endpoint of a running server with concurrent clients, one
+# scenario at a time, against data from benchmarks.synthetic, and write
+# latency percentiles, throughput and status counts per endpoint to a JSON
+# report. Fixture ids are sampled straight from the server's database, so set
+# DATABASE_URL to the same database. Requests run as the newest
+# synthetic_admin_* user, which can see every facility.
+#
+#   DATABASE_URL=... python -m benchmarks.synthetic --patients 100000
+#   DATABASE_URL=... python -m benchmarks.load_test --url http://127.0.0.1:8000 \
+#       --concurrency 32 --seconds 30 --output load_test.json
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime
+import httpx
+from sqlalchemy import func, select
+
+from postgre_app import models
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+from .synthetic import ADMIN_USERNAME_PREFIX, FIRST_NAMES, LAST_NAMES, SYNTHETIC_PASSWORD, WORDS
+
+# Every worker logs in as the same admin from one address, and at most this
+# many such logins run at once (the login throttle's
+# LOGIN_MAX_CONCURRENT_PER_USER default), so /token gets no more workers.
+LOGIN_CONCURRENCY = 2
+BULK_USERS = 20
+
+# Ids the scenarios pick from, sampled from the database.
+class Fixtures:
+    def __init__(self, admin: str, user_ids: list, medical_record_ids: list, chief_complaints: list, facility_ids: list):
+        self.admin = admin
+        self.user_ids = user_ids
+        self.medical_record_ids = medical_record_ids
+        # (chief_complaint_id, medical_record_id) pairs, for new vitals.
+        self.chief_complaints = chief_complaints
+        self.facility_ids = facility_ids
+
+# Everything is sampled from the admin's facilities, so the scenarios measure
+# reads that succeed rather than 403s and 404s for other tenants' rows.
+async def load_fixtures(sample: int) -> Fixtures:
+    user, record, complaint = models.User, models.MedicalRecord, models.ChiefComplaint
+    async with SessionLocal() as db:
+        admin = (await db.execute(select(user.user_id, user.username)
+                                  .where(user.username.like(f"{ADMIN_USERNAME_PREFIX}%"))
+                                  .order_by(user.user_id.desc()).limit(1))).first()
+        if admin is None:
+            raise SystemExit("No synthetic admin user; run benchmarks.synthetic first")
+        facility_ids = (await db.scalars(select(models.UserAuthorizedFacility.facility_id)
+                                         .where(models.UserAuthorizedFacility.user_id == admin.user_id))).all()
+        visible = user.facility_id.in_(facility_ids)
+        user_ids = (await db.scalars(select(user.user_id).where(visible).order_by(func.random()).limit(sample))).all()
+        medical_record_ids = (await db.scalars(
+            select(record.medical_record_id).join(user, user.user_id == record.user_id).where(visible)
+            .order_by(func.random()).limit(sample))).all()
+        chief_complaints = (await db.execute(
+            select(complaint.chief_complaint_id, complaint.medical_record_id)
+            .join(record, record.medical_record_id == complaint.medical_record_id)
+            .join(user, user.user_id == record.user_id).where(visible)
+            .order_by(func.random()).limit(sample))).all()
+    await engine.dispose()
+    return Fixtures(admin.username, list(user_ids), list(medical_record_ids),
+                    [tuple(row) for row in chief_complaints], list(facility_ids))
+
+# One endpoint under load. request(worker) sends one timed request; setup, if
+# given, runs untimed before each one, and prepare once per worker before the
+# clock starts.
+class Scenario:
+    def __init__(self, name: str, request, setup=None, prepare=None, concurrency=None, default: bool = True):
+        self.name = name
+        self.request = request
+        self.setup = setup
+        self.prepare = prepare
+        self.concurrency = concurrency
+        self.default = default
+
+# A client's state within a scenario: its own random stream, tokens and
+# counters.
+class Worker:
+    def __init__(self, client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random, tag: str):
+        self.client = client
+        self.fixtures = fixtures
+        self.rng = rng
+        self.tag = tag
+        self.state = {}
+        self.sent = 0
+
+    def unique(self) -> str:
+        self.sent += 1
+        return f"{self.tag}_{self.sent}"
+
+def _login_form(fixtures: Fixtures) -> dict:
+    return {"username": fixtures.admin, "password": SYNTHETIC_PASSWORD}
+
+def _user(worker: Worker) -> dict:
+    username = f"load_{worker.unique()}"
+    return {
+        "username": username,
+        "user_first_name": worker.rng.choice(FIRST_NAMES),
+        "user_last_name": worker.rng.choice(LAST_NAMES),
+        "user_date_of_birth": f"{worker.rng.randint(1930, 2020)}-0{worker.rng.randint(1, 9)}-1{worker.rng.randint(0, 9)}",
+        "email": f"{username}@example.org",
+        "facility_id": worker.rng.choice(worker.fixtures.facility_ids),
+        "user_phone_number": f"555{worker.rng.randrange(10_000_000):07d}",
+        "hashed_password": SYNTHETIC_PASSWORD,
+    }
+
+async def _fresh_session(worker: Worker):
+    response = await worker.client.post("/token", data=_login_form(worker.fixtures))
+    response.raise_for_status()
+    worker.state["token"] = response.json()
+
+async def _rotate(worker: Worker) -> httpx.Response:
+    response = await worker.client.post("/token/refresh", json={"refresh_token": worker.state["token"]["refresh_token"]})
+    if response.status_code == 200:
+        worker.state["token"] = response.json()
+    return response
+
+async def _revoke(worker: Worker) -> httpx.Response:
+    # Only the access token; the refresh token stays usable for the next setup.
+    return await worker.client.post(
+        "/token/revoke", headers={"Authorization": f"Bearer {worker.state['token']['access_token']}"})
+
+async def _users_page(worker: Worker) -> httpx.Response:
+    response = await worker.client.get("/users/", params={"cursor": worker.state.get("cursor", ""), "limit": 100})
+    if response.status_code == 200:
+        worker.state["cursor"] = response.json()["next_cursor"] or ""
+    return response
+
+async def _activity_log_page(worker: Worker) -> httpx.Response:
+    response = await worker.client.get(
+        "/user_activity_logs/", params={"cursor": worker.state.get("cursor", ""), "limit": 100})
+    if response.status_code == 200:
+        worker.state["cursor"] = response.json()["next_cursor"] or ""
+    return response
+
+async def _create_activity_log(worker: Worker) -> httpx.Response:
+    user_id = worker.rng.choice(worker.fixtures.user_ids)
+    return await worker.client.post(f"/users/{user_id}/user_activity_logs", json={
+        "user_id": user_id,
+        "user_date_time_of_activity": datetime.now().isoformat(),
+        "activity_description": "load test",
+    })
+
+def _vital(worker: Worker) -> dict:
+    chief_complaint_id, medical_record_id = worker.rng.choice(worker.fixtures.chief_complaints)
+    uniform = worker.rng.uniform
+    return {
+        "chief_complaint_id": chief_complaint_id,
+        "medical_record_id": medical_record_id,
+        "vitals_date_taken": datetime.now().isoformat(),
+        "vitals_height": round(uniform(145, 200), 1),
+        "vitals_weight": round(uniform(40, 140), 1),
+        "vitals_temperature": round(uniform(35, 40), 1),
+        "vitals_pulse": round(uniform(40, 140)),
+        "vitals_respiratory_rate": round(uniform(8, 28)),
+        "vitals_blood_pressure_systolic": round(uniform(90, 200)),
+        "vitals_blood_pressure_diastolic": round(uniform(50, 110)),
+        "vitals_arterial_blood_oxygen_saturation": round(uniform(89, 100)),
+    }
+
+def scenarios() -> list[Scenario]:
+    def pick(worker, name):
+        return worker.rng.choice(getattr(worker.fixtures, name))
+
+    return [
+        Scenario("login", lambda w: w.client.post("/token", data=_login_form(w.fixtures)),
+                 concurrency=LOGIN_CONCURRENCY),
+        Scenario("refresh_token", _rotate, prepare=_fresh_session),
+        Scenario("revoke_token", _revoke, setup=_rotate, prepare=_fresh_session),
+        Scenario("read_users_me", lambda w: w.client.get("/users/me")),
+        Scenario("read_metrics", lambda w: w.client.get("/metrics")),
+        Scenario("create_user", lambda w: w.client.post("/users/", json=_user(w))),
+        Scenario("create_users_bulk", lambda w: w.client.post("/users/bulk", json=[_user(w) for _ in range(BULK_USERS)])),
+        Scenario("read_users_offset", lambda w: w.client.get(
+            "/users/", params={"skip": w.rng.randrange(len(w.fixtures.user_ids)), "limit": 100})),
+        Scenario("read_users_cursor", _users_page),
+        Scenario("lookup_users", lambda w: w.client.get(
+            "/users/lookup", params={"name": w.rng.choice(LAST_NAMES)[:w.rng.randint(3, 6)]})),
+        Scenario("find_duplicate_users", lambda w: w.client.post("/users/duplicates", json=_user(w))),
+        Scenario("read_user", lambda w: w.client.get(f"/users/{pick(w, 'user_ids')}")),
+        Scenario("create_activity_log", _create_activity_log),
+        Scenario("read_user_activity_logs", _activity_log_page),
+        Scenario("read_medical_record", lambda w: w.client.get(f"/medical_records/{pick(w, 'medical_record_ids')}")),
+        Scenario("create_vital", lambda w: w.client.post("/vitals/", json=_vital(w))),
+        Scenario("read_vitals_series", lambda w: w.client.get(
+            f"/medical_records/{pick(w, 'medical_record_ids')}/vitals/series")),
+        Scenario("read_highest_risk", lambda w: w.client.get(
+            f"/facilities/{pick(w, 'facility_ids')}/early_warning_scores")),
+        Scenario("search_medical_record", lambda w: w.client.get(
+            f"/medical_records/{pick(w, 'medical_record_ids')}/search", params={"q": w.rng.choice(WORDS)})),
+        Scenario("search_facility", lambda w: w.client.get(
+            f"/facilities/{pick(w, 'facility_ids')}/search", params={"q": w.rng.choice(WORDS)})),
+        # Streams the whole table per request; only run when named in --only.
+        Scenario("export_users", lambda w: w.client.get("/exports/users"), default=False),
+    ]
+
+async def run(scenario: Scenario, client: httpx.AsyncClient, fixtures: Fixtures, concurrency: int,
+              seconds: float, seed: int, run_id: str) -> dict:
+    concurrency = min(concurrency, scenario.concurrency or concurrency)
+    workers = [Worker(client, fixtures, random.Random(f"{seed}:{scenario.name}:{n}"), f"{run_id}_{scenario.name}_{n}")
+               for n in range(concurrency)]
+    # One at a time, so preparing logins stay under the login throttle.
+    for worker in workers:
+        if scenario.prepare:
+            await scenario.prepare(worker)
+    # Connections the server dropped or timed out are counted, not timed.
+    samples, statuses, transport_errors = [], Counter(), Counter()
+
+    async def loop(worker: Worker, deadline: float):
+        while time.perf_counter() < deadline:
+            if scenario.setup:
+                await scenario.setup(worker)
+            try:
+                with Timer() as timer:
+                    response = await scenario.request(worker)
+            except httpx.TransportError as exc:
+                transport_errors[type(exc).__name__] += 1
+                continue
+            samples.append(timer.elapsed)
+            statuses[response.status_code] += 1
+
+    with Timer() as wall:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(loop(worker, deadline) for worker in workers))
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / wall.elapsed, 1),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": dict(statuses),
+        "transport_errors": dict(transport_errors),
+        **summarize(samples),
+    }
+
+async def main(url: str, concurrency: int, seconds: float, seed: int, sample: int, only: list, skip: list,
+               output: str):
+    fixtures = await load_fixtures(sample)
+    selected = [scenario for scenario in scenarios()
+                if (scenario.name in only if only else scenario.default) and scenario.name not in skip]
+    run_id = f"{datetime.now():%Y%m%d%H%M%S}"
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        response = await client.post("/token", data=_login_form(fixtures))
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        results = {}
+        for scenario in selected:
+            results[scenario.name] = await run(scenario, client, fixtures, concurrency, seconds, seed, run_id)
+        metrics = (await client.get("/metrics")).json()
+    result = {
+        "url": url,
+        "started": run_id,
+        "concurrency": concurrency,
+        "seconds": seconds,
+        "seed": seed,
+        "fixtures": {
+            "users": len(fixtures.user_ids),
+            "medical_records": len(fixtures.medical_record_ids),
+            "facilities": len(fixtures.facility_ids),
+        },
+        "endpoints": results,
+        "metrics": metrics,
+    }
+    if output:
+        with open(output, "w") as file:
+            json.dump(result, file, indent=2, default=str)
+    report(result)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sample", type=int, default=1000, help="fixture ids sampled per table")
+    parser.add_argument("--only", nargs="*", default=[], help="scenario names to run (also enables export_users)")
+    parser.add_argument("--skip", nargs="*", default=[], help="scenario names to leave out")
+    parser.add_argument("--output", default="", help="write the JSON report here as well")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.concurrency, args.seconds, args.seed, args.sample, args.only, args.skip,
+                     args.output))
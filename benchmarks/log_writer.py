@@ -0,0 +1,56 @@
+# Compare activity log insert throughput of the per-row crud path with the
+# buffered LogWriter, writing the same number of rows through each.
+#
+#   DATABASE_URL=... python -m benchmarks.log_writer --rows 20000
+import argparse
+import asyncio
+from datetime import datetime
+from sqlalchemy import select
+
+from postgre_app import crud, models, schemas
+from postgre_app.database import SessionLocal
+from postgre_app.log_writer import LogWriter
+
+from .common import Timer, report
+
+async def main(rows: int, batch_size: int):
+    async with SessionLocal() as db:
+        user_id = await db.scalar(select(models.User.user_id).limit(1))
+    if user_id is None:
+        raise SystemExit("Create at least one user before running this benchmark")
+
+    per_row_count = max(1, rows // 10)
+    async with SessionLocal() as db:
+        with Timer() as per_row:
+            for n in range(per_row_count):
+                await crud.create_user_activity_log(db, schemas.UserActivityLogCreate(
+                    user_id=user_id,
+                    user_date_time_of_activity=datetime.now(),
+                    activity_description=f"per-row benchmark {n}",
+                ), user_id=user_id)
+
+    writer = LogWriter(batch_size=batch_size, flush_interval=0.05, max_pending=rows)
+    writer.start()
+    with Timer() as buffered:
+        for n in range(rows):
+            await writer.log_activity(user_id, f"buffered benchmark {n}")
+            if n % batch_size == 0:
+                # Yield like a busy server would so the flusher can run.
+                await asyncio.sleep(0)
+        await writer.stop()
+
+    per_row_rate = per_row_count / per_row.elapsed
+    buffered_rate = rows / buffered.elapsed
+    report({
+        "per_row": {"rows": per_row_count, "rows_per_s": round(per_row_rate)},
+        "buffered": {"rows": rows, "batch_size": batch_size, "flushes": writer.flushes,
+                     "rows_per_s": round(buffered_rate)},
+        "speedup": round(buffered_rate / per_row_rate, 1),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch_size))
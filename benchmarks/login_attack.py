@@ -0,0 +1,99 @@
+# Measure legitimate login latency against a running server, first alone and
+# then while an attacker sprays wrong passwords at existing accounts (unknown
+# usernames are rejected before bcrypt anyway). The legitimate client connects
+# from a second loopback address so the login throttle sees two clients. Run
+# the server once with the throttle disabled (LOGIN_MAX_FAILURES_PER_USER=0
+# LOGIN_MAX_FAILURES_PER_CLIENT=0) to compare. The accounts, and an admin
+# that reads /metrics, are created in the server's database, so DATABASE_URL
+# must point at it.
+#
+#   DATABASE_URL=... python -m benchmarks.login_attack --url http://127.0.0.1:8000 --attackers 100 --victims 20 --seconds 20
+import argparse
+import asyncio
+from collections import Counter
+import httpx
+
+from postgre_app import authorization, schemas
+
+from .common import Timer, ensure_users, report, summarize
+
+BENCH_USER = {
+    "username": "bench_login_attack",
+    "user_first_name": "Bench",
+    "user_last_name": "Attack",
+    "user_date_of_birth": "1980-01-01",
+    "facility_id": "BENCH",
+    "hashed_password": "bench-password",
+}
+
+async def legitimate(client: httpx.AsyncClient, samples: list, statuses: Counter, stop: asyncio.Event):
+    while not stop.is_set():
+        with Timer() as timer:
+            response = await client.post("/token", data={
+                "username": BENCH_USER["username"],
+                "password": BENCH_USER["hashed_password"],
+            })
+        statuses[response.status_code] += 1
+        samples.append(timer.elapsed)
+        await asyncio.sleep(0.05)
+
+BENCH_ADMIN = "bench_login_attack_admin"
+
+def victim(n: int) -> str:
+    return f"bench_login_victim_{n}"
+
+async def attacker(client: httpx.AsyncClient, n: int, victims: int, statuses: Counter, stop: asyncio.Event):
+    attempt = 0
+    while not stop.is_set():
+        response = await client.post("/token", data={"username": victim((n + attempt) % victims), "password": f"guess{attempt}"})
+        statuses[response.status_code] += 1
+        attempt += 1
+
+async def phase(url: str, legitimate_address: str, attackers: int, victims: int, seconds: float) -> dict:
+    samples, legitimate_statuses, attack_statuses = [], Counter(), Counter()
+    stop = asyncio.Event()
+    transport = httpx.AsyncHTTPTransport(local_address=legitimate_address)
+    async with httpx.AsyncClient(base_url=url, transport=transport, timeout=120) as user_client, \
+            httpx.AsyncClient(base_url=url, limits=httpx.Limits(max_connections=attackers + 1), timeout=120) as attack_client:
+        tasks = [asyncio.create_task(legitimate(user_client, samples, legitimate_statuses, stop))]
+        tasks += [asyncio.create_task(attacker(attack_client, n, victims, attack_statuses, stop)) for n in range(attackers)]
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return {
+        "attackers": attackers,
+        "legitimate_statuses": dict(legitimate_statuses),
+        "legitimate_login": summarize(samples),
+        "attack_statuses": dict(attack_statuses),
+        "attack_requests_per_second": round(sum(attack_statuses.values()) / seconds, 1),
+    }
+
+async def main(url: str, legitimate_address: str, attackers: int, victims: int, seconds: float):
+    await ensure_users([BENCH_USER] + [{**BENCH_USER, "username": victim(n)} for n in range(victims)])
+    fields = schemas.UserCreate(**BENCH_USER).model_dump(exclude={"username", "hashed_password"})
+    await authorization.grant_admin(BENCH_ADMIN, [], password=BENCH_USER["hashed_password"], **fields)
+    # Log the admin in before the attack, which may lock out this address.
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        response = await client.post("/token", data={"username": BENCH_ADMIN, "password": BENCH_USER["hashed_password"]})
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        metrics_before = (await client.get("/metrics")).json().get("login_throttle")
+        baseline = await phase(url, legitimate_address, 0, victims, seconds)
+        under_attack = await phase(url, legitimate_address, attackers, victims, seconds)
+        metrics_after = (await client.get("/metrics")).json().get("login_throttle")
+    report({
+        "baseline": baseline,
+        "under_attack": under_attack,
+        "throttle_before": metrics_before,
+        "throttle_after": metrics_after,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--legitimate-address", default="127.0.0.2")
+    parser.add_argument("--attackers", type=int, default=100)
+    parser.add_argument("--victims", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.legitimate_address, args.attackers, args.victims, args.seconds))
@@ -0,0 +1,80 @@
+# Fire concurrent logins at a running server and report /token latency,
+# along with the latency of a request that never touches bcrypt, to show
+# whether password work is stalling the event loop. Every login comes from one
+# address, and the login throttle counts attempts in flight against the
+# per-client failure limit, so run the server with that limit off. The logins
+# are spread over --users bench users, since each username may only have
+# LOGIN_MAX_CONCURRENT_PER_USER (default 2) logins in flight per client.
+# Exits non-zero if any login was rejected, as the latency percentiles then
+# only cover the logins that got through. The bench users are created in the
+# server's database, so DATABASE_URL must point at it.
+#
+#   LOGIN_MAX_FAILURES_PER_CLIENT=0 DATABASE_URL=... uvicorn main:app
+#   DATABASE_URL=... python -m benchmarks.login_latency --url http://localhost:8000 --concurrency 200 --users 100
+import argparse
+import asyncio
+import sys
+from collections import Counter
+import httpx
+
+from .common import Timer, ensure_users, report, summarize
+
+BENCH_PASSWORD = "bench-password"
+
+def bench_user(n: int) -> dict:
+    return {
+        "username": f"bench_login_{n}",
+        "user_first_name": "Bench",
+        "user_last_name": "Login",
+        "user_date_of_birth": "1980-01-01",
+        "facility_id": "BENCH",
+        "hashed_password": BENCH_PASSWORD,
+    }
+
+async def login(client: httpx.AsyncClient, username: str, samples: list, statuses: Counter):
+    with Timer() as timer:
+        response = await client.post("/token", data={"username": username, "password": BENCH_PASSWORD})
+    statuses[response.status_code] += 1
+    if response.status_code == 200:
+        samples.append(timer.elapsed)
+
+async def probe(client: httpx.AsyncClient, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        with Timer() as timer:
+            await client.get("/openapi.json")
+        samples.append(timer.elapsed)
+        await asyncio.sleep(0.01)
+
+async def main(url: str, concurrency: int, users: int) -> int:
+    await ensure_users([bench_user(n) for n in range(users)])
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        login_samples, probe_samples, statuses = [], [], Counter()
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(client, probe_samples, stop))
+        with Timer() as wall:
+            await asyncio.gather(*(login(client, bench_user(n % users)["username"], login_samples, statuses)
+                                   for n in range(concurrency)))
+        stop.set()
+        await prober
+    report({
+        "concurrency": concurrency,
+        "users": users,
+        "wall_s": round(wall.elapsed, 3),
+        "statuses": dict(statuses),
+        "login": summarize(login_samples),
+        "probe": summarize(probe_samples),
+    })
+    rejected = concurrency - statuses[200]
+    if rejected:
+        print(f"{rejected} logins were rejected (429: login throttle, see the notes in benchmarks/login_latency.py; 503: password pool full)", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.url, args.concurrency, args.users)))
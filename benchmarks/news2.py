@@ -0,0 +1,97 @@
+# Time NEWS2 batch scoring: the vectorized scorer alone on synthetic readings,
+# which should stay well under a second for 50k patients, then a full rescore
+# (latest vitals query, scoring, upsert) over seeded patients. The first
+# rescore inserts every score; later ones only rewrite scores that changed.
+#
+#   DATABASE_URL=... python -m benchmarks.news2 --patients 50000
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import insert
+
+from postgre_app import models, news2
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+READINGS_PER_PATIENT = 3
+
+def synthetic_values(rng, count: int) -> dict:
+    return {
+        "vitals_respiratory_rate": rng.normal(18, 4, count).round(),
+        "vitals_arterial_blood_oxygen_saturation": rng.normal(95, 3, count).round(),
+        "vitals_blood_pressure_systolic": rng.normal(120, 20, count).round(),
+        "vitals_pulse": rng.normal(85, 20, count).round(),
+        "vitals_temperature": rng.normal(37.2, 0.8, count).round(1),
+    }
+
+async def seed(patients: int, facility_id: str):
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    async with engine.begin() as conn:
+        result = await conn.execute(insert(models.User).returning(models.User.user_id, sort_by_parameter_order=True), [
+            {"username": f"bench_news2_{now.timestamp()}_{n}", "user_first_name": "Bench", "user_last_name": f"News{n}",
+             "user_date_of_birth": date(1960, 1, 1), "user_date_created": now, "facility_id": facility_id,
+             "is_active": True, "hashed_password": "x"}
+            for n in range(patients)])
+        user_ids = result.scalars().all()
+        result = await conn.execute(
+            insert(models.MedicalRecord).returning(models.MedicalRecord.medical_record_id, sort_by_parameter_order=True), [
+                {"user_id": user_id, "patient_condition": "admitted", "medical_record_created": now,
+                 "is_active": True, "blood_transfusion_status": "none"}
+                for user_id in user_ids])
+        record_ids = result.scalars().all()
+        result = await conn.execute(
+            insert(models.ChiefComplaint).returning(models.ChiefComplaint.chief_complaint_id, sort_by_parameter_order=True), [
+                {"medical_record_id": record_id, "chief_complaint_statement": "observation", "chief_complaint_date": now}
+                for record_id in record_ids])
+        complaint_ids = result.scalars().all()
+        readings = []
+        for reading in range(READINGS_PER_PATIENT):
+            values = synthetic_values(rng, patients)
+            taken = now - timedelta(hours=READINGS_PER_PATIENT - reading)
+            readings += [
+                {"medical_record_id": record_id, "chief_complaint_id": complaint_id, "vitals_date_taken": taken,
+                 **{key: float(column[n]) for key, column in values.items()}}
+                for n, (record_id, complaint_id) in enumerate(zip(record_ids, complaint_ids))]
+        await conn.execute(insert(models.Vital), readings)
+
+async def main(patients: int, repeat: int):
+    rng = np.random.default_rng(1)
+    values = synthetic_values(rng, patients)
+    samples = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            news2.score_arrays(values)
+        samples.append(timer.elapsed)
+
+    facility_id = f"BENCH-NEWS2-{datetime.now().timestamp():.0f}"
+    with Timer() as seeding:
+        await seed(patients, facility_id)
+    rescores = []
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            with Timer() as timer:
+                breakdown = await news2.rescore(db, facility_id)
+        rescores.append(timer.elapsed)
+    async with SessionLocal() as db:
+        with Timer() as top:
+            highest = await news2.highest_risk(db, facility_id, 20)
+    await engine.dispose()
+    report({
+        "patients": patients,
+        "score_arrays": summarize(samples),
+        "seed_seconds": round(seeding.elapsed, 3),
+        "rescore": summarize(rescores),
+        "rescore_breakdown": breakdown,
+        "highest_risk_ms": round(top.elapsed * 1000, 3),
+        "highest_total_score": highest[0]["total_score"] if highest else None,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.patients, args.repeat))
@@ -0,0 +1,72 @@
+# Compare offset and keyset pagination latency for a deep page of
+# /user_activity_logs/, seeding activity log rows first if there are too few.
+#
+#   DATABASE_URL=... python -m benchmarks.pagination --page 10000 --limit 100
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+
+from postgre_app import crud, models
+from postgre_app.database import SessionLocal
+
+from .common import Timer, report, summarize
+
+SEED_BATCH = 10000
+
+async def seed_activity_logs(rows_needed: int):
+    async with SessionLocal() as db:
+        existing = await db.scalar(select(func.count()).select_from(models.UserActivityLog))
+        if existing >= rows_needed:
+            return existing
+        user_id = await db.scalar(select(models.User.user_id).limit(1))
+        if user_id is None:
+            raise SystemExit("Create at least one user before seeding activity logs")
+        start = datetime(2020, 1, 1)
+        for offset in range(existing, rows_needed, SEED_BATCH):
+            batch = [
+                {
+                    "user_id": user_id,
+                    "user_date_time_of_activity": start + timedelta(seconds=n),
+                    "activity_description": f"benchmark activity {n}",
+                }
+                for n in range(offset, min(offset + SEED_BATCH, rows_needed))
+            ]
+            await db.execute(insert(models.UserActivityLog), batch)
+            await db.commit()
+        return rows_needed
+
+async def main(page: int, limit: int, repeat: int):
+    skip = page * limit
+    rows = await seed_activity_logs(skip + limit)
+    offset_samples, keyset_samples = [], []
+    async with SessionLocal() as db:
+        # The cursor a client would hold after walking to the previous page.
+        after_id = await db.scalar(
+            select(models.UserActivityLog.user_activity_log_id)
+            .order_by(models.UserActivityLog.user_activity_log_id).offset(skip - 1).limit(1))
+        cursor = crud.encode_cursor((after_id,))
+        for _ in range(repeat):
+            with Timer() as timer:
+                offset_rows = await crud.get_user_activity_logs(db, skip=skip, limit=limit)
+            offset_samples.append(timer.elapsed)
+            with Timer() as timer:
+                keyset_rows, _ = await crud.get_user_activity_logs_page(db, cursor=cursor, limit=limit)
+            keyset_samples.append(timer.elapsed)
+            db.expunge_all()
+    assert [r.user_activity_log_id for r in offset_rows] == [r.user_activity_log_id for r in keyset_rows]
+    report({
+        "rows": rows,
+        "page": page,
+        "limit": limit,
+        "offset": summarize(offset_samples),
+        "keyset": summarize(keyset_samples),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.page, args.limit, args.repeat))
@@ -0,0 +1,87 @@
+# Check the number of SQL statements each list/detail endpoint issues against
+# its budget, seeding users with more log rows than the preview limit first.
+# Requests are authenticated as the first seeded user, whose principal is
+# cached beforehand, so authorization adds no statements. Exits non-zero if any
+# endpoint goes over.
+#
+#   DATABASE_URL=... python -m benchmarks.query_counts --users 100
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from main import app
+from postgre_app import loading, log_writer, models, passwords, schemas
+from postgre_app.database import engine
+
+from .common import QueryCounter, report
+
+# Statements per request, independent of the number of rows returned:
+# one for the page, one per selectin relationship and one per capped one.
+USER_PLAN = loading.plan_for(schemas.User)
+USER_QUERIES = 1 + len(USER_PLAN.selectin) + len(USER_PLAN.capped)
+BUDGETS = {
+    "/users/?limit={users}": USER_QUERIES,
+    "/users/?cursor=&limit={users}": USER_QUERIES,
+    "/users/{user_id}": USER_QUERIES,
+    "/user_activity_logs/?limit={users}": 1,
+}
+
+# The first user is staff at the facility, so list pages return every
+# seeded user. Users already seeded by an earlier run are reused.
+def seed(client: TestClient, users: int) -> int:
+    hashed_password = passwords.hash_password("bench-password")
+    now = datetime.now()
+    logs = loading.USER_LOG_PREVIEW_LIMIT * 2
+    start = datetime(2020, 1, 1)
+
+    async def insert_rows():
+        async with engine.begin() as conn:
+            existing = (await conn.execute(select(models.User.user_id).where(
+                models.User.username.like("bench_query_%")).order_by(models.User.user_id))).scalars().all()
+            if existing:
+                return existing[0]
+            result = await conn.execute(
+                insert(models.User).returning(models.User.user_id, sort_by_parameter_order=True), [
+                    {"username": f"bench_query_{n}", "user_first_name": "Bench", "user_last_name": f"Query{n}",
+                     "user_date_of_birth": date(1980, 1, 1), "user_date_created": now, "facility_id": "BENCH",
+                     "is_active": True, "hashed_password": hashed_password}
+                    for n in range(users)])
+            user_ids = result.scalars().all()
+            await conn.execute(insert(models.Nonpatient), {"user_id": user_ids[0], "nonpatient_organization": "Bench"})
+            rows = [
+                {"user_id": user_id, "user_date_time_of_activity": start + timedelta(minutes=n),
+                 "activity_description": f"bench {n}"}
+                for user_id in user_ids for n in range(logs)
+            ]
+            await conn.execute(insert(models.UserActivityLog), rows)
+            await conn.execute(insert(models.UserLoginLog), rows)
+            return user_ids[0]
+    return client.portal.call(insert_rows)
+
+def main(users: int) -> int:
+    results, failed = {}, False
+    with TestClient(app) as client:
+        user_id = seed(client, users)
+        token = client.post("/token", data={"username": "bench_query_0", "password": "bench-password"}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        client.get("/users/me", headers=headers)
+        # Write the login's log row now, so the background flush can't land
+        # on the shared engine while a request is being counted.
+        client.portal.call(log_writer.writer.flush)
+        for path, budget in BUDGETS.items():
+            url = path.format(users=users, user_id=user_id)
+            with QueryCounter(engine) as counter:
+                response = client.get(url, headers=headers)
+            ok = response.status_code == 200 and counter.count <= budget
+            failed |= not ok
+            results[url] = {"status": response.status_code, "queries": counter.count, "budget": budget, "ok": ok}
+    report(results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+    sys.exit(main(args.users))
@@ -0,0 +1,107 @@
+# Check database.router's routing decisions end to end, with two SQLite files
+# standing in for the primary and a replica and the router's clock stepped by
+# hand to simulate replication lag. The replica is a copy of the seeded
+# primary with a marker in every row, so each response shows which database
+# served it. Checks that the routed read endpoints use the replica, that a
+# caller's reads stick to the primary after their write until the replica has
+# caught up, and that reads fall back to the primary when the replica lags by
+# more than the limit. Exits non-zero if any check fails. Needs aiosqlite.
+#
+#   python -m benchmarks.replica_checks
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+DIRECTORY = tempfile.mkdtemp(prefix="replica_checks_")
+PRIMARY = os.path.join(DIRECTORY, "primary.db")
+REPLICA = os.path.join(DIRECTORY, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PRIMARY}"
+os.environ["DB_AUTO_MIGRATE"] = "false"
+# Cached responses would hide which database a read went to.
+os.environ["RESPONSE_CACHE_MAX_ENTRY_BYTES"] = "0"
+
+import asyncio
+from datetime import date, datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from main import app
+from postgre_app import authorization, database, models
+from postgre_app.database import Base, engine
+
+from .common import report
+
+MAX_LAG = 5.0
+USERNAME = "replica_check_admin"
+PASSWORD = "replica-check-password"
+
+# The routed read endpoints; the user id is filled in after seeding.
+READS = ("/users/", "/users/{user_id}", "/user_activity_logs/")
+
+async def seed() -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user_id = await authorization.grant_admin(
+        USERNAME, ["CHECK"], password=PASSWORD, user_first_name="Replica", user_last_name="Check",
+        user_date_of_birth=date(1980, 1, 1), facility_id="CHECK", user_city="primary")
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.UserActivityLog), {
+            "user_id": user_id, "user_date_time_of_activity": datetime.now(), "activity_description": "primary"})
+    await engine.dispose()
+    return user_id
+
+# Copy the primary and mark every row that the read endpoints return.
+def make_replica():
+    shutil.copyfile(PRIMARY, REPLICA)
+    with sqlite3.connect(REPLICA) as conn:
+        conn.execute("UPDATE users SET user_city = 'replica'")
+        conn.execute("UPDATE user_activity_logs SET activity_description = 'replica'")
+
+def served_by(response) -> str:
+    return "replica" if '"replica"' in response.text else "primary"
+
+def main() -> int:
+    user_id = asyncio.run(seed())
+    make_replica()
+    now = [0.0]
+    router = database.ReplicaRouter(engine, [database._create_engine(f"sqlite+aiosqlite:///{REPLICA}")],
+                                    MAX_LAG, check_interval=3600, clock=lambda: now[0])
+    database.router = router
+    results, failed = {}, False
+
+    def expect(step: str, expected: str, headers: dict):
+        nonlocal failed
+        for path in READS:
+            response = client.get(path.format(user_id=user_id), headers=headers)
+            actual = served_by(response) if response.status_code == 200 else f"status {response.status_code}"
+            ok = actual == expected
+            failed |= not ok
+            results[f"{step}: {path}"] = {"expected": expected, "served_by": actual, "ok": ok}
+
+    with TestClient(app) as client:
+        token = client.post("/token", data={"username": USERNAME, "password": PASSWORD}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        client.portal.call(router.check)
+        expect("replica current", "replica", headers)
+
+        now[0] = 1.0
+        client.post("/users/", headers=headers, json={
+            "username": "replica_check_patient", "user_first_name": "Replica", "user_last_name": "Patient",
+            "user_date_of_birth": "1990-01-01", "facility_id": "CHECK", "hashed_password": PASSWORD})
+        expect("after own write", "primary", headers)
+        client.portal.call(router.check)
+        expect("replica caught up with write", "replica", headers)
+
+        now[0] = 2.0 + MAX_LAG
+        expect("replica lagging", "primary", headers)
+        client.portal.call(router.check)
+        expect("replica current again", "replica", headers)
+        results["router"] = router.stats()
+    shutil.rmtree(DIRECTORY)
+    report(results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
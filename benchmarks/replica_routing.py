@@ -0,0 +1,76 @@
+# Read latency while writes load the primary, with reads sent to the primary
+# and then routed by database.router. Any second database works as a
+# stand-in replica; point DATABASE_REPLICA_URLS at a streaming standby to see
+# the real effect of moving reads off the primary. The routing decisions
+# themselves are checked by benchmarks.replica_checks.
+#
+#   DATABASE_URL=... DATABASE_REPLICA_URLS=... python -m benchmarks.replica_routing --readers 8 --writers 8 --seconds 10
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import insert, select
+
+from postgre_app import crud, database, models
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+async def writer(user_id: int, counts: Counter, stop: asyncio.Event):
+    while not stop.is_set():
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.UserActivityLog), [
+                {"user_id": user_id, "user_date_time_of_activity": datetime.now(), "activity_description": "bench replica"}
+                for _ in range(50)])
+        counts["rows_written"] += 50
+
+async def reader(routed: bool, samples: list, engines: Counter, stop: asyncio.Event):
+    while not stop.is_set():
+        bind = database.router.engine_for() if routed else engine
+        engines["primary" if bind is engine else "replica"] += 1
+        async with SessionLocal(bind=bind) as db:
+            with Timer() as timer:
+                await crud.get_users_page(db, limit=50)
+        samples.append(timer.elapsed)
+
+async def phase(routed: bool, user_id: int, readers: int, writers: int, seconds: float) -> dict:
+    samples, engines, counts = [], Counter(), Counter()
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(writer(user_id, counts, stop)) for _ in range(writers)]
+    tasks += [asyncio.create_task(reader(routed, samples, engines, stop)) for _ in range(readers)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return {
+        "reads": summarize(samples),
+        "reads_by_engine": dict(engines),
+        "rows_written_per_second": round(counts["rows_written"] / seconds, 1),
+    }
+
+async def main(readers: int, writers: int, seconds: float):
+    async with engine.connect() as conn:
+        user_id = (await conn.execute(select(models.User.user_id).limit(1))).scalar_one()
+    monitor = asyncio.create_task(database.router.watch())
+    await asyncio.sleep(database.router.check_interval * 2)
+    primary_only = await phase(False, user_id, readers, writers, seconds)
+    routed = await phase(True, user_id, readers, writers, seconds)
+    monitor.cancel()
+    stats = database.router.stats()
+    await database.router.dispose()
+    await engine.dispose()
+    report({
+        "readers": readers,
+        "writers": writers,
+        "replicas": len(database.router.replicas),
+        "primary_only": primary_only,
+        "routed": routed,
+        "router": stats,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.readers, args.writers, args.seconds))
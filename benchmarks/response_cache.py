@@ -0,0 +1,70 @@
+# Latency of the cached read endpoints through the app, rendered from the
+# database (cache cleared before each request), served from the cache, and
+# answered with a 304 for the ETag the client already has.
+#
+#   DATABASE_URL=... python -m benchmarks.response_cache --repeat 200 --limit 100
+import argparse
+import asyncio
+from datetime import datetime
+import httpx
+
+from main import app
+from postgre_app import crud, models, passwords, response_cache, schemas
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+async def seed() -> tuple[int, str]:
+    username = f"bench_response_cache_{datetime.now().timestamp():.0f}"
+    async with SessionLocal() as db:
+        user = await crud.create_user(db, schemas.UserCreate(
+            username=username, user_first_name="Bench", user_last_name="Cache",
+            user_date_of_birth="1980-01-01", facility_id="BENCH", hashed_password="bench-password"))
+        db.add(models.Nonpatient(user_id=user.user_id, nonpatient_organization="Bench"))
+        await db.commit()
+        token = await crud.issue_tokens(db, user.user_id, username)
+    return user.user_id, token.access_token
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int) -> dict:
+    cold, warm, not_modified = [], [], []
+    for _ in range(repeat):
+        response_cache.cache.clear()
+        with Timer() as timer:
+            response = await client.get(path)
+        cold.append(timer.elapsed)
+        with Timer() as timer:
+            await client.get(path)
+        warm.append(timer.elapsed)
+        with Timer() as timer:
+            revalidated = await client.get(path, headers={"If-None-Match": response.headers["ETag"]})
+        not_modified.append(timer.elapsed)
+        assert revalidated.status_code == 304
+    return {
+        "bytes": len(response.content),
+        "rendered": summarize(cold),
+        "cached": summarize(warm),
+        "not_modified": summarize(not_modified),
+    }
+
+async def main(repeat: int, limit: int):
+    user_id, access_token = await seed()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {access_token}"}) as client:
+        user = await measure(client, f"/users/{user_id}", repeat)
+        users = await measure(client, f"/users/?cursor=&limit={limit}", repeat)
+    stats = response_cache.cache.stats()
+    await engine.dispose()
+    passwords.pool.shutdown()
+    report({
+        "repeat": repeat,
+        "read_user": user,
+        "read_users": {"limit": limit, **users},
+        "response_cache": stats,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat, args.limit))
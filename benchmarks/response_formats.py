@@ -0,0 +1,50 @@
+# Body size and load + render + compress latency of a /user_activity_logs/ and
+# a /users/ page in every negotiable format (formats.MEDIA_TYPES) and content
+# coding. Seed activity logs first (benchmarks.pagination) for large pages.
+#
+#   DATABASE_URL=... python -m benchmarks.response_formats --limit 10000 --repeat 10
+import argparse
+import asyncio
+
+from postgre_app import crud, formats, schemas
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+async def compare(load, schema, repeat: int) -> dict:
+    results = {}
+    for media_type in formats.MEDIA_TYPES:
+        for encoding in [None] + formats.ENCODINGS:
+            variant = formats.Variant(media_type, encoding)
+            plan = formats.plan_for(variant, schema)
+            samples = []
+            for _ in range(repeat):
+                async with SessionLocal() as db:
+                    with Timer() as timer:
+                        value = await load(db, plan)
+                        body, _ = formats.compress(formats.render(variant, plan, list[schema], value), encoding)
+                samples.append(timer.elapsed)
+            results[f"{media_type} {encoding or 'identity'}"] = {"bytes": len(body), **summarize(samples)}
+    return results
+
+async def main(limit: int, repeat: int):
+    async def users(db, plan):
+        return await crud.get_users(db, limit=limit, plan=plan)
+
+    async def user_activity_logs(db, plan):
+        return await crud.get_user_activity_logs(db, limit=limit, plan=plan)
+
+    result = {
+        "limit": limit,
+        "read_user_activity_logs": await compare(user_activity_logs, schemas.UserActivityLog, repeat),
+        "read_users": await compare(users, schemas.User, repeat),
+    }
+    await engine.dispose()
+    report(result)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.limit, args.repeat))
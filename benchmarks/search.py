@@ -0,0 +1,101 @@
+# Compare searching a facility's nurse notes with an ILIKE scan (every match,
+# as ranking needs) against the GIN-backed full-text index, and time the first
+# two keyset pages and a single record's search. Seeded notes are written with
+# Core inserts, so the nurse note index is rebuilt (and timed) first.
+#
+#   DATABASE_URL=... python -m benchmarks.search --records 2000 --notes 50
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import insert, select
+
+from postgre_app import crud, models, search
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+WORDS = (
+    "patient resting comfortably denies chest pain shortness of breath nausea vomiting reports mild headache "
+    "ambulating hallway tolerated diet well incision clean dry intact dressing changed vital signs stable "
+    "pain controlled with oral analgesics family at bedside awaiting cardiology consult telemetry sinus rhythm "
+    "lungs clear bilaterally abdomen soft nontender voiding without difficulty fall precautions maintained"
+).split()
+QUERIES = ["chest pain", "cardiology consult", "incision dressing", "sepsis", "headache -nausea"]
+
+async def seed(records: int, notes: int, facility_id: str):
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    async with engine.begin() as conn:
+        result = await conn.execute(insert(models.User).returning(models.User.user_id, sort_by_parameter_order=True), [
+            {"username": f"bench_search_{now.timestamp()}_{n}", "user_first_name": "Bench", "user_last_name": f"Search{n}",
+             "user_date_of_birth": date(1960, 1, 1), "user_date_created": now, "facility_id": facility_id,
+             "is_active": True, "hashed_password": "x"}
+            for n in range(records)])
+        user_ids = result.scalars().all()
+        result = await conn.execute(
+            insert(models.MedicalRecord).returning(models.MedicalRecord.medical_record_id, sort_by_parameter_order=True), [
+                {"user_id": user_id, "patient_condition": "admitted", "medical_record_created": now,
+                 "is_active": True, "blood_transfusion_status": "none"}
+                for user_id in user_ids])
+        record_ids = result.scalars().all()
+        words = np.array(WORDS)
+        rows = [
+            {"medical_record_id": record_id, "nurse_note_date_posted": now - timedelta(hours=n),
+             "nurse_note_focus": "assessment", "nurse_note_text": " ".join(rng.choice(words, rng.integers(20, 80)))}
+            for record_id in record_ids for n in range(notes)]
+        await conn.execute(insert(models.NurseNote), rows)
+    return record_ids
+
+async def main(records: int, notes: int, repeat: int):
+    facility_id = f"BENCH-SEARCH-{datetime.now().timestamp():.0f}"
+    with Timer() as seeding:
+        record_ids = await seed(records, notes, facility_id)
+    async with SessionLocal() as db:
+        rebuilt = await search.rebuild(db, ["nurse_note"])
+
+    note = models.NurseNote
+    results = {}
+    for query_text in QUERIES:
+        like_samples, first_pages, second_pages = [], [], []
+        term = query_text.split()[0]
+        for _ in range(repeat):
+            async with SessionLocal() as db:
+                with Timer() as timer:
+                    await db.execute(
+                        select(note.nurse_note_id).join(models.MedicalRecord).join(models.User)
+                        .where(models.User.facility_id == facility_id, note.nurse_note_text.ilike(f"%{term}%")))
+                like_samples.append(timer.elapsed)
+                with Timer() as timer:
+                    hits, next_cursor = await crud.search_clinical_text(db, query_text, facility_id=facility_id)
+                first_pages.append(timer.elapsed)
+                if next_cursor:
+                    with Timer() as timer:
+                        await crud.search_clinical_text(db, query_text, facility_id=facility_id, cursor=next_cursor)
+                    second_pages.append(timer.elapsed)
+        async with SessionLocal() as db:
+            with Timer() as timer:
+                await crud.search_clinical_text(db, query_text, medical_record_id=record_ids[0])
+        results[query_text] = {
+            "facility_ilike_first_term": summarize(like_samples),
+            "facility_first_page": summarize(first_pages),
+            "facility_second_page": summarize(second_pages),
+            "record_first_page_ms": round(timer.elapsed * 1000, 3),
+            "first_page_hits": len(hits),
+        }
+    await engine.dispose()
+    report({
+        "records": records,
+        "notes": records * notes,
+        "seed_seconds": round(seeding.elapsed, 3),
+        "rebuild": rebuilt,
+        "queries": results,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.records, args.notes, args.repeat))
@@ -0,0 +1,72 @@
+# Rows per second for the /users/ and /user_activity_logs/ list pages loaded
+# and rendered to JSON, as ORM objects validated against the response schema
+# and as loading.RowPlan records encoded by orjson (FAST_JSON_RESPONSES). Both
+# must produce the same bytes.
+#
+#   DATABASE_URL=... python -m benchmarks.serialization --limit 100 --repeat 50
+import argparse
+import asyncio
+import json
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from postgre_app import crud, loading, schemas
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+# What FastAPI sends for a response_model endpoint returning ORM objects.
+def fastapi_json(schema, value) -> bytes:
+    adapter = TypeAdapter(schema)
+    content = jsonable_encoder(adapter.dump_python(adapter.validate_python(value, from_attributes=True)))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+async def compare(load, schema, repeat: int) -> dict:
+    results = {}
+    for as_rows in (False, True):
+        samples = []
+        for _ in range(repeat):
+            async with SessionLocal() as db:
+                with Timer() as timer:
+                    value = await load(db, as_rows)
+                    body = loading.render(schema, value, as_rows)
+            samples.append(timer.elapsed)
+        rows = len(value["items"] if isinstance(value, dict) else value)
+        results["rows" if as_rows else "orm"] = {
+            **summarize(samples),
+            "rows_per_second": round(rows * len(samples) / sum(samples)),
+        }
+        if as_rows:
+            assert body == expected, f"{schema} renders differently from RowPlan records"
+        else:
+            expected = body
+            assert fastapi_json(schema, value) == body
+    results["rows_per_page"] = rows
+    results["bytes"] = len(body)
+    results["speedup"] = round(results["orm"]["mean_ms"] / results["rows"]["mean_ms"], 2)
+    return results
+
+async def main(limit: int, repeat: int):
+    async def users(db, as_rows):
+        plan = loading.row_plan_for(schemas.User) if as_rows else crud.user_plan
+        users, next_cursor = await crud.get_users_page(db, limit=limit, plan=plan)
+        return {"items": users, "next_cursor": next_cursor}
+
+    async def user_activity_logs(db, as_rows):
+        plan = loading.row_plan_for(schemas.UserActivityLog) if as_rows else crud.user_activity_log_plan
+        return await crud.get_user_activity_logs(db, limit=limit, plan=plan)
+
+    result = {
+        "limit": limit,
+        "read_users": await compare(users, schemas.UserPage, repeat),
+        "read_user_activity_logs": await compare(user_activity_logs, list[schemas.UserActivityLog], repeat),
+    }
+    await engine.dispose()
+    report(result)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.limit, args.repeat))
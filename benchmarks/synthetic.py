@@ -0,0 +1,364 @@
+# Seeded synthetic EMR data for benchmarks: staff and patient users, patients,
+# medical records, chief complaints and every table hanging off them, written
+# CHUNK_PATIENTS patients at a time with COPY on Postgres (executemany
+# elsewhere). The same --seed and --patients give the same rows (bar the
+# password hash's salt); ids start after the rows already there. Early warning
+# scores and the search index are then built by news2.rescore and
+# search.rebuild. Every generated user's password is SYNTHETIC_PASSWORD, and
+# the newest synthetic_admin_* user is an admin authorized for every facility
+# (see benchmarks.load_test).
+#
+#   DATABASE_URL=... python -m benchmarks.synthetic --patients 100000 --seed 1
+#   DATABASE_URL=sqlite+aiosqlite:///emrs.db python -m benchmarks.synthetic --patients 1000
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert, select, text
+
+from postgre_app import bmi, migrate, models, news2, partitions, passwords, search
+from postgre_app.database import Base, SessionLocal, engine
+
+from .common import report
+
+SYNTHETIC_PASSWORD = "synthetic-password"
+ADMIN_USERNAME_PREFIX = "synthetic_admin_"
+# Patients per transaction. Fixed, so the data depends only on seed and scale.
+CHUNK_PATIENTS = 5000
+PATIENTS_PER_FACILITY = 2000
+STAFF_PER_FACILITY = 20
+# Clinical rows are dated within these years; log rows in the LOG_MONTHS
+# months before LOG_END.
+CLINICAL_START = datetime(2015, 1, 1)
+CLINICAL_END = datetime(2026, 1, 1)
+LOG_END = datetime(2026, 1, 1)
+LOG_MONTHS = 6
+# Distinct generated values per column; rows draw from these.
+POOL_SIZE = 1024
+
+# Rows per parent row, drawn uniformly from (low, high).
+PER_PATIENT = {
+    models.PatientRace: (1, 1),
+    models.EmergencyContact: (0, 2),
+}
+PER_USER = {
+    models.UserLoginLog: (0, 4),
+    models.UserActivityLog: (0, 8),
+}
+PER_RECORD = {
+    models.SocialHistory: (1, 1),
+    models.ChiefComplaint: (1, 4),
+    models.Admission: (0, 1),
+    models.Allergy: (0, 2),
+    models.Appointment: (0, 3),
+    models.BloodRelative: (0, 1),
+    models.FamilyIllness: (0, 2),
+    models.Immunization: (0, 3),
+    models.NurseNote: (0, 3),
+    models.Visit: (0, 3),
+}
+PER_COMPLAINT = {
+    models.Vital: (1, 3),
+    models.Assessment: (1, 1),
+    models.Diagnosis: (0, 1),
+    models.HistoryPresentIllness: (1, 1),
+    models.Illness: (0, 1),
+    models.Medication: (0, 2),
+    models.PhysicalExam: (1, 1),
+    models.Plan: (1, 1),
+    models.ReviewOfSystems: (0, 1),
+    models.SurgicalRelatedProblem: (0, 1),
+    models.Treatment: (0, 2),
+}
+
+WORDS = (
+    "acute chronic mild moderate severe pain fever cough dyspnea chest abdominal headache nausea vomiting "
+    "fatigue dizziness swelling rash wound infection hypertension diabetes asthma fracture sprain anxiety "
+    "insomnia stable improving worsening review prescribed discharged admitted monitored left right "
+    "bilateral intermittent persistent tenderness lesion murmur wheeze edema palpitations syncope"
+).split()
+FIRST_NAMES = ("Ana Ben Chloe Dmitri Elena Farid Grace Hiro Ines Jamal Kofi Lena Mateo Nia Omar Priya "
+               "Quinn Rosa Sven Tariq Uma Viktor Wen Yara Zoe").split()
+LAST_NAMES = ("Adeyemi Bauer Castillo Dubois Eriksen Fischer Garcia Haddad Ivanova Jensen Kim Lopez "
+              "Moreau Nakamura Okafor Petrov Quispe Rossi Schmidt Tanaka Usman Varga Wong Yilmaz Zhang").split()
+CITIES = ("Springfield Riverton Lakeside Fairview Greenville Oakridge Hillcrest Maplewood").split()
+
+def facility_id(index: int) -> str:
+    return f"FAC{index:05d}"
+
+# Random values of a column's type: short phrases for bounded strings,
+# sentences otherwise, and about one None in ten for nullable columns.
+def _pool(rng: random.Random, column) -> list:
+    python_type = column.type.python_type
+    length = getattr(column.type, "length", None)
+    span = (CLINICAL_END - CLINICAL_START).total_seconds()
+    values = []
+    for _ in range(POOL_SIZE):
+        if python_type is str:
+            words = rng.choices(WORDS, k=rng.randint(1, 3) if length else rng.randint(4, 16))
+            value = " ".join(words)[:length] if length else " ".join(words).capitalize() + "."
+        elif python_type is bool:
+            value = rng.random() < 0.5
+        elif python_type is int:
+            value = rng.randint(0, 99)
+        elif python_type is float:
+            value = round(rng.uniform(0, 500), 2)
+        elif python_type is datetime:
+            value = CLINICAL_START + timedelta(seconds=int(rng.random() * span))
+        elif python_type is date:
+            value = (CLINICAL_START + timedelta(seconds=int(rng.random() * span))).date()
+        else:
+            raise TypeError(f"No synthetic values for {column}")
+        values.append(value)
+    if column.nullable:
+        values[: POOL_SIZE // 10] = [None] * (POOL_SIZE // 10)
+    return values
+
+class Generator:
+    def __init__(self, seed: int, patients: int, password_hash: str, next_ids: dict):
+        self.seed = seed
+        self.patients = patients
+        self.password_hash = password_hash
+        self.facilities = max(1, -(-patients // PATIENTS_PER_FACILITY))
+        self.staff = self.facilities * STAFF_PER_FACILITY
+        self.next_ids = next_ids
+        self.user_base = next_ids[models.User]
+        self.record_base = next_ids[models.MedicalRecord]
+        self.rows = Counter()
+        self._pools = {}
+
+    def rng(self, *parts) -> random.Random:
+        return random.Random(":".join(map(str, (self.seed, *parts))))
+
+    def _values(self, rng: random.Random, column, n: int) -> list:
+        pool = self._pools.get(column)
+        if pool is None:
+            pool = self._pools[column] = _pool(self.rng("pool", column.table.name, column.name), column)
+        return rng.choices(pool, k=n)
+
+    def ids(self, model, n: int) -> list:
+        start = self.next_ids[model]
+        self.next_ids[model] = start + n
+        return list(range(start, start + n))
+
+    # n rows of model as (column names, tuples), with the fixed columns as
+    # given and the rest drawn from the column pools.
+    def table(self, model, n: int, chunk, **fixed) -> tuple[list, list]:
+        rng = self.rng(model.__tablename__, chunk)
+        columns = model.__table__.columns
+        key = model.__table__.autoincrement_column
+        if key is not None and key.name not in fixed:
+            fixed[key.name] = self.ids(model, n)
+        values = [fixed[column.name] if column.name in fixed else self._values(rng, column, n) for column in columns]
+        self.rows[model.__tablename__] += n
+        return [column.name for column in columns], list(zip(*values))
+
+    # Repeat each parent key once per child, with the child counts drawn from
+    # (low, high).
+    def expand(self, rng: random.Random, low: int, high: int, *parent_keys: list) -> list[list]:
+        counts = rng.choices(range(low, high + 1), k=len(parent_keys[0]))
+        return [[key for key, count in zip(keys, counts) for _ in range(count)] for keys in parent_keys]
+
+    # The last `admins` users are admins.
+    def users(self, user_ids: list, usernames: list, facilities: list, chunk, admins: int = 0) -> tuple[list, list]:
+        rng = self.rng("users", chunk)
+        n = len(user_ids)
+        span = (CLINICAL_END - CLINICAL_START).total_seconds()
+        return self.table(
+            models.User, n, chunk,
+            user_id=user_ids,
+            username=usernames,
+            email=[f"{username}@example.org" for username in usernames],
+            user_first_name=rng.choices(FIRST_NAMES, k=n),
+            user_middle_initial=rng.choices("ABCDEFGHJKLMNPRSTW", k=n),
+            user_last_name=rng.choices(LAST_NAMES, k=n),
+            user_date_of_birth=[date(1930, 1, 1) + timedelta(days=days) for days in rng.choices(range(32000), k=n)],
+            user_date_created=[CLINICAL_START + timedelta(seconds=int(rng.random() * span)) for _ in range(n)],
+            facility_id=facilities,
+            is_active=[True] * n,
+            is_admin=[False] * (n - admins) + [True] * admins,
+            hashed_password=[self.password_hash] * n,
+            user_city=rng.choices(CITIES, k=n),
+            user_phone_number=[f"555{number:07d}" for number in rng.choices(range(10_000_000), k=n)],
+        )
+
+    def logs(self, user_ids: list, chunk) -> list:
+        tables = []
+        span = LOG_MONTHS * 30 * 86400
+        for model, (low, high) in PER_USER.items():
+            rng = self.rng(model.__tablename__, "count", chunk)
+            (users,) = self.expand(rng, low, high, user_ids)
+            times = [LOG_END - timedelta(seconds=seconds) for seconds in rng.choices(range(1, span), k=len(users))]
+            tables.append((model, self.table(model, len(users), chunk, user_id=users, user_date_time_of_activity=times)))
+        return tables
+
+    # Staff users, one facility each, plus an admin authorized for every facility.
+    def staff_tables(self) -> list:
+        chunk = "staff"
+        staff_ids = [self.user_base + index for index in range(self.staff)]
+        admin_id = self.user_base + self.staff
+        user_ids = staff_ids + [admin_id]
+        usernames = [f"synthetic_staff_{user_id}" for user_id in staff_ids] + [f"{ADMIN_USERNAME_PREFIX}{admin_id}"]
+        facilities = [facility_id(index % self.facilities) for index in range(self.staff)] + [facility_id(0)]
+        self.next_ids[models.User] = admin_id + 1
+        authorized = facilities[:-1] + [facility_id(index) for index in range(self.facilities)]
+        authorized_users = staff_ids + [admin_id] * self.facilities
+        return [
+            (models.User, self.users(user_ids, usernames, facilities, chunk, admins=1)),
+            (models.Nonpatient, self.table(models.Nonpatient, len(user_ids), chunk, user_id=user_ids)),
+            (models.UserAuthorizedFacility, self.table(
+                models.UserAuthorizedFacility, len(authorized), chunk, user_id=authorized_users, facility_id=authorized)),
+            *self.logs(user_ids, chunk),
+        ]
+
+    def patient_tables(self, chunk: int) -> list:
+        first = chunk * CHUNK_PATIENTS
+        patients = range(first, min(first + CHUNK_PATIENTS, self.patients))
+        user_base = self.user_base + self.staff + 1
+        user_ids = [user_base + patient for patient in patients]
+        record_ids = [self.record_base + patient for patient in patients]
+        facility_indexes = [patient % self.facilities for patient in patients]
+        n = len(user_ids)
+        tables = [
+            (models.User, self.users(user_ids, [f"synthetic_patient_{user_id}" for user_id in user_ids],
+                                     [facility_id(index) for index in facility_indexes], chunk)),
+            (models.Patient, self.table(models.Patient, n, chunk, user_id=user_ids,
+                                        patient_gender_at_birth=self.rng("gender", chunk).choices(["F", "M"], k=n))),
+            # Each patient is assigned to one of their facility's staff.
+            (models.PhysicianAssignedPatient, self.table(
+                models.PhysicianAssignedPatient, n, chunk, patient_user_id=user_ids,
+                staff_user_id=[self.user_base + index + self.facilities * (patient // self.facilities % STAFF_PER_FACILITY)
+                               for index, patient in zip(facility_indexes, patients)])),
+        ]
+        self.next_ids[models.User] = max(self.next_ids[models.User], user_ids[-1] + 1)
+        for model, (low, high) in PER_PATIENT.items():
+            (users,) = self.expand(self.rng(model.__tablename__, "count", chunk), low, high, user_ids)
+            tables.append((model, self.table(model, len(users), chunk, user_id=users)))
+        tables.append((models.MedicalRecord, self.table(
+            models.MedicalRecord, n, chunk, medical_record_id=record_ids, user_id=user_ids, is_active=[True] * n)))
+        self.next_ids[models.MedicalRecord] = max(self.next_ids[models.MedicalRecord], record_ids[-1] + 1)
+
+        complaint_ids = complaint_records = []
+        for model, (low, high) in PER_RECORD.items():
+            (records,) = self.expand(self.rng(model.__tablename__, "count", chunk), low, high, record_ids)
+            if model is models.ChiefComplaint:
+                complaint_ids = self.ids(model, len(records))
+                complaint_records = records
+                tables.append((model, self.table(model, len(records), chunk, chief_complaint_id=complaint_ids,
+                                                 medical_record_id=records)))
+            else:
+                tables.append((model, self.table(model, len(records), chunk, medical_record_id=records)))
+        for model, (low, high) in PER_COMPLAINT.items():
+            complaints, records = self.expand(
+                self.rng(model.__tablename__, "count", chunk), low, high, complaint_ids, complaint_records)
+            fixed = self.vitals(len(complaints), chunk) if model is models.Vital else {}
+            tables.append((model, self.table(model, len(complaints), chunk, chief_complaint_id=complaints,
+                                             medical_record_id=records, **fixed)))
+        return tables + self.logs(user_ids, chunk)
+
+    # Readings in plausible ranges, so early warning scores spread over every
+    # risk level.
+    def vitals(self, n: int, chunk) -> dict:
+        rng = self.rng("vitals", "readings", chunk)
+        def uniform(low, high, digits=1):
+            return [round(rng.uniform(low, high), digits) for _ in range(n)]
+        heights, weights = uniform(145, 200), uniform(40, 140)
+        return {
+            "vitals_height": heights,
+            "vitals_weight": weights,
+            "vitals_calculated_bmi": [float(value) for value in bmi.calculate_bmi_array(heights, weights)],
+            "vitals_temperature": uniform(34.5, 40.5),
+            "vitals_pulse": uniform(35, 145, 0),
+            "vitals_respiratory_rate": uniform(7, 30, 0),
+            "vitals_blood_pressure_systolic": uniform(85, 225, 0),
+            "vitals_blood_pressure_diastolic": uniform(45, 120, 0),
+            "vitals_arterial_blood_oxygen_saturation": uniform(88, 100, 0),
+        }
+
+async def write(conn, model, names: list, rows: list):
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(model.__tablename__, records=rows, columns=names)
+    else:
+        await conn.execute(insert(model), [dict(zip(names, row)) for row in rows])
+
+async def prepare_schema() -> dict:
+    postgres = engine.dialect.name == "postgresql"
+    if postgres:
+        await migrate.upgrade_database()
+    else:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await migrate.stamp_database()
+    next_ids = {}
+    async with engine.connect() as conn:
+        if postgres:
+            month = (LOG_END - timedelta(days=LOG_MONTHS * 31)).date().replace(day=1)
+            while month < LOG_END.date():
+                await partitions.ensure_partitions(conn, month)
+                month = partitions.add_months(month, 1)
+            await conn.commit()
+        for model in (models.User, models.MedicalRecord, *PER_PATIENT, *PER_USER, *PER_RECORD, *PER_COMPLAINT,
+                      models.UserAuthorizedFacility):
+            key = model.__table__.autoincrement_column
+            next_ids[model] = (await conn.scalar(select(func.coalesce(func.max(key), 0)))) + 1
+    return next_ids
+
+# Move each generated table's id sequence past the ids written explicitly.
+async def advance_sequences(conn, generated: list):
+    for model in generated:
+        key = model.__table__.autoincrement_column
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', '{key.name}'),"
+            f" (SELECT max({key.name}) FROM {model.__tablename__}))"))
+
+async def main(patients: int, seed: int):
+    started = time.perf_counter()
+    next_ids = await prepare_schema()
+    generator = Generator(seed, patients, passwords.hash_password(SYNTHETIC_PASSWORD), next_ids)
+    async with engine.begin() as conn:
+        for model, (names, rows) in generator.staff_tables():
+            await write(conn, model, names, rows)
+    for chunk in range(-(-patients // CHUNK_PATIENTS)):
+        async with engine.begin() as conn:
+            for model, (names, rows) in generator.patient_tables(chunk):
+                await write(conn, model, names, rows)
+    loaded = time.perf_counter()
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await advance_sequences(conn, list(next_ids))
+    async with SessionLocal() as db:
+        scores = await news2.rescore(db)
+        # Other databases search an in-memory index, which the server loads
+        # at startup.
+        indexed = await search.rebuild(db) if engine.dialect.name == "postgresql" else {}
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("ANALYZE"))
+    await engine.dispose()
+    rows = sum(generator.rows.values())
+    report({
+        "seed": seed,
+        "patients": patients,
+        "facilities": generator.facilities,
+        "staff": generator.staff,
+        "rows": rows,
+        "rows_by_table": dict(generator.rows),
+        "load_seconds": round(loaded - started, 1),
+        "rows_per_second": round(rows / (loaded - started)),
+        "early_warning_scores": scores,
+        "search_index": indexed,
+        "total_seconds": round(time.perf_counter() - started, 1),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.patients, args.seed))
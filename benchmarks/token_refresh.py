@@ -0,0 +1,63 @@
+# Compare renewing a session with a password login (bcrypt) against a
+# refresh token rotation, and time the revocation check every authenticated
+# request makes with many access tokens revoked.
+#
+#   DATABASE_URL=... python -m benchmarks.token_refresh --repeat 200 --revoked 100000
+import argparse
+import asyncio
+import timeit
+from datetime import datetime, timedelta
+
+from postgre_app import crud, passwords, schemas, tokens
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+BENCH_PASSWORD = "bench-password"
+
+async def seed() -> str:
+    username = f"bench_refresh_{datetime.now().timestamp():.0f}"
+    async with SessionLocal() as db:
+        await crud.create_user(db, schemas.UserCreate(
+            username=username, user_first_name="Bench", user_last_name="Refresh",
+            user_date_of_birth="1980-01-01", facility_id="BENCH", hashed_password=BENCH_PASSWORD))
+    return username
+
+async def main(repeat: int, revoked: int):
+    username = await seed()
+    login_samples, refresh_samples = [], []
+    async with SessionLocal() as db:
+        user = await crud.get_user_by_username(db, username)
+        token = await crud.issue_tokens(db, user.user_id, username)
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            with Timer() as timer:
+                user = await crud.authenticate_user(db, username, BENCH_PASSWORD)
+                await crud.issue_tokens(db, user.user_id, username)
+        login_samples.append(timer.elapsed)
+        async with SessionLocal() as db:
+            with Timer() as timer:
+                token = await crud.refresh_tokens(db, token.refresh_token)
+        refresh_samples.append(timer.elapsed)
+
+    expires_at = datetime.now() + timedelta(minutes=crud.ACCESS_TOKEN_EXPIRE_MINUTES)
+    tokens.revocations.add({tokens.new_jti(): expires_at for _ in range(revoked)})
+    jti = tokens.new_jti()
+    checks = 1_000_000
+    check_seconds = timeit.timeit(lambda: tokens.revocations.is_revoked(jti), number=checks)
+    await engine.dispose()
+    passwords.pool.shutdown()
+    report({
+        "repeat": repeat,
+        "login": summarize(login_samples),
+        "refresh": summarize(refresh_samples),
+        "revoked_tokens": revoked,
+        "revocation_check_ns": round(check_seconds / checks * 1e9, 1),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--revoked", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat, args.revoked))
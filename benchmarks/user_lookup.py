@@ -0,0 +1,149 @@
+# Time typo-tolerant user lookup against a large users table. Synthetic users
+# are generated server side (INSERT ... SELECT generate_series) from the same
+# formulas synthetic_user() uses here, so queries can be built from known
+# users with typos added and recall measured. Users already seeded by an
+# earlier run are kept; only the missing ones are inserted.
+#
+#   DATABASE_URL=... python -m benchmarks.user_lookup --users 5000000
+import argparse
+import asyncio
+import hashlib
+import random
+from datetime import date, datetime, timedelta
+from sqlalchemy import Date, Integer, String, bindparam, cast, func, insert, literal, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.expression import Grouping
+
+from postgre_app import lookup, models
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+FIRST_NAMES = (
+    "james mary robert patricia john jennifer michael linda david elizabeth william barbara richard susan joseph "
+    "jessica thomas sarah charles karen christopher lisa daniel nancy matthew betty anthony margaret mark sandra "
+    "donald ashley steven kimberly paul emily andrew donna joshua michelle kenneth carol kevin amanda brian "
+    "dorothy george melissa timothy deborah ronald stephanie edward rebecca jason sharon jeffrey laura ryan "
+    "cynthia jacob kathleen gary amy nicholas angela eric shirley jonathan anna stephen brenda larry pamela "
+    "justin emma scott nicole brandon helen benjamin samantha samuel katherine gregory christine alexander debra"
+).split()
+ONSETS = "b br c ch cl d dr f fl g gr h j k kr l m n p pr r s sh sk st t th tr v w wh z".split()
+VOWELS = "a e i o u ai au ea ee oo ou y".split()
+CODAS = ["", *"b ck d ff g l ll m n nd ng nt r rd rs s ss t tt x z".split()]
+SYLLABLES = [onset + vowel + coda for onset in ONSETS for vowel in VOWELS for coda in CODAS]
+BIRTH_EPOCH = date(1930, 1, 1)
+BIRTH_DAYS = 30000
+
+# Independent pseudo-random fields per user number: 28 bits of md5, computed
+# the same way in Python and in SQL.
+def field_hash(field: str, n: int) -> int:
+    return int(hashlib.md5(f"{field}{n}".encode()).hexdigest()[:7], 16)
+
+def sql_field_hash(field: str, n):
+    return cast(cast(literal("x") + func.substr(func.md5(literal(field) + cast(n, String)), 1, 7), postgresql.BIT(28)), Integer)
+
+def synthetic_user(n: int) -> dict:
+    last = SYLLABLES[field_hash("a", n) % len(SYLLABLES)] + SYLLABLES[field_hash("b", n) % len(SYLLABLES)]
+    digits = f"{field_hash('p', n) % 100000:05d}{field_hash('q', n) % 100000:05d}"
+    return {
+        "username": f"bench_lookup_{n}",
+        "user_first_name": FIRST_NAMES[field_hash("f", n) % len(FIRST_NAMES)].capitalize(),
+        "user_last_name": last.capitalize(),
+        "user_date_of_birth": BIRTH_EPOCH + timedelta(days=field_hash("d", n) % BIRTH_DAYS),
+        "user_phone_number": f"({digits[:3]}) {digits[3:6]}-{digits[6:]}",
+    }
+
+def synthetic_users_query(start: int, stop: int):
+    n = func.generate_series(start, stop).column_valued("n")
+    # Parenthesised so Postgres accepts a subscript on the array parameter.
+    syllables = Grouping(bindparam("syllables", SYLLABLES, type_=postgresql.ARRAY(String)))
+    first_names = Grouping(bindparam("first_names", FIRST_NAMES, type_=postgresql.ARRAY(String)))
+    digits = func.concat(func.lpad(cast(sql_field_hash("p", n) % 100000, String), 5, "0"),
+                         func.lpad(cast(sql_field_hash("q", n) % 100000, String), 5, "0"))
+    return select(
+        literal("bench_lookup_") + cast(n, String),
+        func.initcap(first_names[sql_field_hash("f", n) % len(FIRST_NAMES) + 1]),
+        func.initcap(syllables[sql_field_hash("a", n) % len(SYLLABLES) + 1]
+                     + syllables[sql_field_hash("b", n) % len(SYLLABLES) + 1]),
+        cast(literal(BIRTH_EPOCH), Date) + sql_field_hash("d", n) % BIRTH_DAYS,
+        literal("(") + func.substr(digits, 1, 3) + ") " + func.substr(digits, 4, 3) + "-" + func.substr(digits, 7, 4),
+        literal(datetime.now()), literal("BENCH-LOOKUP"), literal(True), literal("x"),
+    )
+
+async def seed(users: int, chunk: int = 250_000) -> int:
+    async with engine.connect() as conn:
+        seeded = (await conn.execute(select(func.count()).select_from(models.User).where(
+            models.User.username.like("bench_lookup_%")))).scalar_one()
+    columns = ["username", "user_first_name", "user_last_name", "user_date_of_birth", "user_phone_number",
+               "user_date_created", "facility_id", "is_active", "hashed_password"]
+    for start in range(seeded + 1, users + 1, chunk):
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.User).from_select(columns, synthetic_users_query(start, min(users, start + chunk - 1))))
+    if seeded < users:
+        async with engine.connect() as conn:
+            await conn.execute(text("ANALYZE users"))
+    return users - seeded
+
+# Typical registration desk typos: a swapped pair, a dropped letter or a
+# wrong letter.
+def typo(word: str, rng: random.Random) -> str:
+    position = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("swap", "drop", "replace"))
+    if kind == "swap":
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    if kind == "drop":
+        return word[:position] + word[position + 1:]
+    return word[:position] + rng.choice("aeiourstln") + word[position + 1:]
+
+async def measure(queries: list, limit: int) -> dict:
+    samples, found = [], 0
+    for username, criteria in queries:
+        async with SessionLocal() as db:
+            with Timer() as timer:
+                candidates = await lookup.lookup(db, limit=limit, **criteria)
+        samples.append(timer.elapsed)
+        found += any(candidate["username"] == username for candidate in candidates)
+    return {"latency": summarize(samples), f"recall_at_{limit}": round(found / len(queries), 3)}
+
+async def main(users: int, samples: int, limit: int):
+    with Timer() as seeding:
+        inserted = await seed(users)
+    rng = random.Random(0)
+    targets = [synthetic_user(rng.randrange(1, users + 1)) for _ in range(samples)]
+    cases = {
+        "name_with_typo": [
+            (user["username"], {"name": f"{user['user_first_name']} {typo(user['user_last_name'], rng)}"})
+            for user in targets],
+        "name_with_typo_and_birth_date": [
+            (user["username"], {"name": f"{typo(user['user_first_name'], rng)} {typo(user['user_last_name'], rng)}",
+                                "date_of_birth": user["user_date_of_birth"]})
+            for user in targets],
+        "partial_last_name_and_birth_date": [
+            (user["username"], {"name": user["user_last_name"][:4], "date_of_birth": user["user_date_of_birth"]})
+            for user in targets],
+        "last_seven_phone_digits": [
+            (user["username"], {"phone": lookup.normalize_phone(user["user_phone_number"])[-7:]})
+            for user in targets],
+        "duplicate_registration": [
+            (user["username"], {"name": f"{user['user_first_name']} {typo(user['user_last_name'], rng)}",
+                                "date_of_birth": user["user_date_of_birth"], "phone": user["user_phone_number"]})
+            for user in targets],
+    }
+    await measure(cases["name_with_typo"][:10], limit)
+    results = {name: await measure(queries, limit) for name, queries in cases.items()}
+    await engine.dispose()
+    report({
+        "users": users,
+        "inserted": inserted,
+        "seed_seconds": round(seeding.elapsed, 3),
+        "limit": limit,
+        "cases": results,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5_000_000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.samples, args.limit))
@@ -0,0 +1,98 @@
+# Compare charting one record's vitals as one schemas.Vital object per reading
+# with the downsampled columnar series, reporting latency and response size.
+#
+#   DATABASE_URL=... python -m benchmarks.vitals_series --readings 20000 --points 300
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+import numpy as np
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import raiseload
+
+from postgre_app import models, schemas, vitals
+from postgre_app.database import SessionLocal, engine
+
+from .common import Timer, report, summarize
+
+async def seed_record(readings: int) -> int:
+    rng = np.random.default_rng(0)
+    async with SessionLocal() as db:
+        user = models.User(
+            username=f"bench_vitals_{datetime.now().timestamp()}", user_first_name="Bench",
+            user_last_name="Vitals", user_date_of_birth=date(1970, 1, 1), user_date_created=datetime.now(),
+            facility_id="BENCH", is_active=True, hashed_password="x")
+        db.add(user)
+        await db.flush()
+        record = models.MedicalRecord(
+            user_id=user.user_id, patient_condition="critical", medical_record_created=datetime.now(),
+            is_active=True, blood_transfusion_status="none")
+        db.add(record)
+        await db.flush()
+        complaint = models.ChiefComplaint(
+            medical_record_id=record.medical_record_id, chief_complaint_statement="monitoring",
+            chief_complaint_date=datetime.now())
+        db.add(complaint)
+        await db.flush()
+        start = datetime(2020, 1, 1)
+        pulse = 80 + np.cumsum(rng.normal(0, 0.5, readings))
+        rows = [{
+            "medical_record_id": record.medical_record_id,
+            "chief_complaint_id": complaint.chief_complaint_id,
+            "vitals_date_taken": start + timedelta(minutes=n),
+            "vitals_temperature": float(36.8 + rng.normal(0, 0.2)),
+            "vitals_pulse": float(pulse[n]),
+            "vitals_respiratory_rate": float(rng.integers(12, 24)),
+            "vitals_blood_pressure_systolic": float(rng.normal(120, 8)),
+            "vitals_blood_pressure_diastolic": float(rng.normal(80, 6)),
+            "vitals_arterial_blood_oxygen_saturation": float(rng.normal(96, 1.5)),
+        } for n in range(readings)]
+        await db.execute(insert(models.Vital), rows)
+        await db.commit()
+        return record.medical_record_id
+
+async def measure(render, repeat: int) -> dict:
+    samples, size = [], 0
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            with Timer() as timer:
+                body = await render(db)
+        samples.append(timer.elapsed)
+        size = len(body)
+    return {"bytes": size, "latency": summarize(samples)}
+
+async def main(readings: int, points: int, repeat: int):
+    medical_record_id = await seed_record(readings)
+    fields = list(vitals.SERIES_COLUMNS)
+    vital_list = TypeAdapter(list[schemas.Vital])
+
+    async def per_row(db):
+        result = await db.execute(
+            select(models.Vital).options(raiseload("*"))
+            .where(models.Vital.medical_record_id == medical_record_id).order_by(models.Vital.vitals_date_taken))
+        return vital_list.dump_json(vital_list.validate_python(result.scalars().all(), from_attributes=True))
+
+    def series(method, format="json"):
+        async def render(db):
+            payload = await vitals.get_series(db, medical_record_id, fields, method, points)
+            return vitals.RENDERERS[format](payload)
+        return render
+
+    report({
+        "medical_record_id": medical_record_id,
+        "readings": readings,
+        "points": points,
+        "per_row_objects": await measure(per_row, repeat),
+        "buckets_json": await measure(series("buckets"), repeat),
+        "buckets_npz": await measure(series("buckets", "npz"), repeat),
+        "lttb_json": await measure(series("lttb"), repeat),
+    })
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--points", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.readings, args.points, args.repeat))
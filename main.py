@@ -1,61 +1,323 @@
-from typing import Annotated
-from datetime import timedelta
-from fastapi import Depends, FastAPI, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Annotated, Literal, Union
+from datetime import date, datetime
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from postgre_app import crud, models, schemas
+from postgre_app import authorization, bulk_users, crud, exports, formats, loading, log_writer, migrate, partitions, passwords, principals, response_cache, schemas, search, throttle, tokens, vitals
+from postgre_app import database
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if migrate.DB_AUTO_MIGRATE:
+        await migrate.upgrade_database()
+    await search.load_memory_index()
+    leak_watcher = asyncio.create_task(database.leak_guard.watch())
+    partition_maintainer = asyncio.create_task(partitions.watch())
+    revocation_syncer = asyncio.create_task(tokens.revocations.watch())
+    throttle_purger = asyncio.create_task(throttle.logins.watch())
+    replica_monitor = asyncio.create_task(database.router.watch())
+    log_writer.writer.start()
+    yield
+    await log_writer.writer.stop()
+    leak_watcher.cancel()
+    partition_maintainer.cancel()
+    revocation_syncer.cancel()
+    throttle_purger.cancel()
+    replica_monitor.cancel()
+    passwords.pool.shutdown()
+    await database.router.dispose()
+    await database.engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/token")
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    db: AsyncSession = Depends(crud.get_db)
     ) -> crud.Token:
-    db = next(crud.get_db())
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    async with throttle.logins.attempt(form_data.username, throttle.client_address(request)) as attempt:
+        user = await crud.authenticate_user(db, form_data.username, form_data.password)
+        if not user and attempt.failed():
+            locked_user = await crud.get_user_by_username(db, form_data.username)
+            if locked_user is not None:
+                await log_writer.writer.log_login(locked_user.user_id, "lockout")
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=crud.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = crud.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return crud.Token(access_token=access_token, token_type="bearer")
+    await log_writer.writer.log_login(user.user_id, "login")
+    return await crud.issue_tokens(db, user.user_id, user.username)
 
-@app.get("/users/me")
-async def read_users_me(current_user: Annotated[models.User, Depends(crud.get_current_user)]):
+@app.post("/token/refresh")
+async def refresh_access_token(request: crud.RefreshRequest, db: AsyncSession = Depends(crud.get_db)) -> crud.Token:
+    token = await crud.refresh_tokens(db, request.refresh_token)
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token
+
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_token(
+    payload: Annotated[dict, Depends(crud.get_token_payload)],
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_user)],
+    request: Union[crud.RefreshRequest, None] = None,
+    db: AsyncSession = Depends(crud.get_db),
+    ):
+    await crud.revoke_tokens(db, current_user, payload, request.refresh_token if request else None)
+    await log_writer.writer.log_login(current_user.user_id, "logout")
+
+@app.get("/users/me", response_model=schemas.Principal)
+async def read_users_me(current_user: Annotated[principals.Principal, Depends(crud.get_current_user)]):
     return current_user
 
+@app.get("/metrics")
+async def read_metrics(current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)]):
+    authorization.require_role(current_user, principals.ADMIN)
+    return {
+        "principal_cache": principals.cache.stats(),
+        "password_pool": passwords.pool.stats(),
+        "database_pool": database.pool_stats(),
+        "database_replicas": database.router.stats(),
+        "log_writer": log_writer.writer.stats(),
+        "token_revocations": tokens.revocations.stats(),
+        "login_throttle": throttle.logins.stats(),
+        "response_cache": response_cache.cache.stats(),
+    }
+
+# Staff register users in the facilities they may read.
 @app.post("/users/", response_model=schemas.User)
-async def create_user(user: schemas.UserCreate, db: Session = Depends(crud.get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+async def create_user(
+    user: schemas.UserCreate,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    db: AsyncSession = Depends(crud.get_db),
+):
+    authorization.require_registrar(current_user, user.facility_id)
+    db_user = await crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already exists")
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
+
+# Accepts a JSON array of schemas.UserCreate, or one per line with
+# Content-Type: application/x-ndjson. Rows that fail are listed in errors.
+# Admins only, and only into the facilities they may read.
+@app.post("/users/bulk", response_model=schemas.BulkUserReport)
+async def create_users_bulk(
+    request: Request,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    db: AsyncSession = Depends(crud.get_db),
+):
+    authorization.require_role(current_user, principals.ADMIN)
+    return await bulk_users.create_users(db, current_user, bulk_users.read_request_items(request))
+
+# Pass cursor (empty for the first page) to page by key and get next_cursor
+# back; skip/limit remain for existing clients. Served from
+# response_cache.cache with an ETag; send it back in If-None-Match to get a
+# 304 while nothing has changed. Accept one of formats.MEDIA_TYPES for a
+# columnar page of the top-level fields.
+@app.get("/users/", response_model=Union[list[schemas.User], schemas.UserPage])
+async def read_users(
+    request: Request,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    skip: int = 0, limit: int = 100, cursor: Union[str, None] = None, db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    variant = formats.negotiate(request)
+    cached = response_cache.cache.get(request, current_user, variant)
+    if cached is not None:
+        return cached
+    plan = formats.plan_for(variant, schemas.User)
+    if cursor is not None:
+        users, next_cursor = await crud.get_users_page(db, cursor=cursor, limit=limit, plan=plan)
+        body = formats.render(variant, plan, schemas.UserPage, {"items": users, "next_cursor": next_cursor})
+    else:
+        users = await crud.get_users(db, skip=skip, limit=limit, plan=plan)
+        body = formats.render(variant, plan, list[schemas.User], users)
+    return response_cache.cache.put(request, current_user, body, (response_cache.USER_LISTS,), variant)
+
+# Typo-tolerant registration desk search by any of partial name, date of birth
+# and phone number, best matches first.
+@app.get("/users/lookup", response_model=list[schemas.UserLookupCandidate])
+async def lookup_users(
+    name: Annotated[Union[str, None], Query(max_length=100)] = None,
+    date_of_birth: Union[date, None] = None,
+    phone: Annotated[Union[str, None], Query(max_length=30)] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    if not (name or date_of_birth or phone):
+        raise HTTPException(status_code=422, detail="Give at least one of name, date_of_birth or phone")
+    return await crud.lookup_users(db, name=name, date_of_birth=date_of_birth, phone=phone, limit=limit)
 
-@app.get("/users/", response_model=list[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(crud.get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+# Existing users that are likely the same person as a registration about to
+# be submitted.
+@app.post("/users/duplicates", response_model=list[schemas.UserLookupCandidate])
+async def find_duplicate_users(user: schemas.UserBase, db: AsyncSession = Depends(crud.get_authorized_db)):
+    return await crud.find_duplicate_users(db, user)
 
 @app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(crud.get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
+async def read_user(
+    user_id: int,
+    request: Request,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    cached = response_cache.cache.get(request, current_user)
+    if cached is not None:
+        return cached
+    db_user = await crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return response_cache.cache.put(request, current_user, loading.render(schemas.User, db_user),
+                                    (response_cache.user_tag(user_id),))
 
-@app.post("/users/{user_id}/user_activity_logs", response_model=schemas.UserActivityLog)
-def create_activity_log_for_user(
-    user_id: int, user_activity_log: schemas.UserActivityLogCreate, db: Session = Depends(crud.get_db)
+# The row is buffered by log_writer.writer and written with the next batch,
+# so the response is the accepted row, without its id. Users log their own
+# activity; staff may log it for the users they can read.
+@app.post("/users/{user_id}/user_activity_logs", response_model=schemas.UserActivityLogCreate,
+          status_code=status.HTTP_202_ACCEPTED)
+async def create_activity_log_for_user(
+    user_id: int,
+    user_activity_log: schemas.UserActivityLogCreate,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    db: AsyncSession = Depends(crud.get_authorized_write_db),
 ):
-    return crud.create_user_activity_log(db=db, user_activity_log=user_activity_log, user_id=user_id)
+    if user_id != current_user.user_id:
+        authorization.require_role(current_user, principals.STAFF, principals.ADMIN)
+    # A row for a missing user would fail every batch it was retried in.
+    if not await crud.user_exists(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    await log_writer.writer.log_activity(
+        user_id, user_activity_log.activity_description, user_activity_log.user_date_time_of_activity)
+    return user_activity_log.model_copy(update={"user_id": user_id})
+
+@app.get("/user_activity_logs/", response_model=Union[list[schemas.UserActivityLog], schemas.UserActivityLogPage])
+async def read_user_activity_logs(
+    request: Request,
+    skip: int = 0, limit: int = 100, cursor: Union[str, None] = None,
+    since: Union[datetime, None] = None, until: Union[datetime, None] = None,
+    db: AsyncSession = Depends(crud.get_authorized_db)
+):
+    variant = formats.negotiate(request)
+    plan = formats.plan_for(variant, schemas.UserActivityLog)
+    if cursor is not None:
+        user_activity_logs, next_cursor = await crud.get_user_activity_logs_page(
+            db, cursor=cursor, limit=limit, since=since, until=until, plan=plan)
+        schema, value = schemas.UserActivityLogPage, {"items": user_activity_logs, "next_cursor": next_cursor}
+    else:
+        schema, value = list[schemas.UserActivityLog], await crud.get_user_activity_logs(
+            db, skip=skip, limit=limit, since=since, until=until, plan=plan)
+    return formats.response(variant, formats.render(variant, plan, schema, value))
+
+@app.get("/medical_records/{medical_record_id}", response_model=schemas.MedicalRecord)
+async def read_medical_record(
+    medical_record_id: int,
+    request: Request,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    cached = response_cache.cache.get(request, current_user)
+    if cached is not None:
+        return cached
+    db_medical_record = await crud.get_medical_record(db, medical_record_id=medical_record_id)
+    if db_medical_record is None:
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    return response_cache.cache.put(request, current_user, loading.render(schemas.MedicalRecord, db_medical_record),
+                                    (response_cache.medical_record_tag(medical_record_id),))
+
+# Vitals feed early warning scores, so only staff record them.
+@app.post("/vitals/", response_model=schemas.Vital)
+async def create_vital(
+    vital: schemas.VitalCreate,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    db: AsyncSession = Depends(crud.get_authorized_write_db),
+):
+    authorization.require_role(current_user, principals.STAFF, principals.ADMIN)
+    if not await authorization.can_read_medical_record(db, vital.medical_record_id):
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    return await crud.create_vital(db=db, vital=vital)
+
+@app.get("/medical_records/{medical_record_id}/vitals/series")
+async def read_vitals_series(
+    medical_record_id: int,
+    fields: Annotated[Union[list[str], None], Query()] = None,
+    since: Union[datetime, None] = None,
+    until: Union[datetime, None] = None,
+    method: Literal["buckets", "lttb"] = "buckets",
+    points: Annotated[int, Query(ge=3, le=vitals.VITALS_SERIES_MAX_POINTS)] = vitals.VITALS_SERIES_DEFAULT_POINTS,
+    format: Literal["json", "npz"] = "json",
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    fields = fields or list(vitals.SERIES_COLUMNS)
+    unknown = [field for field in fields if field not in vitals.SERIES_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown vitals fields: {', '.join(unknown)}")
+    if not await authorization.can_read_medical_record(db, medical_record_id):
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    payload = await vitals.get_series(db, medical_record_id, fields, method, points, since=since, until=until)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    return Response(content=vitals.RENDERERS[format](payload), media_type=vitals.MEDIA_TYPES[format])
 
-@app.get("/user_activity_logs/", response_model=list[schemas.UserActivityLog])
-def read_user_activity_logs(skip: int = 0, limit: int = 100, db: Session = Depends(crud.get_db)):
-    user_activity_logs = crud.get_user_activity_logs(db, skip=skip, limit=limit)
-    return user_activity_logs
\ No newline at end of file
+@app.get("/facilities/{facility_id}/early_warning_scores", response_model=list[schemas.EarlyWarningScore])
+async def read_highest_risk(
+    facility_id: str,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    limit: Annotated[int, Query(ge=1, le=500)] = 20,
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    authorization.require_facility(current_user, facility_id)
+    return await crud.get_highest_risk(db, facility_id=facility_id, limit=limit)
+
+@app.get("/medical_records/{medical_record_id}/search", response_model=schemas.SearchPage)
+async def search_medical_record(
+    medical_record_id: int,
+    q: Annotated[str, Query(min_length=1, max_length=500)],
+    sources: Annotated[Union[list[str], None], Query()] = None,
+    cursor: str = "",
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    if not await authorization.can_read_medical_record(db, medical_record_id):
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    hits, next_cursor = await crud.search_clinical_text(
+        db, q, medical_record_id=medical_record_id, sources=sources, cursor=cursor, limit=limit)
+    return {"items": hits, "next_cursor": next_cursor}
+
+@app.get("/facilities/{facility_id}/search", response_model=schemas.SearchPage)
+async def search_facility(
+    facility_id: str,
+    q: Annotated[str, Query(min_length=1, max_length=500)],
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    sources: Annotated[Union[list[str], None], Query()] = None,
+    cursor: str = "",
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    db: AsyncSession = Depends(crud.get_authorized_db),
+):
+    authorization.require_facility(current_user, facility_id)
+    hits, next_cursor = await crud.search_clinical_text(
+        db, q, facility_id=facility_id, sources=sources, cursor=cursor, limit=limit)
+    return {"items": hits, "next_cursor": next_cursor}
+
+@app.get("/exports/{export_name}")
+async def export_rows(
+    export_name: str,
+    current_user: Annotated[principals.Principal, Depends(crud.get_current_active_user)],
+    format: Literal["ndjson", "csv"] = "ndjson",
+):
+    authorization.require_role(current_user, principals.ADMIN)
+    if export_name not in exports.EXPORTS:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return StreamingResponse(
+        exports.stream_export(current_user, export_name, format),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_name}.{format}"'},
+    )
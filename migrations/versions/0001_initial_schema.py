@@ -0,0 +1,433 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:52:20.487125
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('username', sa.String(length=75), nullable=False),
+    sa.Column('user_first_name', sa.String(length=35), nullable=False),
+    sa.Column('user_middle_initial', sa.String(length=1), nullable=True),
+    sa.Column('user_last_name', sa.String(length=50), nullable=False),
+    sa.Column('user_date_of_birth', sa.Date(), nullable=False),
+    sa.Column('email', sa.String(length=254), nullable=True),
+    sa.Column('user_date_created', sa.DateTime(), nullable=False),
+    sa.Column('facility_id', sa.String(length=75), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('hashed_password', sa.String(length=68), nullable=False),
+    sa.Column('user_street_address', sa.String(length=100), nullable=True),
+    sa.Column('user_city', sa.String(length=45), nullable=True),
+    sa.Column('user_state', sa.String(length=50), nullable=True),
+    sa.Column('user_country', sa.String(length=55), nullable=True),
+    sa.Column('user_phone_number', sa.String(length=15), nullable=True),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('medical_records',
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('patient_condition', sa.String(), nullable=False),
+    sa.Column('medical_record_created', sa.DateTime(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('blood_transfusion_status', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('medical_record_id')
+    )
+    op.create_table('nonpatients',
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('nonpatient_organization', sa.String(length=100), nullable=False),
+    sa.Column('nonpatient_description', sa.String(), nullable=True),
+    sa.Column('nonpatient_ward_id', sa.String(length=75), nullable=True),
+    sa.Column('nonpatient_staff_position_id', sa.String(length=75), nullable=True),
+    sa.Column('nonpatient_specialty_id', sa.String(length=75), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('patients',
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('patient_provider', sa.String(length=100), nullable=False),
+    sa.Column('patient_provider_id', sa.String(length=60), nullable=False),
+    sa.Column('patient_room', sa.String(length=10), nullable=True),
+    sa.Column('patient_current_gender', sa.String(length=80), nullable=False),
+    sa.Column('patient_type', sa.String(length=20), nullable=False),
+    sa.Column('patient_language_preference', sa.String(length=45), nullable=True),
+    sa.Column('patient_gender_at_birth', sa.String(length=5), nullable=False),
+    sa.Column('patient_sexual_orientation', sa.String(length=75), nullable=False),
+    sa.Column('patient_marital_status', sa.String(length=45), nullable=False),
+    sa.Column('patient_living_arrangement', sa.String(length=75), nullable=False),
+    sa.Column('patient_is_adopted', sa.Boolean(), nullable=False),
+    sa.Column('patient_license_number', sa.String(length=45), nullable=True),
+    sa.Column('patient_vehicle_serial_number', sa.String(length=45), nullable=True),
+    sa.Column('patient_vehicle_plate_number', sa.String(length=45), nullable=True),
+    sa.Column('patient_url', sa.String(length=45), nullable=True),
+    sa.Column('patient_device_serial_number', sa.String(length=45), nullable=True),
+    sa.Column('patient_ip_address', sa.String(length=45), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('physician_assigned_patients',
+    sa.Column('staff_user_id', sa.BigInteger(), nullable=False),
+    sa.Column('patient_user_id', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['staff_user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('staff_user_id')
+    )
+    op.create_table('user_activity_logs',
+    sa.Column('user_activity_log_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_date_time_of_activity', sa.DateTime(), nullable=False),
+    sa.Column('activity_description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_activity_log_id')
+    )
+    op.create_table('user_authorized_facilities',
+    sa.Column('user_authorized_facility_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('facility_id', sa.String(length=75), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_authorized_facility_id')
+    )
+    op.create_table('user_login_logs',
+    sa.Column('user_login_log_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_date_time_of_activity', sa.DateTime(), nullable=False),
+    sa.Column('activity_description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_login_log_id')
+    )
+    op.create_table('admissions',
+    sa.Column('admission_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('date_of_admission', sa.DateTime(), nullable=False),
+    sa.Column('admissions_description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('admission_id')
+    )
+    op.create_table('allergies',
+    sa.Column('allergy_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('allergy_name', sa.String(length=75), nullable=False),
+    sa.Column('allergy_severity', sa.String(length=75), nullable=True),
+    sa.Column('additional_information', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('allergy_id')
+    )
+    op.create_table('appointments',
+    sa.Column('appointment_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('appointment_title', sa.String(length=75), nullable=False),
+    sa.Column('appointment_date', sa.DateTime(), nullable=False),
+    sa.Column('appointment_description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('appointment_id')
+    )
+    op.create_table('blood_relatives',
+    sa.Column('blood_relatives_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('mother_status', sa.String(length=45), nullable=False),
+    sa.Column('father_status', sa.String(length=45), nullable=False),
+    sa.Column('mother_deceased_age', sa.Integer(), nullable=True),
+    sa.Column('father_deceased_age', sa.Integer(), nullable=True),
+    sa.Column('num_sisters_alive', sa.Integer(), nullable=False),
+    sa.Column('num_brothers_alive', sa.Integer(), nullable=False),
+    sa.Column('num_daughters_alive', sa.Integer(), nullable=False),
+    sa.Column('num_sons_alive', sa.Integer(), nullable=False),
+    sa.Column('mother_cause_of_death', sa.String(), nullable=True),
+    sa.Column('father_cause_of_death', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('blood_relatives_id')
+    )
+    op.create_table('chief_complaints',
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_statement', sa.String(), nullable=False),
+    sa.Column('chief_complaint_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('chief_complaint_id')
+    )
+    op.create_table('emergency_contacts',
+    sa.Column('emergency_contact_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('emergency_contact_given_name', sa.String(length=50), nullable=False),
+    sa.Column('emergency_contact_middle_initial', sa.String(length=1), nullable=True),
+    sa.Column('emergency_contact_last_name', sa.String(length=50), nullable=False),
+    sa.Column('emergency_contact_phone_number', sa.String(length=15), nullable=False),
+    sa.Column('emergency_contact_email', sa.String(length=254), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['patients.user_id'], ),
+    sa.PrimaryKeyConstraint('emergency_contact_id')
+    )
+    op.create_table('family_illnesses',
+    sa.Column('family_illness_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('illness', sa.String(length=75), nullable=False),
+    sa.Column('father', sa.Boolean(), nullable=True),
+    sa.Column('mother', sa.Boolean(), nullable=True),
+    sa.Column('brothers', sa.Boolean(), nullable=True),
+    sa.Column('sisters', sa.Boolean(), nullable=True),
+    sa.Column('sons', sa.Boolean(), nullable=True),
+    sa.Column('daughters', sa.Boolean(), nullable=True),
+    sa.Column('grandparents', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('family_illness_id')
+    )
+    op.create_table('immunizations',
+    sa.Column('immunization_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('immunization', sa.String(length=85), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('immunization_id')
+    )
+    op.create_table('nurse_notes',
+    sa.Column('nurse_note_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('nurse_note_date_posted', sa.DateTime(), nullable=False),
+    sa.Column('nurse_note_focus', sa.String(), nullable=False),
+    sa.Column('nurse_note_text', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('nurse_note_id')
+    )
+    op.create_table('patient_races',
+    sa.Column('patient_race_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('patient_race', sa.String(length=254), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['patients.user_id'], ),
+    sa.PrimaryKeyConstraint('patient_race_id')
+    )
+    op.create_table('social_histories',
+    sa.Column('social_history_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=True),
+    sa.Column('substances', sa.String(), nullable=True),
+    sa.Column('occupation', sa.String(), nullable=True),
+    sa.Column('sexual_behavior', sa.String(), nullable=True),
+    sa.Column('prison', sa.String(), nullable=True),
+    sa.Column('travel', sa.String(), nullable=True),
+    sa.Column('exercise', sa.String(), nullable=True),
+    sa.Column('diet', sa.String(), nullable=True),
+    sa.Column('firearms_in_household', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('social_history_id')
+    )
+    op.create_table('visits',
+    sa.Column('visit_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('visits_title', sa.String(length=75), nullable=False),
+    sa.Column('visits_date', sa.DateTime(), nullable=False),
+    sa.Column('visits_description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('visit_id')
+    )
+    op.create_table('assessments',
+    sa.Column('assessment_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('assessments_summation', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('assessment_id')
+    )
+    op.create_table('diagnoses',
+    sa.Column('diagnosis_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('diagnosis_title', sa.String(length=45), nullable=False),
+    sa.Column('diagnosis_date', sa.DateTime(), nullable=False),
+    sa.Column('diagnosis_description', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('diagnosis_id')
+    )
+    op.create_table('histories_present_illness',
+    sa.Column('history_present_illness_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('hpi_location', sa.String(), nullable=True),
+    sa.Column('hpi_character', sa.String(), nullable=True),
+    sa.Column('hpi_duration', sa.String(), nullable=True),
+    sa.Column('hpi_onset', sa.String(), nullable=True),
+    sa.Column('hpi_modifying_factors', sa.String(), nullable=True),
+    sa.Column('hpi_radiation', sa.String(), nullable=True),
+    sa.Column('hpi_temporal_pattern', sa.String(), nullable=True),
+    sa.Column('hpi_severity', sa.String(), nullable=True),
+    sa.Column('hpi_description', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('history_present_illness_id')
+    )
+    op.create_table('illnesses',
+    sa.Column('illness_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('illnesses_diagnosis_date', sa.DateTime(), nullable=True),
+    sa.Column('illnesses_diagnosis_id', sa.BigInteger(), nullable=True),
+    sa.Column('illnesses_treatment_id', sa.BigInteger(), nullable=True),
+    sa.Column('illnesses_medication_id', sa.BigInteger(), nullable=True),
+    sa.Column('illnesses_surgical_related_problem_id', sa.BigInteger(), nullable=True),
+    sa.Column('illnesses_allergy_id', sa.BigInteger(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('illness_id')
+    )
+    op.create_table('medications',
+    sa.Column('medication_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=True),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('medication_name', sa.String(length=150), nullable=False),
+    sa.Column('medication_is_current', sa.Boolean(), nullable=False),
+    sa.Column('medication_description', sa.String(), nullable=True),
+    sa.Column('medication_frequency', sa.String(length=75), nullable=True),
+    sa.Column('medication_dosage', sa.Double(), nullable=True),
+    sa.Column('medication_start_date', sa.DateTime(), nullable=True),
+    sa.Column('medication_end_date', sa.DateTime(), nullable=True),
+    sa.Column('medication_healthcare_provider', sa.String(length=105), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('medication_id')
+    )
+    op.create_table('physical_exams',
+    sa.Column('physical_exam_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('physical_exam_heent', sa.String(), nullable=True),
+    sa.Column('physical_exam_respiratory', sa.String(), nullable=True),
+    sa.Column('physical_exam_cardiovascular', sa.String(), nullable=True),
+    sa.Column('physical_exam_abdominal', sa.String(), nullable=True),
+    sa.Column('physical_exam_limbs', sa.String(), nullable=True),
+    sa.Column('physical_exam_neurological', sa.String(), nullable=True),
+    sa.Column('physical_exam_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('physical_exam_id')
+    )
+    op.create_table('plans',
+    sa.Column('plan_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('plans_summation', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('plan_id')
+    )
+    op.create_table('review_of_systems',
+    sa.Column('review_of_systems_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('review_of_systems_constitutional_symptoms', sa.String(), nullable=True),
+    sa.Column('review_of_systems_eyes', sa.String(), nullable=True),
+    sa.Column('review_of_systems_ears_nose_throat', sa.String(), nullable=True),
+    sa.Column('review_of_systems_cardiovascular', sa.String(), nullable=True),
+    sa.Column('review_of_systems_respiratory', sa.String(), nullable=True),
+    sa.Column('review_of_systems_gastrointestinal', sa.String(), nullable=True),
+    sa.Column('review_of_systems_genitournary', sa.String(), nullable=True),
+    sa.Column('review_of_systems_musculoskeletal', sa.String(), nullable=True),
+    sa.Column('review_of_systems_integumentary', sa.String(), nullable=True),
+    sa.Column('review_of_systems_neurological', sa.String(), nullable=True),
+    sa.Column('review_of_systems_psychiatric', sa.String(), nullable=True),
+    sa.Column('review_of_systems_endocrine', sa.String(), nullable=True),
+    sa.Column('review_of_systems_hematologic_lymphatic', sa.String(), nullable=True),
+    sa.Column('review_of_systems_allergic_immunologic', sa.String(), nullable=True),
+    sa.Column('review_of_systems_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('review_of_systems_id')
+    )
+    op.create_table('surgical_related_problems',
+    sa.Column('surgical_related_problem_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('surgical_related_problem', sa.String(length=105), nullable=False),
+    sa.Column('surgical_related_problem_area', sa.String(length=75), nullable=False),
+    sa.Column('surgical_related_problem_procedure', sa.String(length=225), nullable=True),
+    sa.Column('surgical_related_problem_procedure_year', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('surgical_related_problem_id')
+    )
+    op.create_table('treatments',
+    sa.Column('treatment_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('treatment_healthcare_provider', sa.String(length=105), nullable=True),
+    sa.Column('treatment_type', sa.String(length=75), nullable=False),
+    sa.Column('treatment_description', sa.String(), nullable=True),
+    sa.Column('treatment_notes', sa.String(), nullable=True),
+    sa.Column('treatment_outcome', sa.String(length=105), nullable=True),
+    sa.Column('treatment_duration', sa.Integer(), nullable=False),
+    sa.Column('treatment_frequency', sa.String(length=75), nullable=True),
+    sa.Column('treatment_location', sa.String(length=75), nullable=True),
+    sa.Column('treatment_cost', sa.Double(), nullable=True),
+    sa.Column('treatment_insurance_coverage', sa.String(), nullable=True),
+    sa.Column('treatment_follow_up_plan', sa.String(), nullable=True),
+    sa.Column('treatment_date_created', sa.DateTime(), nullable=False),
+    sa.Column('treatment_date_updated', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('treatment_id')
+    )
+    op.create_table('vitals',
+    sa.Column('vitals_id', sa.BigInteger(), nullable=False),
+    sa.Column('chief_complaint_id', sa.BigInteger(), nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('vitals_date_taken', sa.DateTime(), nullable=True),
+    sa.Column('vitals_height', sa.Double(), nullable=True),
+    sa.Column('vitals_weight', sa.Double(), nullable=True),
+    sa.Column('vitals_calculated_bmi', sa.Double(), nullable=True),
+    sa.Column('vitals_temperature', sa.Double(), nullable=True),
+    sa.Column('vitals_pulse', sa.Double(), nullable=True),
+    sa.Column('vitals_respiratory_rate', sa.Double(), nullable=True),
+    sa.Column('vitals_blood_pressure_systolic', sa.Double(), nullable=True),
+    sa.Column('vitals_blood_pressure_diastolic', sa.Double(), nullable=True),
+    sa.Column('vitals_arterial_blood_oxygen_saturation', sa.Double(), nullable=True),
+    sa.ForeignKeyConstraint(['chief_complaint_id'], ['chief_complaints.chief_complaint_id'], ),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('vitals_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('vitals')
+    op.drop_table('treatments')
+    op.drop_table('surgical_related_problems')
+    op.drop_table('review_of_systems')
+    op.drop_table('plans')
+    op.drop_table('physical_exams')
+    op.drop_table('medications')
+    op.drop_table('illnesses')
+    op.drop_table('histories_present_illness')
+    op.drop_table('diagnoses')
+    op.drop_table('assessments')
+    op.drop_table('visits')
+    op.drop_table('social_histories')
+    op.drop_table('patient_races')
+    op.drop_table('nurse_notes')
+    op.drop_table('immunizations')
+    op.drop_table('family_illnesses')
+    op.drop_table('emergency_contacts')
+    op.drop_table('chief_complaints')
+    op.drop_table('blood_relatives')
+    op.drop_table('appointments')
+    op.drop_table('allergies')
+    op.drop_table('admissions')
+    op.drop_table('user_login_logs')
+    op.drop_table('user_authorized_facilities')
+    op.drop_table('user_activity_logs')
+    op.drop_table('physician_assigned_patients')
+    op.drop_table('patients')
+    op.drop_table('nonpatients')
+    op.drop_table('medical_records')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_table('users')
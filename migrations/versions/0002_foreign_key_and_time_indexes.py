@@ -0,0 +1,103 @@
+"""foreign key and time indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:53:36.621413
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_admissions_medical_record_id_date_of_admission', 'admissions', ['medical_record_id', 'date_of_admission'], unique=False)
+    op.create_index(op.f('ix_allergies_medical_record_id'), 'allergies', ['medical_record_id'], unique=False)
+    op.create_index('ix_appointments_medical_record_id_appointment_date', 'appointments', ['medical_record_id', 'appointment_date'], unique=False)
+    op.create_index(op.f('ix_assessments_chief_complaint_id'), 'assessments', ['chief_complaint_id'], unique=False)
+    op.create_index(op.f('ix_assessments_medical_record_id'), 'assessments', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_blood_relatives_medical_record_id'), 'blood_relatives', ['medical_record_id'], unique=False)
+    op.create_index('ix_chief_complaints_medical_record_id_chief_complaint_date', 'chief_complaints', ['medical_record_id', 'chief_complaint_date'], unique=False)
+    op.create_index(op.f('ix_diagnoses_chief_complaint_id'), 'diagnoses', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_diagnoses_medical_record_id_diagnosis_date', 'diagnoses', ['medical_record_id', 'diagnosis_date'], unique=False)
+    op.create_index(op.f('ix_emergency_contacts_user_id'), 'emergency_contacts', ['user_id'], unique=False)
+    op.create_index(op.f('ix_family_illnesses_medical_record_id'), 'family_illnesses', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_histories_present_illness_chief_complaint_id'), 'histories_present_illness', ['chief_complaint_id'], unique=False)
+    op.create_index(op.f('ix_histories_present_illness_medical_record_id'), 'histories_present_illness', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_illnesses_chief_complaint_id'), 'illnesses', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_illnesses_medical_record_id_illnesses_diagnosis_date', 'illnesses', ['medical_record_id', 'illnesses_diagnosis_date'], unique=False)
+    op.create_index(op.f('ix_immunizations_medical_record_id'), 'immunizations', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_medical_records_user_id'), 'medical_records', ['user_id'], unique=False)
+    op.create_index(op.f('ix_medications_chief_complaint_id'), 'medications', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_medications_medical_record_id_medication_start_date', 'medications', ['medical_record_id', 'medication_start_date'], unique=False)
+    op.create_index('ix_nurse_notes_medical_record_id_nurse_note_date_posted', 'nurse_notes', ['medical_record_id', 'nurse_note_date_posted'], unique=False)
+    op.create_index(op.f('ix_patient_races_user_id'), 'patient_races', ['user_id'], unique=False)
+    op.create_index(op.f('ix_physical_exams_chief_complaint_id'), 'physical_exams', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_physical_exams_medical_record_id_physical_exam_date', 'physical_exams', ['medical_record_id', 'physical_exam_date'], unique=False)
+    op.create_index(op.f('ix_physician_assigned_patients_patient_user_id'), 'physician_assigned_patients', ['patient_user_id'], unique=False)
+    op.create_index(op.f('ix_plans_chief_complaint_id'), 'plans', ['chief_complaint_id'], unique=False)
+    op.create_index(op.f('ix_plans_medical_record_id'), 'plans', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_review_of_systems_chief_complaint_id'), 'review_of_systems', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_review_of_systems_medical_record_id_review_of_systems_date', 'review_of_systems', ['medical_record_id', 'review_of_systems_date'], unique=False)
+    op.create_index(op.f('ix_social_histories_medical_record_id'), 'social_histories', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_surgical_related_problems_chief_complaint_id'), 'surgical_related_problems', ['chief_complaint_id'], unique=False)
+    op.create_index(op.f('ix_surgical_related_problems_medical_record_id'), 'surgical_related_problems', ['medical_record_id'], unique=False)
+    op.create_index(op.f('ix_treatments_chief_complaint_id'), 'treatments', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_treatments_medical_record_id_treatment_date_created', 'treatments', ['medical_record_id', 'treatment_date_created'], unique=False)
+    op.create_index(op.f('ix_user_activity_logs_user_date_time_of_activity'), 'user_activity_logs', ['user_date_time_of_activity'], unique=False)
+    op.create_index('ix_user_activity_logs_user_id_user_date_time_of_activity', 'user_activity_logs', ['user_id', 'user_date_time_of_activity'], unique=False)
+    op.create_index(op.f('ix_user_authorized_facilities_user_id'), 'user_authorized_facilities', ['user_id'], unique=False)
+    op.create_index('ix_user_login_logs_user_id_user_date_time_of_activity', 'user_login_logs', ['user_id', 'user_date_time_of_activity'], unique=False)
+    op.create_index('ix_visits_medical_record_id_visits_date', 'visits', ['medical_record_id', 'visits_date'], unique=False)
+    op.create_index(op.f('ix_vitals_chief_complaint_id'), 'vitals', ['chief_complaint_id'], unique=False)
+    op.create_index('ix_vitals_medical_record_id_vitals_date_taken', 'vitals', ['medical_record_id', 'vitals_date_taken'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_vitals_medical_record_id_vitals_date_taken', table_name='vitals')
+    op.drop_index(op.f('ix_vitals_chief_complaint_id'), table_name='vitals')
+    op.drop_index('ix_visits_medical_record_id_visits_date', table_name='visits')
+    op.drop_index('ix_user_login_logs_user_id_user_date_time_of_activity', table_name='user_login_logs')
+    op.drop_index(op.f('ix_user_authorized_facilities_user_id'), table_name='user_authorized_facilities')
+    op.drop_index('ix_user_activity_logs_user_id_user_date_time_of_activity', table_name='user_activity_logs')
+    op.drop_index(op.f('ix_user_activity_logs_user_date_time_of_activity'), table_name='user_activity_logs')
+    op.drop_index('ix_treatments_medical_record_id_treatment_date_created', table_name='treatments')
+    op.drop_index(op.f('ix_treatments_chief_complaint_id'), table_name='treatments')
+    op.drop_index(op.f('ix_surgical_related_problems_medical_record_id'), table_name='surgical_related_problems')
+    op.drop_index(op.f('ix_surgical_related_problems_chief_complaint_id'), table_name='surgical_related_problems')
+    op.drop_index(op.f('ix_social_histories_medical_record_id'), table_name='social_histories')
+    op.drop_index('ix_review_of_systems_medical_record_id_review_of_systems_date', table_name='review_of_systems')
+    op.drop_index(op.f('ix_review_of_systems_chief_complaint_id'), table_name='review_of_systems')
+    op.drop_index(op.f('ix_plans_medical_record_id'), table_name='plans')
+    op.drop_index(op.f('ix_plans_chief_complaint_id'), table_name='plans')
+    op.drop_index(op.f('ix_physician_assigned_patients_patient_user_id'), table_name='physician_assigned_patients')
+    op.drop_index('ix_physical_exams_medical_record_id_physical_exam_date', table_name='physical_exams')
+    op.drop_index(op.f('ix_physical_exams_chief_complaint_id'), table_name='physical_exams')
+    op.drop_index(op.f('ix_patient_races_user_id'), table_name='patient_races')
+    op.drop_index('ix_nurse_notes_medical_record_id_nurse_note_date_posted', table_name='nurse_notes')
+    op.drop_index('ix_medications_medical_record_id_medication_start_date', table_name='medications')
+    op.drop_index(op.f('ix_medications_chief_complaint_id'), table_name='medications')
+    op.drop_index(op.f('ix_medical_records_user_id'), table_name='medical_records')
+    op.drop_index(op.f('ix_immunizations_medical_record_id'), table_name='immunizations')
+    op.drop_index('ix_illnesses_medical_record_id_illnesses_diagnosis_date', table_name='illnesses')
+    op.drop_index(op.f('ix_illnesses_chief_complaint_id'), table_name='illnesses')
+    op.drop_index(op.f('ix_histories_present_illness_medical_record_id'), table_name='histories_present_illness')
+    op.drop_index(op.f('ix_histories_present_illness_chief_complaint_id'), table_name='histories_present_illness')
+    op.drop_index(op.f('ix_family_illnesses_medical_record_id'), table_name='family_illnesses')
+    op.drop_index(op.f('ix_emergency_contacts_user_id'), table_name='emergency_contacts')
+    op.drop_index('ix_diagnoses_medical_record_id_diagnosis_date', table_name='diagnoses')
+    op.drop_index(op.f('ix_diagnoses_chief_complaint_id'), table_name='diagnoses')
+    op.drop_index('ix_chief_complaints_medical_record_id_chief_complaint_date', table_name='chief_complaints')
+    op.drop_index(op.f('ix_blood_relatives_medical_record_id'), table_name='blood_relatives')
+    op.drop_index(op.f('ix_assessments_medical_record_id'), table_name='assessments')
+    op.drop_index(op.f('ix_assessments_chief_complaint_id'), table_name='assessments')
+    op.drop_index('ix_appointments_medical_record_id_appointment_date', table_name='appointments')
+    op.drop_index(op.f('ix_allergies_medical_record_id'), table_name='allergies')
+    op.drop_index('ix_admissions_medical_record_id_date_of_admission', table_name='admissions')
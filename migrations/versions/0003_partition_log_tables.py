@@ -0,0 +1,113 @@
+"""partition log tables by month
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:20:00.000000
+
+Rebuilds user_activity_logs and user_login_logs as tables range partitioned by
+month on user_date_time_of_activity (Postgres only). The primary key becomes
+(id, user_date_time_of_activity) because a partitioned table's unique
+constraints have to include the partition key. Existing rows are copied into
+one partition per month that holds data. A default partition catches rows for
+months without one. postgre_app/partitions.py keeps creating partitions ahead.
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {
+    'user_activity_logs': 'user_activity_log_id',
+    'user_login_logs': 'user_login_log_id',
+}
+INDEXES = {
+    'user_activity_logs': {
+        'ix_user_activity_logs_user_id_user_date_time_of_activity': ['user_id', 'user_date_time_of_activity'],
+        'ix_user_activity_logs_user_date_time_of_activity': ['user_date_time_of_activity'],
+    },
+    'user_login_logs': {
+        'ix_user_login_logs_user_id_user_date_time_of_activity': ['user_id', 'user_date_time_of_activity'],
+    },
+}
+MONTHS_AHEAD = 3
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _columns(table: str, id_column: str, sequence: str, primary_key: str) -> str:
+    return (
+        f"{id_column} BIGINT NOT NULL DEFAULT nextval('{sequence}'),"
+        f" user_id BIGINT NOT NULL CONSTRAINT {table}_user_id_fkey REFERENCES users (user_id),"
+        " user_date_time_of_activity TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+        " activity_description VARCHAR NOT NULL,"
+        f" PRIMARY KEY ({primary_key})"
+    )
+
+
+# Move a table aside so a new one can take its name: its indexes and foreign
+# key are dropped and its primary key renamed, since all would clash with the
+# new table's.
+def _set_aside(table: str, old: str):
+    for name in INDEXES[table]:
+        op.drop_index(name, table_name=table)
+    op.drop_constraint(f'{table}_user_id_fkey', table, type_='foreignkey')
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey')
+
+
+def _copy_and_replace(table: str, old: str, id_column: str, sequence: str):
+    op.execute(
+        f'INSERT INTO {table} ({id_column}, user_id, user_date_time_of_activity, activity_description)'
+        f' SELECT {id_column}, user_id, user_date_time_of_activity, activity_description FROM {old}')
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.{id_column}')
+    op.execute(f'DROP TABLE {old} CASCADE')
+    for name, columns in INDEXES[table].items():
+        op.create_index(name, table, columns, unique=False)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    current = date.today().replace(day=1)
+    for table, id_column in TABLES.items():
+        old = f'{table}_unpartitioned'
+        sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', '{id_column}')")).scalar()
+        _set_aside(table, old)
+        op.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+        op.execute(
+            f'CREATE TABLE {table} ({_columns(table, id_column, sequence, f"{id_column}, user_date_time_of_activity")})'
+            ' PARTITION BY RANGE (user_date_time_of_activity)')
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        months = set(bind.execute(sa.text(
+            f"SELECT DISTINCT date_trunc('month', user_date_time_of_activity)::date FROM {old}")).scalars())
+        months.update(_add_months(current, ahead) for ahead in range(MONTHS_AHEAD + 1))
+        for month in sorted(months):
+            op.execute(
+                f'CREATE TABLE {table}_p{month.year:04d}_{month.month:02d} PARTITION OF {table}'
+                f" FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')")
+        _copy_and_replace(table, old, id_column, sequence)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for table, id_column in TABLES.items():
+        old = f'{table}_partitioned'
+        sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', '{id_column}')")).scalar()
+        _set_aside(table, old)
+        op.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+        op.execute(f'CREATE TABLE {table} ({_columns(table, id_column, sequence, id_column)})')
+        _copy_and_replace(table, old, id_column, sequence)
@@ -0,0 +1,46 @@
+"""early warning scores
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:04:14.568760
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('early_warning_scores',
+    sa.Column('medical_record_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('vitals_id', sa.BigInteger(), nullable=False),
+    sa.Column('vitals_date_taken', sa.DateTime(), nullable=False),
+    sa.Column('respiratory_rate_score', sa.Integer(), nullable=False),
+    sa.Column('oxygen_saturation_score', sa.Integer(), nullable=False),
+    sa.Column('systolic_blood_pressure_score', sa.Integer(), nullable=False),
+    sa.Column('pulse_score', sa.Integer(), nullable=False),
+    sa.Column('temperature_score', sa.Integer(), nullable=False),
+    sa.Column('total_score', sa.Integer(), nullable=False),
+    sa.Column('max_parameter_score', sa.Integer(), nullable=False),
+    sa.Column('missing_parameters', sa.Integer(), nullable=False),
+    sa.Column('risk_level', sa.String(length=10), nullable=False),
+    sa.Column('scored_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.ForeignKeyConstraint(['vitals_id'], ['vitals.vitals_id'], ),
+    sa.PrimaryKeyConstraint('medical_record_id')
+    )
+    op.create_index(op.f('ix_early_warning_scores_vitals_id'), 'early_warning_scores', ['vitals_id'], unique=False)
+    op.create_index(op.f('ix_users_facility_id'), 'users', ['facility_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_facility_id'), table_name='users')
+    op.drop_index(op.f('ix_early_warning_scores_vitals_id'), table_name='early_warning_scores')
+    op.drop_table('early_warning_scores')
@@ -0,0 +1,58 @@
+"""clinical text index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 10:11:20.550893
+
+Adds clinical_text_index, one full-text search document per nurse note,
+diagnosis, chief complaint, assessment and plan, and on Postgres fills it from
+the existing rows before building the GIN index. postgre_app/search.py keeps it
+current afterwards.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# source -> (table, key, text column, date column)
+SOURCES = {
+    'nurse_note': ('nurse_notes', 'nurse_note_id', 'nurse_note_text', 'nurse_note_date_posted'),
+    'diagnosis': ('diagnoses', 'diagnosis_id', 'diagnosis_description', 'diagnosis_date'),
+    'chief_complaint': ('chief_complaints', 'chief_complaint_id', 'chief_complaint_statement', 'chief_complaint_date'),
+    'assessment': ('assessments', 'assessment_id', 'assessments_summation', 'NULL'),
+    'plan': ('plans', 'plan_id', 'plans_summation', 'NULL'),
+}
+
+
+def upgrade() -> None:
+    op.create_table('clinical_text_index',
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('source_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('medical_record_id', sa.BigInteger(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=True),
+    sa.Column('document', postgresql.TSVECTOR().with_variant(sa.Text(), 'sqlite'), nullable=False),
+    sa.ForeignKeyConstraint(['medical_record_id'], ['medical_records.medical_record_id'], ),
+    sa.PrimaryKeyConstraint('source', 'source_id')
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        for source, (table, key, text, recorded_at) in SOURCES.items():
+            op.execute(
+                f"INSERT INTO clinical_text_index (source, source_id, medical_record_id, recorded_at, document)"
+                f" SELECT '{source}', {key}, medical_record_id, {recorded_at},"
+                f" to_tsvector('english'::regconfig, coalesce({text}, '')) FROM {table}"
+            )
+    op.create_index('ix_clinical_text_index_document', 'clinical_text_index', ['document'], unique=False, postgresql_using='gin')
+    op.create_index(op.f('ix_clinical_text_index_medical_record_id'), 'clinical_text_index', ['medical_record_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_clinical_text_index_medical_record_id'), table_name='clinical_text_index')
+    op.drop_index('ix_clinical_text_index_document', table_name='clinical_text_index', postgresql_using='gin')
+    op.drop_table('clinical_text_index')
@@ -0,0 +1,57 @@
+"""user lookup indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 11:02:37.104211
+
+Indexes for typo-tolerant user lookup (postgre_app/lookup.py): date of birth,
+and on Postgres the lowercased last name (btree for prefixes, GIN over its
+one-deletion variants for typos) and the reversed digits of the phone number.
+pg_trgm is enabled for ranking candidates.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mirrors lookup.name_variants(): the name plus each spelling with one letter
+# removed, for names of at least four letters. Postgres estimates far more
+# names sharing a variant than there are, and would plan a parallel scan for a
+# handful of rows; marking it parallel restricted rules that out.
+NAME_VARIANTS_FUNCTION = """
+CREATE OR REPLACE FUNCTION lookup_name_variants(name text) RETURNS text[]
+LANGUAGE sql IMMUTABLE STRICT PARALLEL RESTRICTED AS $$
+    SELECT CASE WHEN length(name) < 4 THEN ARRAY[name]
+                ELSE ARRAY[name] || ARRAY(SELECT left(name, i - 1) || substr(name, i + 1)
+                                          FROM generate_series(1, length(name)) AS i) END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_users_user_date_of_birth'), 'users', ['user_date_of_birth'], unique=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(NAME_VARIANTS_FUNCTION)
+        op.create_index('ix_users_last_name_prefix', 'users',
+                        [sa.text("lower(user_last_name) text_pattern_ops")], unique=False)
+        op.create_index('ix_users_last_name_variants', 'users',
+                        [sa.text("lookup_name_variants(lower(user_last_name))")], unique=False, postgresql_using='gin')
+        op.create_index('ix_users_phone_suffix', 'users',
+                        [sa.text("reverse(regexp_replace(user_phone_number, '[^0-9]', '', 'g')) text_pattern_ops")],
+                        unique=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_users_phone_suffix', table_name='users')
+        op.drop_index('ix_users_last_name_variants', table_name='users', postgresql_using='gin')
+        op.drop_index('ix_users_last_name_prefix', table_name='users')
+        op.execute('DROP FUNCTION lookup_name_variants(text)')
+    op.drop_index(op.f('ix_users_user_date_of_birth'), table_name='users')
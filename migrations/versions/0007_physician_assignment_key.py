@@ -0,0 +1,37 @@
+"""physician assignment key
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 13:12:48.302519
+
+physician_assigned_patients was keyed by staff_user_id alone, allowing one
+assigned patient per physician. The key becomes (staff_user_id,
+patient_user_id) so authorization.py can resolve every assigned patient.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _set_primary_key(columns: list) -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('physician_assigned_patients_pkey', 'physician_assigned_patients', type_='primary')
+        op.create_primary_key('physician_assigned_patients_pkey', 'physician_assigned_patients', columns)
+    else:
+        with op.batch_alter_table('physician_assigned_patients', recreate='always') as batch_op:
+            batch_op.create_primary_key('physician_assigned_patients_pkey', columns)
+
+
+def upgrade() -> None:
+    _set_primary_key(['staff_user_id', 'patient_user_id'])
+
+
+def downgrade() -> None:
+    _set_primary_key(['staff_user_id'])
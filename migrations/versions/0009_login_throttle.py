@@ -0,0 +1,33 @@
+"""login throttle
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 15:21:07.640952
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    prefixes = ['UNLOGGED'] if op.get_bind().dialect.name == 'postgresql' else []
+    op.create_table('login_throttle_windows',
+    sa.Column('throttle_key', sa.String(length=100), nullable=False),
+    sa.Column('window_index', sa.BigInteger(), nullable=False),
+    sa.Column('current_count', sa.Integer(), nullable=False),
+    sa.Column('previous_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('throttle_key'),
+    prefixes=prefixes
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('login_throttle_windows')
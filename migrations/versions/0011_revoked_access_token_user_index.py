@@ -0,0 +1,25 @@
+"""revoked access token user index
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-20 10:21:05.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_revoked_access_tokens_user_id'), 'revoked_access_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_revoked_access_tokens_user_id'), table_name='revoked_access_tokens')
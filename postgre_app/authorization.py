@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import getpass
+import os
+from datetime import date, datetime
+from typing import Union
+from fastapi import HTTPException, status
+from sqlalchemy import BigInteger, String, any_, bindparam, cast, event, literal, or_, select, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, with_loader_criteria
+from . import models, passwords, principals
+from .database import SessionLocal, engine
+from .principals import ADMIN, PATIENT, STAFF
+
+# A user's role (see principals.py), the facilities they may read (staff:
+# their own facility plus every user_authorized_facilities row) and the
+# patients assigned to them, fetched in one round trip. Patients get neither
+# set, so they only ever see themselves. Stored on the cached Principal, so
+# this runs once per token subject until the cache entry expires or an
+# assignment changes.
+async def load_permissions(db: AsyncSession, user: models.User) -> tuple[str, frozenset, frozenset]:
+    facility = models.UserAuthorizedFacility
+    assignment = models.PhysicianAssignedPatient
+    nonpatient = models.Nonpatient
+    result = await db.execute(union_all(
+        select(literal("facility"), facility.facility_id).where(facility.user_id == user.user_id),
+        select(literal("patient"), cast(assignment.patient_user_id, String)).where(assignment.staff_user_id == user.user_id),
+        select(literal("staff"), cast(nonpatient.user_id, String)).where(nonpatient.user_id == user.user_id)))
+    facility_ids, patient_ids, is_staff = {user.facility_id}, set(), False
+    for kind, value in result:
+        if kind == "facility":
+            facility_ids.add(value)
+        elif kind == "patient":
+            patient_ids.add(int(value))
+        else:
+            is_staff = True
+    if user.is_admin:
+        return ADMIN, frozenset(facility_ids), frozenset(patient_ids)
+    if is_staff:
+        return STAFF, frozenset(facility_ids), frozenset(patient_ids)
+    return PATIENT, frozenset(), frozenset()
+
+# Restrict every ORM query the session runs from now on to what the principal
+# may read (see _apply_scope). The criteria are built once here and reused for
+# every query of the request.
+def scope(db: AsyncSession, principal: principals.Principal):
+    db.sync_session.info["scope"] = _scope_options(principal, db.get_bind().dialect.name == "postgresql")
+
+def require_facility(principal: principals.Principal, facility_id: str):
+    if facility_id not in principal.facility_ids:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized for this facility")
+
+def require_role(principal: principals.Principal, *roles: str):
+    if principal.role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not permitted for this role")
+
+# New users are registered by staff, and only in facilities they may read.
+def require_registrar(principal: principals.Principal, facility_id: str):
+    require_role(principal, STAFF, ADMIN)
+    require_facility(principal, facility_id)
+
+# Whether a medical record exists and is visible in the scoped session. Costs
+# one primary key lookup; the scope adds the patient filter.
+async def can_read_medical_record(db: AsyncSession, medical_record_id: int) -> bool:
+    result = await db.execute(
+        select(models.MedicalRecord.medical_record_id).where(models.MedicalRecord.medical_record_id == medical_record_id))
+    return result.first() is not None
+
+# Users are filtered to the principal's facilities, assigned patients and
+# themselves (patients have neither set, so just themselves), and medical
+# records to those users. The criteria compare against
+# the cached sets, bound as one array parameter each on Postgres (an IN list
+# elsewhere), so scoped queries add no joins against the assignment tables and
+# cost the same to send however many patients are assigned. The facility check
+# on records is a correlated EXISTS, which Postgres plans in a fraction of the
+# time an IN subquery takes. Relationship loads inherit the criteria from the
+# query that started them.
+@event.listens_for(Session, "do_orm_execute")
+def _apply_scope(state):
+    options = state.session.info.get("scope")
+    if options is None or not state.is_select or state.is_column_load or state.is_relationship_load:
+        return
+    state.statement = state.statement.options(*options)
+
+def _scope_options(principal: principals.Principal, as_array: bool) -> tuple:
+    user, record, users = models.User, models.MedicalRecord, models.User.__table__.alias("scope_users")
+    in_facilities = _in(user.facility_id, principal.facility_ids, String, as_array)
+    assigned_users = _in(user.user_id, principal.patient_ids, BigInteger, as_array)
+    assigned_records = _in(record.user_id, principal.patient_ids, BigInteger, as_array)
+    return (
+        with_loader_criteria(user, or_(in_facilities, assigned_users, user.user_id == principal.user_id)),
+        with_loader_criteria(record, or_(
+            assigned_records,
+            record.user_id == principal.user_id,
+            # On an alias of the Core table, so the user criteria above are not
+            # applied to it again and it never correlates to a users table the
+            # query itself joins.
+            select(users.c.user_id).where(users.c.user_id == record.user_id,
+                                          _in(users.c.facility_id, principal.facility_ids, String, as_array)).exists())),
+    )
+
+def _in(column, values: frozenset, element_type, as_array: bool):
+    if as_array:
+        return column == any_(bindparam(None, list(values), type_=postgresql.ARRAY(element_type)))
+    return column.in_(list(values))
+
+# Make a user an admin with read access to the given facilities, creating them
+# first (with a nonpatients row) if they do not exist. There is no endpoint for
+# this: the first account has to come from here, since registering users needs
+# an authenticated staff member.
+async def grant_admin(username: str, facility_ids: list[str], password: Union[str, None] = None, **user_fields) -> int:
+    async with SessionLocal() as db:
+        result = await db.execute(select(models.User).where(models.User.username == username))
+        user = result.scalars().first()
+        if user is None:
+            user = models.User(username=username, hashed_password=passwords.hash_password(password),
+                               user_date_created=datetime.now(), is_active=True, **user_fields)
+            db.add(user)
+            await db.flush()
+            db.add(models.Nonpatient(user_id=user.user_id, nonpatient_organization=user.facility_id))
+        user.is_admin = True
+        authorized = set((await db.scalars(select(models.UserAuthorizedFacility.facility_id)
+                                           .where(models.UserAuthorizedFacility.user_id == user.user_id))).all())
+        db.add_all(models.UserAuthorizedFacility(user_id=user.user_id, facility_id=facility_id)
+                   for facility_id in facility_ids if facility_id not in authorized | {user.facility_id})
+        await db.commit()
+        return user.user_id
+
+async def _main(args):
+    async with SessionLocal() as db:
+        existing = (await db.execute(select(models.User.user_id).where(models.User.username == args.username))).first()
+    fields = {}
+    if existing is None:
+        if not (args.first_name and args.last_name and args.date_of_birth and args.facility):
+            raise SystemExit("A new admin needs --first-name, --last-name, --date-of-birth and --facility")
+        fields = dict(password=os.environ.get("ADMIN_PASSWORD") or getpass.getpass("Password: "),
+                      user_first_name=args.first_name, user_last_name=args.last_name,
+                      user_date_of_birth=date.fromisoformat(args.date_of_birth), facility_id=args.facility[0])
+    user_id = await grant_admin(args.username, args.facility, **fields)
+    await engine.dispose()
+    print(f"{args.username} (user {user_id}) is an admin")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create an admin, or make an existing user one.")
+    parser.add_argument("username")
+    parser.add_argument("--facility", action="append", default=[],
+                        help="facility the admin may read; repeat for more (the first is a new admin's own)")
+    parser.add_argument("--first-name")
+    parser.add_argument("--last-name")
+    parser.add_argument("--date-of-birth", help="YYYY-MM-DD")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,21 @@
+import numpy as np
+
+# Body mass index from vitals_height in centimetres and vitals_weight in
+# kilograms, rounded to one decimal. The scalar and array forms round the same
+# way, so a value stored on insert is exactly what a backfill would compute.
+BMI_DECIMALS = 1
+
+# BMI for arrays of heights and weights; NaN wherever either is missing or not
+# positive.
+def calculate_bmi_array(heights, weights):
+    heights = np.asarray(heights, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = np.round(weights / (heights / 100) ** 2, BMI_DECIMALS)
+    return np.where((heights > 0) & (weights > 0), bmi, np.nan)
+
+def calculate_bmi(height, weight):
+    if height is None or weight is None:
+        return None
+    bmi = calculate_bmi_array(height, weight)
+    return None if np.isnan(bmi) else float(bmi)
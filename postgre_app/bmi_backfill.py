@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from . import models
+from .bmi import calculate_bmi_array
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# Vitals rows read, recomputed and written per transaction.
+BMI_BACKFILL_CHUNK_SIZE = int(os.environ.get("BMI_BACKFILL_CHUNK_SIZE", 10000))
+# Where the last committed vitals_id is kept so an interrupted run picks up
+# after it instead of starting over.
+BMI_BACKFILL_CHECKPOINT = os.environ.get("BMI_BACKFILL_CHECKPOINT", ".bmi_backfill.checkpoint")
+
+_update_bmi = (
+    update(models.Vital.__table__)
+    .where(models.Vital.__table__.c.vitals_id == bindparam("b_vitals_id"))
+    .values(vitals_calculated_bmi=bindparam("b_bmi"))
+)
+
+def read_checkpoint(path: Path) -> int:
+    try:
+        return int(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def write_checkpoint(path: Path, vitals_id: int):
+    partial = path.with_name(path.name + ".tmp")
+    partial.write_text(str(vitals_id))
+    partial.replace(path)
+
+# Recompute BMI for one chunk of rows, returning the ids and values that
+# changed. Rows without a usable height and weight keep their stored BMI.
+def recompute(heights, weights, stored):
+    bmi = calculate_bmi_array(heights, weights)
+    bmi = np.where(np.isnan(bmi), stored, bmi)
+    changed = ~((bmi == stored) | (np.isnan(bmi) & np.isnan(stored)))
+    return changed, bmi
+
+# Walk the vitals table in vitals_id order, one chunk per transaction. Each
+# chunk is read as columns, recomputed with array arithmetic and written back
+# with one executemany UPDATE for the rows whose BMI actually changed. The
+# checkpoint is advanced after every commit; recomputing is idempotent, so a
+# crash between the commit and the checkpoint only repeats that chunk.
+async def backfill(chunk_size: int = BMI_BACKFILL_CHUNK_SIZE, checkpoint: str = BMI_BACKFILL_CHECKPOINT,
+                   restart: bool = False) -> dict:
+    path = Path(checkpoint)
+    after_id = 0 if restart else read_checkpoint(path)
+    table = models.Vital.__table__
+    query = select(table.c.vitals_id, table.c.vitals_height, table.c.vitals_weight,
+                   table.c.vitals_calculated_bmi).order_by(table.c.vitals_id).limit(chunk_size)
+    started = time.perf_counter()
+    scanned = updated = 0
+    resumed_after = after_id
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(query.where(table.c.vitals_id > after_id))
+            rows = result.all()
+            if not rows:
+                break
+            ids, heights, weights, stored = zip(*rows)
+            changed, bmi = recompute(heights, weights, np.array(stored, dtype=np.float64))
+            if changed.any():
+                await conn.execute(_update_bmi, [
+                    {"b_vitals_id": vitals_id, "b_bmi": None if np.isnan(value) else float(value)}
+                    for vitals_id, value in zip(np.array(ids)[changed].tolist(), bmi[changed])
+                ])
+        after_id = ids[-1]
+        write_checkpoint(path, after_id)
+        scanned += len(ids)
+        updated += int(changed.sum())
+        elapsed = time.perf_counter() - started
+        logger.info("BMI backfill at vitals_id %s: %s rows scanned, %s updated, %.0f rows/s",
+                    after_id, scanned, updated, scanned / elapsed if elapsed else 0.0)
+    elapsed = time.perf_counter() - started
+    return {
+        "resumed_after_vitals_id": resumed_after,
+        "last_vitals_id": after_id,
+        "rows_scanned": scanned,
+        "rows_updated": updated,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(scanned / elapsed, 1) if elapsed else 0.0,
+    }
+
+async def _main(args):
+    report = await backfill(args.chunk_size, args.checkpoint, args.restart)
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser(description="Recompute vitals_calculated_bmi for every vitals row.")
+    parser.add_argument("--chunk-size", type=int, default=BMI_BACKFILL_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=BMI_BACKFILL_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,167 @@
+import os
+import time
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import crud, models, passwords, principals, response_cache, schemas
+
+# Users checked, hashed and inserted together.
+BULK_USER_BATCH_SIZE = int(os.environ.get("BULK_USER_BATCH_SIZE", 1000))
+
+# Yield the raw users in a bulk request: dicts from a JSON array body, or one
+# bytes line at a time from an application/x-ndjson body as it arrives.
+async def read_request_items(request: Request):
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=422, detail="Expected a JSON array of users")
+        for item in body:
+            yield item
+
+def _validation_detail(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'body'}: {error['msg']}" for error in exc.errors())
+
+# Detail for a row the database rejected.
+def _database_detail(exc: DBAPIError) -> str:
+    if isinstance(exc, IntegrityError):
+        return "Username or email already exists"
+    return "Rejected by the database"
+
+class _BulkRun:
+    def __init__(self, db: AsyncSession, principal: principals.Principal):
+        self.db = db
+        self.principal = principal
+        self.created = []
+        self.errors = []
+        self.seen_usernames = set()
+        self.seen_emails = set()
+
+    def fail(self, index: int, username, detail: str):
+        self.errors.append(schemas.BulkUserError(index=index, username=username, detail=detail))
+
+    # Validate one raw item and reject duplicates within the request itself.
+    def accept(self, index: int, raw):
+        try:
+            if isinstance(raw, bytes):
+                user = schemas.UserCreate.model_validate_json(raw)
+            else:
+                user = schemas.UserCreate.model_validate(raw)
+        except ValidationError as exc:
+            self.fail(index, raw.get("username") if isinstance(raw, dict) else None, _validation_detail(exc))
+            return None
+        if user.facility_id not in self.principal.facility_ids:
+            self.fail(index, user.username, "Not authorized for this facility")
+            return None
+        if user.username in self.seen_usernames:
+            self.fail(index, user.username, "Duplicate username in request")
+            return None
+        if user.email and user.email in self.seen_emails:
+            self.fail(index, user.username, "Duplicate email in request")
+            return None
+        self.seen_usernames.add(user.username)
+        if user.email:
+            self.seen_emails.add(user.email)
+        return user
+
+    async def create_batch(self, batch: list):
+        usernames = [user.username for _, user in batch]
+        emails = [user.email for _, user in batch if user.email]
+        result = await self.db.execute(
+            select(models.User.username, models.User.email)
+            .where(or_(models.User.username.in_(usernames), models.User.email.in_(emails))))
+        taken = result.all()
+        taken_usernames = {username for username, _ in taken}
+        taken_emails = {email for _, email in taken if email}
+
+        pending = []
+        for index, user in batch:
+            if user.username in taken_usernames:
+                self.fail(index, user.username, "Username already exists")
+            elif user.email and user.email in taken_emails:
+                self.fail(index, user.username, "Email already exists")
+            else:
+                pending.append((index, user))
+        if not pending:
+            return
+
+        await crud.release_connection(self.db)
+        try:
+            hashed = await passwords.pool.hash_many([user.hashed_password for _, user in pending])
+        except HTTPException as exc:
+            for index, user in pending:
+                self.fail(index, user.username, exc.detail)
+            return
+        rows = [crud.new_user_row(user, hashed_password) for (_, user), hashed_password in zip(pending, hashed)]
+
+        statement = insert(models.User).returning(
+            models.User.user_id, models.User.username, sort_by_parameter_order=True)
+        try:
+            result = await self.db.execute(statement, rows)
+            inserted = result.all()
+            await self.db.commit()
+            response_cache.cache.invalidate(response_cache.USER_LISTS)
+        except DBAPIError:
+            # Another writer took a username or email after the check above,
+            # or a row breaks a constraint the schema doesn't check; fall back
+            # to one savepoint per row to find out which.
+            await self.db.rollback()
+            await self.create_one_by_one(pending, rows)
+            return
+        for (index, _), (user_id, username) in zip(pending, inserted):
+            self.created.append(schemas.BulkUserCreated(index=index, user_id=user_id, username=username))
+
+    async def create_one_by_one(self, pending: list, rows: list):
+        for (index, user), row in zip(pending, rows):
+            try:
+                async with self.db.begin_nested():
+                    result = await self.db.execute(insert(models.User).returning(models.User.user_id), row)
+                    user_id = result.scalar_one()
+            except DBAPIError as exc:
+                self.fail(index, user.username, _database_detail(exc))
+                continue
+            self.created.append(schemas.BulkUserCreated(index=index, user_id=user_id, username=user.username))
+        await self.db.commit()
+        response_cache.cache.invalidate(response_cache.USER_LISTS)
+
+# Create users from an async iterable of raw items (see read_request_items).
+# Uniqueness is checked with one query per batch, passwords are hashed across
+# every password worker, and each batch is one multi-row INSERT. Rows that
+# fail are reported by their position in the request instead of failing
+# the whole import. Rows outside the principal's facilities are rejected.
+async def create_users(db: AsyncSession, principal: principals.Principal, items) -> schemas.BulkUserReport:
+    started = time.perf_counter()
+    run = _BulkRun(db, principal)
+    batch = []
+    index = 0
+    async for raw in items:
+        user = run.accept(index, raw)
+        if user is not None:
+            batch.append((index, user))
+        if len(batch) >= BULK_USER_BATCH_SIZE:
+            await run.create_batch(batch)
+            batch = []
+        index += 1
+    if batch:
+        await run.create_batch(batch)
+    elapsed = time.perf_counter() - started
+    return schemas.BulkUserReport(
+        created=run.created,
+        errors=sorted(run.errors, key=lambda error: error.index),
+        elapsed_seconds=round(elapsed, 3),
+        users_per_second=round(len(run.created) / elapsed, 1) if elapsed else 0.0,
+    )
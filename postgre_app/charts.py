@@ -0,0 +1,65 @@
+from collections import defaultdict
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from sqlalchemy.orm.attributes import set_committed_value
+from . import models, schemas
+
+# Relationships of a model that the given response schema serializes.
+def _serialized_relationships(model, schema) -> dict:
+    return {
+        key: relationship
+        for key, relationship in inspect(model).relationships.items()
+        if key in schema.model_fields
+    }
+
+RECORD_RELATIONSHIPS = _serialized_relationships(models.MedicalRecord, schemas.MedicalRecord)
+COMPLAINT_RELATIONSHIPS = _serialized_relationships(models.ChiefComplaint, schemas.ChiefComplaint)
+
+# Every table hanging off a chart. All of them carry medical_record_id, including
+# the chief complaint children, so each one is read exactly once for the record
+# and then split between the record and its complaints in memory.
+CHART_TABLES = list(dict.fromkeys(
+    relationship.mapper.class_
+    for relationship in [*RECORD_RELATIONSHIPS.values(), *COMPLAINT_RELATIONSHIPS.values()]
+))
+
+def record_query(medical_record_id: int):
+    return (select(models.MedicalRecord).options(raiseload("*"))
+            .where(models.MedicalRecord.medical_record_id == medical_record_id))
+
+# Every row of one chart table for a record. Served by the table's
+# medical_record_id index (see migrations/versions/0002_*).
+def chart_table_query(table, medical_record_id: int):
+    primary_key = inspect(table).primary_key[0]
+    return (select(table).options(raiseload("*"))
+            .where(table.medical_record_id == medical_record_id).order_by(primary_key))
+
+# Load a full medical record for schemas.MedicalRecord with one SELECT for the
+# record plus one per child table, however many rows the chart holds.
+async def get_medical_record(db: AsyncSession, medical_record_id: int):
+    result = await db.execute(record_query(medical_record_id))
+    record = result.scalars().first()
+    if record is None:
+        return None
+
+    rows_by_table = {}
+    for table in CHART_TABLES:
+        result = await db.execute(chart_table_query(table, medical_record_id))
+        rows_by_table[table] = result.scalars().all()
+
+    for key, relationship in RECORD_RELATIONSHIPS.items():
+        rows = rows_by_table[relationship.mapper.class_]
+        if relationship.uselist:
+            set_committed_value(record, key, rows)
+        else:
+            set_committed_value(record, key, rows[0] if rows else None)
+
+    complaints = rows_by_table[models.ChiefComplaint]
+    for key, relationship in COMPLAINT_RELATIONSHIPS.items():
+        by_complaint = defaultdict(list)
+        for row in rows_by_table[relationship.mapper.class_]:
+            by_complaint[row.chief_complaint_id].append(row)
+        for complaint in complaints:
+            set_committed_value(complaint, key, by_complaint.get(complaint.chief_complaint_id, []))
+    return record
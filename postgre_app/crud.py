@@ -1,16 +1,16 @@
 from typing import Annotated, Union
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from . import models, schemas
-from datetime import datetime, timedelta, timezone
-from .database import SessionLocal, engine
-import bcrypt
-
-models.Base.metadata.create_all(bind=engine)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import authorization, charts, database, loading, lookup, models, news2, passwords, principals, schemas, search, tokens
+from datetime import date, datetime, timedelta, timezone
+import base64
+import json
+from .database import SessionLocal
+from .passwords import hash_password, verify_password
 
 # To get a string like this in Windows run:
 # .\generate_random_hex.ps1
@@ -22,48 +22,121 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Union[str, None] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Union[str, None] = None
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+# Dependency. Sessions are on the primary. With replicas configured, the
+# session is tagged with the caller so their writes make later reads wait for
+# a replica that has them (see database.ReplicaRouter).
+async def get_db(request: Request):
+    async with SessionLocal() as db:
+        if database.router.replicas:
+            db.info["subject"] = token_subject(request)
+        yield db
+
+# Dependency for read-only handlers that tolerate replication lag: a session on
+# a replica that is current enough for the caller, or on the primary.
+async def get_read_db(request: Request):
+    subject = token_subject(request) if database.router.replicas else None
+    async with SessionLocal(bind=database.router.engine_for(subject)) as db:
         yield db
-    finally:
-        db.close()
+
+# The username in the request's bearer token, if it carries a valid one.
+def token_subject(request: Request) -> Union[str, None]:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+# End the session's current transaction so its pooled connection is returned
+# while slow non-database work (bcrypt) runs. Loaded objects stay usable
+# because the session does not expire them on commit.
+async def release_connection(db: AsyncSession):
+    await db.commit()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.user_id == user_id).first()
+user_plan = loading.plan_for(schemas.User)
+user_activity_log_plan = loading.plan_for(schemas.UserActivityLog)
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await user_plan.first(db, select(models.User).where(models.User.user_id == user_id))
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+async def user_exists(db: AsyncSession, user_id: int) -> bool:
+    result = await db.execute(select(models.User.user_id).where(models.User.user_id == user_id))
+    return result.first() is not None
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
 
-# Hash a password using bcrypt.
-def hash_password(password):
-    pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
-    string_password = hashed_password.decode('utf-8')
-    return string_password
+# List functions return ORM objects by default; pass another plan for the same
+# rows as loading.RowPlan records or loading.TuplePlan tuples.
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, plan=user_plan):
+    return await plan.all(
+        db, select(models.User).order_by(models.User.user_id).offset(skip).limit(limit))
 
-# Check if the provided password matches the stored password (hashed)
-def verify_password(plain_password, hashed_password):
-    password_byte_enc = plain_password.encode('utf-8')
-    hashed_password = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_byte_enc, hashed_password)
+# Keyset pagination: each page starts after the primary key the previous page
+# ended on, so the database seeks straight to it instead of counting past
+# every skipped row. An empty cursor requests the first page.
+async def get_users_page(db: AsyncSession, cursor: str = "", limit: int = 100, plan=user_plan):
+    query = select(models.User).order_by(models.User.user_id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor)
+        query = query.where(models.User.user_id > after_id)
+    users = await plan.all(db, query.limit(limit + 1))
+    return paginate(users, limit, lambda user: (user.user_id,))
 
-def authenticate_user(db: Session, username: str, password: str) -> Union[models.User, bool]:
-    user = get_user_by_username(db, username)
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+# Key values of the wrong type would reach the database as bad parameters,
+# so each must match the cursor's types (ints within BIGINT, bools excluded).
+def _cursor_value_ok(value, expected) -> bool:
+    if isinstance(value, bool) or not isinstance(value, expected):
+        return False
+    return not isinstance(value, int) or -2**63 <= value < 2**63
+
+def decode_cursor(cursor: str, types: tuple = (int,)) -> list:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        key = None
+    if (not isinstance(key, list) or len(key) != len(types)
+            or not all(_cursor_value_ok(value, expected) for value, expected in zip(key, types))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+# Split a limit + 1 row fetch into the page and the cursor for the next one.
+def paginate(rows, limit: int, key):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+async def lookup_users(
+    db: AsyncSession, name: Union[str, None] = None, date_of_birth: Union[date, None] = None,
+    phone: Union[str, None] = None, limit: int = 20,
+):
+    return await lookup.lookup(db, name=name, date_of_birth=date_of_birth, phone=phone, limit=limit)
+
+async def find_duplicate_users(db: AsyncSession, user: schemas.UserBase):
+    return await lookup.find_duplicates(db, user)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Union[models.User, bool]:
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    await release_connection(db)
+    if not await passwords.pool.verify(password, user.hashed_password):
         return False
     return user
 
@@ -74,40 +147,100 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", tokens.new_jti())
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# An access token and a refresh token for it. family_id continues a rotated
+# refresh token's family. Commits the new refresh token.
+async def issue_tokens(db: AsyncSession, user_id: int, username: str, family_id: Union[str, None] = None) -> Token:
+    jti = tokens.new_jti()
+    expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(data={"sub": username, "jti": jti}, expires_delta=expires_delta)
+    refresh_token = tokens.add_refresh_token(db, user_id, jti, datetime.now() + expires_delta, family_id)
+    await db.commit()
+    return Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+# Exchange a refresh token for a new pair. Costs a few indexed statements and
+# no bcrypt; the presented token cannot be used again.
+async def refresh_tokens(db: AsyncSession, refresh_token: str) -> Union[Token, None]:
+    used = await tokens.use_refresh_token(db, refresh_token)
+    if used is None:
+        return None
+    user, family_id = used
+    return await issue_tokens(db, user.user_id, user.username, family_id)
+
+# Log out: revoke the access token in use and, if given, the refresh token's
+# family. Tokens issued before access tokens carried a jti cannot be revoked.
+async def revoke_tokens(db: AsyncSession, principal: principals.Principal, payload: dict,
+                        refresh_token: Union[str, None] = None):
+    if refresh_token is not None:
+        await tokens.revoke_refresh_token(db, refresh_token, principal.user_id)
+    if payload.get("jti"):
+        await tokens.revoke_access_tokens(
+            db, [(payload["jti"], principal.user_id, datetime.fromtimestamp(payload["exp"]))])
+    await db.commit()
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+# The verified claims of the request's access token. Revoked tokens are
+# rejected with a dict lookup against the in-memory revocation list.
+async def get_token_payload(token: Annotated[str, Depends(oauth2_scheme)]) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    db = next(get_db())
-    user = get_user_by_username(db, username=token_data.username)
+    if payload.get("sub") is None or tokens.revocations.is_revoked(payload.get("jti")):
+        raise credentials_exception
+    return payload
+
+async def get_current_user(
+        payload: Annotated[dict, Depends(get_token_payload)],
+        db: Annotated[AsyncSession, Depends(get_db)]):
+    token_data = TokenData(username=payload["sub"])
+    principal = principals.cache.get(token_data.username)
+    if principal is not None:
+        return principal
+    user = await get_user_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
-    return user
+    principal = principals.Principal.from_user(user, *await authorization.load_permissions(db, user))
+    principals.cache.put(principal)
+    return principal
 
 async def get_current_active_user(
-        current_user: Annotated[models.User, Depends(get_current_user)]):
-    if current_user.disabled:
+        current_user: Annotated[principals.Principal, Depends(get_current_user)]):
+    if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def create_user(db: Session, user: schemas.UserCreate):
-    new_hashed_password = hash_password(user.hashed_password)
-    db_user = models.User(
+# Dependency for read-only endpoints serving patient data: a read session
+# (see get_read_db) with ORM queries limited to what the current user may read.
+async def get_authorized_db(
+        current_user: Annotated[principals.Principal, Depends(get_current_active_user)]):
+    async with SessionLocal(bind=database.router.engine_for(current_user.username)) as db:
+        authorization.scope(db, current_user)
+        yield db
+
+# The same for endpoints that write patient data: a scoped session on the
+# primary, whose commits count as the user's writes (see get_db).
+async def get_authorized_write_db(
+        current_user: Annotated[principals.Principal, Depends(get_current_active_user)]):
+    async with SessionLocal() as db:
+        if database.router.replicas:
+            db.info["subject"] = current_user.username
+        authorization.scope(db, current_user)
+        yield db
+
+# Column values for a new users row.
+def new_user_row(user: schemas.UserCreate, hashed_password: str) -> dict:
+    return dict(
         username=user.username, 
-        hashed_password=new_hashed_password, 
+        hashed_password=hashed_password, 
         user_first_name=user.user_first_name,
         user_middle_initial=user.user_middle_initial,
         user_last_name=user.user_last_name,
@@ -121,17 +254,78 @@ def create_user(db: Session, user: schemas.UserCreate):
         user_state=user.user_state,
         user_country=user.user_country,
         user_phone_number=user.user_phone_number)
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    await release_connection(db)
+    new_hashed_password = await passwords.pool.hash(user.hashed_password)
+    db_user = models.User(**new_user_row(user, new_hashed_password))
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    await db.commit()
+    # Re-select so the response relationships are loaded by the user plan.
+    return await get_user(db, db_user.user_id)
+
+# Activity logs joined to their user, so the authorization scope's user
+# criteria decide which rows are visible (see authorization.scope).
+def visible_activity_logs():
+    return select(models.UserActivityLog).join(models.User, models.User.user_id == models.UserActivityLog.user_id)
+
+# Restrict a log query to [since, until). The bounds are on the partition key,
+# so Postgres only scans the monthly partitions they overlap.
+def activity_time_range(query, since: Union[datetime, None] = None, until: Union[datetime, None] = None):
+    if since is not None:
+        query = query.where(models.UserActivityLog.user_date_time_of_activity >= since)
+    if until is not None:
+        query = query.where(models.UserActivityLog.user_date_time_of_activity < until)
+    return query
+
+async def get_user_activity_logs(
+    db: AsyncSession, skip: int = 0, limit: int = 100,
+    since: Union[datetime, None] = None, until: Union[datetime, None] = None, plan=user_activity_log_plan,
+):
+    query = activity_time_range(visible_activity_logs(), since, until)
+    return await plan.all(
+        db, query.order_by(models.UserActivityLog.user_activity_log_id).offset(skip).limit(limit))
 
-def get_user_activity_logs(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.UserActivityLog).offset(skip).limit(limit).all()
+async def get_user_activity_logs_page(
+    db: AsyncSession, cursor: str = "", limit: int = 100,
+    since: Union[datetime, None] = None, until: Union[datetime, None] = None, plan=user_activity_log_plan,
+):
+    query = activity_time_range(visible_activity_logs(), since, until)
+    query = query.order_by(models.UserActivityLog.user_activity_log_id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor)
+        query = query.where(models.UserActivityLog.user_activity_log_id > after_id)
+    logs = await plan.all(db, query.limit(limit + 1))
+    return paginate(logs, limit, lambda log: (log.user_activity_log_id,))
 
-def create_user_activity_log(db: Session, ualog: schemas.UserActivityLogCreate, user_id: int):
-    db_user_activity_log = models.UserActivityLog(**ualog.model_dump(), user_id=user_id)
+async def create_user_activity_log(db: AsyncSession, user_activity_log: schemas.UserActivityLogCreate, user_id: int):
+    db_user_activity_log = models.UserActivityLog(**user_activity_log.model_dump(exclude={"user_id"}), user_id=user_id)
     db.add(db_user_activity_log)
-    db.commit()
-    db.refresh(db_user_activity_log)
-    return db_user_activity_log
\ No newline at end of file
+    await db.commit()
+    return db_user_activity_log
+
+async def create_vital(db: AsyncSession, vital: schemas.VitalCreate):
+    db_vital = models.Vital(**vital.model_dump())
+    db.add(db_vital)
+    await db.commit()
+    return db_vital
+
+async def get_medical_record(db: AsyncSession, medical_record_id: int):
+    return await charts.get_medical_record(db, medical_record_id)
+
+async def get_highest_risk(db: AsyncSession, facility_id: str, limit: int = 20):
+    return await news2.highest_risk(db, facility_id, limit)
+
+# Ranked full-text hits over clinical notes for one medical record or one
+# facility, keyset-paginated on (rank, source, source_id).
+async def search_clinical_text(
+    db: AsyncSession, query_text: str, medical_record_id: Union[int, None] = None,
+    facility_id: Union[str, None] = None, sources: Union[list[str], None] = None, cursor: str = "", limit: int = 20,
+):
+    unknown = [source for source in sources or () if source not in search.SOURCES]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown search sources: {', '.join(unknown)}")
+    after = decode_cursor(cursor, types=((int, float), str, int)) if cursor else None
+    hits = await search.search(db, query_text, medical_record_id=medical_record_id, facility_id=facility_id,
+                               sources=sources, after=after, limit=limit + 1)
+    return paginate(hits, limit, lambda hit: (hit["rank"], hit["source"], hit["source_id"]))
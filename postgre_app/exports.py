@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from sqlalchemy import inspect, select
+from . import authorization, models, principals, schemas
+from .database import SessionLocal
+
+# Rows fetched per round trip from the server-side cursor, and written per chunk.
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 2000))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Mapped columns that the response schema exposes, in schema order. Nested
+# lists are left out and so is anything the schema hides (hashed_password).
+# They are ORM attributes, so export queries get the authorization scope.
+def _export_columns(model, schema) -> list:
+    table_columns = model.__table__.columns
+    return [getattr(model, name) for name in schema.model_fields if name in table_columns]
+
+EXPORTS = {
+    "users": (models.User, _export_columns(models.User, schemas.User)),
+    "user_activity_logs": (models.UserActivityLog, _export_columns(models.UserActivityLog, schemas.UserActivityLog)),
+    "user_login_logs": (models.UserLoginLog, _export_columns(models.UserLoginLog, schemas.UserLoginLog)),
+}
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _ndjson_chunk(names, rows) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(names, map(_plain, row))), separators=(",", ":")) + "\n" for row in rows
+    ).encode()
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+# The rows of an export the principal may read: users through the scope's user
+# criteria, log rows through a join to their (scoped) user.
+def export_query(name: str):
+    model, columns = EXPORTS[name]
+    query = select(*columns)
+    if model is not models.User:
+        query = query.join(models.User, models.User.user_id == model.user_id)
+    return query.order_by(*inspect(model).primary_key)
+
+# Stream every row of an export the principal may read in primary key order.
+# Rows come from a server-side cursor (stream_results with yield_per), so only
+# one batch is held in memory at a time. The generator owns its session
+# because it keeps running after the request handler has returned.
+async def stream_export(principal: principals.Principal, name: str, format: str):
+    names = [column.key for column in EXPORTS[name][1]]
+    if format == "csv":
+        yield _csv_chunk([names])
+    async with SessionLocal() as db:
+        authorization.scope(db, principal)
+        result = await db.stream(export_query(name).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield _csv_chunk(rows) if format == "csv" else _ndjson_chunk(names, rows)
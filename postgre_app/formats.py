@@ -0,0 +1,187 @@
+import gzip
+import io
+import os
+from datetime import date, datetime
+from typing import Union
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from . import loading
+from .loading import TuplePlan
+
+# pyarrow, msgpack and brotli are optional; formats and encodings whose
+# package is missing are not offered.
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed whatever the client accepts.
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 5))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 4))
+
+JSON = "application/json"
+# {"columns": {name: [value, ...]}, "next_cursor": ...} with the same values
+# as the JSON rows; next_cursor only for cursor pages.
+COLUMNS_JSON = "application/vnd.emrs.columns+json"
+# The same object as MessagePack, with dates and times as ISO 8601 strings.
+COLUMNS_MSGPACK = "application/vnd.emrs.columns+msgpack"
+# An Arrow IPC stream of one record batch; next_cursor is in the schema metadata.
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+MEDIA_TYPES = [JSON, COLUMNS_JSON] + ([COLUMNS_MSGPACK] if msgpack else []) + ([ARROW_STREAM] if pyarrow else [])
+ENCODINGS = (["br"] if brotli else []) + ["gzip"]
+
+# The representation chosen for a request: body media type and content coding
+# (None for identity). Part of the response cache key.
+class Variant:
+    __slots__ = ("media_type", "encoding")
+
+    def __init__(self, media_type: str, encoding: Union[str, None]):
+        self.media_type = media_type
+        self.encoding = encoding
+
+    @property
+    def key(self) -> tuple:
+        return (self.media_type, self.encoding)
+
+    @property
+    def columnar(self) -> bool:
+        return self.media_type != JSON
+
+# What endpoints without negotiation send.
+PLAIN_JSON = Variant(JSON, None)
+
+# (value, q) pairs from an Accept or Accept-Encoding header, best first; the
+# sort is stable, so equally weighted values keep the client's order.
+def _weighted(header: str) -> list[tuple[str, float]]:
+    values = []
+    for part in header.split(","):
+        value, *params = part.split(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        values.append((value, q))
+    return sorted(values, key=lambda item: -item[1])
+
+def _media_type(accept: str) -> Union[str, None]:
+    for value, q in _weighted(accept):
+        if q <= 0:
+            continue
+        if value in ("*/*", "application/*"):
+            return JSON
+        if value in MEDIA_TYPES:
+            return value
+    return None
+
+def _encoding(accept_encoding: str) -> Union[str, None]:
+    accepted = dict(_weighted(accept_encoding))
+    best = None
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get("*", 0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+# Pick the representation for a list endpoint from Accept and Accept-Encoding.
+# No Accept header means JSON rows, as before; nothing acceptable is a 406.
+def negotiate(request: Request) -> Variant:
+    accept = request.headers.get("Accept")
+    media_type = _media_type(accept) if accept else JSON
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Acceptable media types: {', '.join(MEDIA_TYPES)}",
+        )
+    return Variant(media_type, _encoding(request.headers.get("Accept-Encoding", "")))
+
+def _isoformat(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+_ARROW_TYPES = {int: "int64", float: "float64", bool: "bool_", str: "string", date: "date32"}
+
+def _arrow_type(python_type):
+    if python_type is datetime:
+        return pyarrow.timestamp("us")
+    return getattr(pyarrow, _ARROW_TYPES[python_type])()
+
+# A page of TuplePlan rows laid out one array per column. The rows are
+# transposed with zip, so no per-row dict or record is made.
+def render_columns(media_type: str, plan: TuplePlan, rows: list, page: bool = False,
+                   next_cursor: Union[str, None] = None) -> bytes:
+    values = list(zip(*rows)) if rows else [()] * len(plan.names)
+    if media_type == ARROW_STREAM:
+        schema = pyarrow.schema(
+            [pyarrow.field(name, _arrow_type(python_type)) for name, python_type in zip(plan.names, plan.python_types)],
+            metadata={"next_cursor": next_cursor or ""} if page else None,
+        )
+        batch = pyarrow.record_batch(
+            [pyarrow.array(column, type=field.type) for column, field in zip(values, schema)], schema=schema)
+        sink = io.BytesIO()
+        with pyarrow.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue()
+    payload = {"columns": dict(zip(plan.names, values))}
+    if page:
+        payload["next_cursor"] = next_cursor
+    if media_type == COLUMNS_MSGPACK:
+        return msgpack.packb(payload, default=_isoformat)
+    return orjson.dumps(payload)
+
+# How a list endpoint should load its rows for variant: tuples for columnar
+# formats, otherwise RowPlan records or ORM objects (FAST_JSON_RESPONSES).
+def plan_for(variant: Variant, schema):
+    if variant.columnar:
+        return loading.tuple_plan_for(schema)
+    if loading.FAST_JSON_RESPONSES:
+        return loading.row_plan_for(schema)
+    return loading.plan_for(schema)
+
+# Render a list (or a {"items", "next_cursor"} page) of rows loaded with
+# plan_for(variant, ...), where schema is the JSON response schema.
+def render(variant: Variant, plan, schema, value) -> bytes:
+    if variant.columnar:
+        if isinstance(value, dict):
+            return render_columns(variant.media_type, plan, value["items"], True, value["next_cursor"])
+        return render_columns(variant.media_type, plan, value)
+    return loading.render(schema, value, as_rows=isinstance(plan, loading.RowPlan))
+
+# Compress body with the negotiated coding, returning it and the coding
+# actually used. gzip output has no timestamp, so every worker sends (and
+# computes ETags from) the same bytes.
+def compress(body: bytes, encoding: Union[str, None]) -> tuple[bytes, Union[str, None]]:
+    if encoding is None or len(body) < RESPONSE_COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY), encoding
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0), encoding
+
+def headers(encoding: Union[str, None]) -> dict:
+    result = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        result["Content-Encoding"] = encoding
+    return result
+
+# An uncached response for a rendered body.
+def response(variant: Variant, body: bytes) -> Response:
+    body, encoding = compress(body, variant.encoding)
+    return Response(content=body, media_type=variant.media_type, headers=headers(encoding))
@@ -0,0 +1,208 @@
+import os
+from collections import defaultdict
+from dataclasses import make_dataclass
+from typing import get_args
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from . import models, schemas
+
+# How many of a user's most recent login and activity log rows are embedded in
+# a schemas.User response. The full history is paged through /user_activity_logs/.
+USER_LOG_PREVIEW_LIMIT = int(os.environ.get("USER_LOG_PREVIEW_LIMIT", 20))
+# Serve list endpoints from RowPlan records encoded by orjson instead of ORM
+# objects validated against the response schema. The JSON is the same.
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+# A capped one-to-many relationship: only the newest `limit` children of each
+# parent are loaded, by one windowed SELECT for the whole page of parents.
+class Capped:
+    def __init__(self, relationship, order_by, limit: int):
+        self.relationship = relationship
+        self.order_by = order_by
+        self.limit = limit
+
+    async def load(self, db: AsyncSession, parents: list):
+        prop = self.relationship.property
+        child = prop.mapper.class_
+        (parent_column, child_column), = prop.local_remote_pairs
+        parent_key = parent_column.key
+        ranked = select(
+            child,
+            func.row_number().over(
+                partition_by=child_column, order_by=[column.desc() for column in self.order_by]
+            ).label("rank"),
+        ).where(child_column.in_([getattr(parent, parent_key) for parent in parents])).subquery()
+        child_alias = aliased(child, ranked)
+        result = await db.execute(
+            select(child_alias).where(ranked.c.rank <= self.limit).order_by(ranked.c.rank))
+        by_parent = defaultdict(list)
+        for row in result.scalars():
+            by_parent[getattr(row, child_column.key)].append(row)
+        for parent in parents:
+            set_committed_value(parent, self.relationship.key, by_parent.get(getattr(parent, parent_key), []))
+
+# How to load everything a response schema serializes. Relationships not named
+# in the plan raise instead of lazy loading, so a schema change that would add
+# a query per row fails loudly rather than silently turning into N+1.
+class LoadingPlan:
+    def __init__(self, selectin=(), capped=()):
+        self.selectin = selectin
+        self.capped = capped
+
+    def options(self):
+        return [selectinload(relationship) for relationship in self.selectin] + [raiseload("*")]
+
+    def apply(self, query):
+        return query.options(*self.options())
+
+    # Run the plan's query and fill in capped relationships for the results.
+    async def all(self, db: AsyncSession, query) -> list:
+        result = await db.execute(self.apply(query))
+        rows = result.scalars().all()
+        if rows:
+            for capped in self.capped:
+                await capped.load(db, rows)
+        return rows
+
+    async def first(self, db: AsyncSession, query):
+        rows = await self.all(db, query.limit(1))
+        return rows[0] if rows else None
+
+plans = {
+    schemas.User: LoadingPlan(
+        selectin=(
+            models.User.physician_assigned_patients,
+            models.User.user_authorized_facilities,
+        ),
+        capped=(
+            Capped(models.User.user_login_logs,
+                   (models.UserLoginLog.user_date_time_of_activity, models.UserLoginLog.user_login_log_id),
+                   USER_LOG_PREVIEW_LIMIT),
+            Capped(models.User.user_activity_logs,
+                   (models.UserActivityLog.user_date_time_of_activity, models.UserActivityLog.user_activity_log_id),
+                   USER_LOG_PREVIEW_LIMIT),
+        ),
+    ),
+    schemas.UserActivityLog: LoadingPlan(),
+}
+
+def plan_for(schema) -> LoadingPlan:
+    return plans[schema]
+
+# The data a LoadingPlan loads for a schema, selected as plain column tuples
+# into slotted dataclass records with the schema's fields in order. Records
+# skip the identity map, attribute instrumentation and schema validation, and
+# orjson encodes them natively to the same JSON the schema would produce.
+# Queries are the same select(model) statements LoadingPlan runs, with the
+# columns swapped in, so filters, ordering and authorization scope still apply.
+class RowPlan:
+    def __init__(self, schema, plan: LoadingPlan):
+        model = schema_models[schema]
+        mapper = inspect(model)
+        relationships = {relationship.key: (relationship, None) for relationship in plan.selectin}
+        relationships.update({capped.relationship.key: (capped.relationship, capped) for capped in plan.capped})
+        self.columns = []
+        self.nested = []
+        for name, field in schema.model_fields.items():
+            if name in mapper.column_attrs:
+                if self.nested:
+                    raise ValueError(f"{schema.__name__}.{name}: column fields must come before nested lists")
+                self.columns.append(getattr(model, name))
+            elif name in relationships:
+                relationship, capped = relationships[name]
+                self.nested.append((name, relationship, capped, RowPlan(get_args(field.annotation)[0], LoadingPlan())))
+            else:
+                raise ValueError(f"{schema.__name__}.{name} is not a column or a planned relationship")
+        self.record = make_dataclass(f"{schema.__name__}Row", list(schema.model_fields), slots=True)
+        self._placeholders = (None,) * len(self.nested)
+
+    def _records(self, rows) -> list:
+        record, placeholders = self.record, self._placeholders
+        return [record(*row, *placeholders) for row in rows]
+
+    async def all(self, db: AsyncSession, query) -> list:
+        result = await db.execute(query.with_only_columns(*self.columns))
+        records = self._records(result.tuples())
+        if records:
+            for name, relationship, capped, child in self.nested:
+                await child._fill(db, records, name, relationship, capped)
+        return records
+
+    async def first(self, db: AsyncSession, query):
+        records = await self.all(db, query.limit(1))
+        return records[0] if records else None
+
+    # Set the name list on each parent record, loading this plan's rows the way
+    # selectinload or Capped would for the ORM objects.
+    async def _fill(self, db: AsyncSession, parents: list, name: str, relationship, capped):
+        (parent_column, child_column), = relationship.property.local_remote_pairs
+        parent_key = parent_column.key
+        parent_ids = [getattr(parent, parent_key) for parent in parents]
+        if capped is None:
+            query = select(child_column, *self.columns).where(child_column.in_(parent_ids))
+        else:
+            ranked = select(
+                child_column.label("parent_id"), *self.columns,
+                func.row_number().over(
+                    partition_by=child_column, order_by=[column.desc() for column in capped.order_by]
+                ).label("rank"),
+            ).where(child_column.in_(parent_ids)).subquery()
+            query = (select(ranked.c.parent_id, *[ranked.c[column.key] for column in self.columns])
+                     .where(ranked.c.rank <= capped.limit).order_by(ranked.c.rank))
+        record = self.record
+        by_parent = defaultdict(list)
+        for parent_id, *row in (await db.execute(query)).tuples():
+            by_parent[parent_id].append(record(*row))
+        for parent in parents:
+            setattr(parent, name, by_parent.get(getattr(parent, parent_key), []))
+
+schema_models = {
+    schemas.User: models.User,
+    schemas.UserActivityLog: models.UserActivityLog,
+    schemas.UserAuthorizedFacility: models.UserAuthorizedFacility,
+    schemas.PhysicianAssignedPatient: models.PhysicianAssignedPatient,
+    schemas.UserLoginLog: models.UserLoginLog,
+}
+
+# Only the schema's column fields, as the row tuples the query returns, for
+# encoders that lay a page out one array per column (see formats.py). Nested
+# lists are left out.
+class TuplePlan:
+    def __init__(self, schema):
+        model = schema_models[schema]
+        mapper = inspect(model)
+        self.columns = [getattr(model, name) for name in schema.model_fields if name in mapper.column_attrs]
+        self.names = [column.key for column in self.columns]
+        self.python_types = [column.type.python_type for column in self.columns]
+
+    async def all(self, db: AsyncSession, query) -> list:
+        return (await db.execute(query.with_only_columns(*self.columns))).all()
+
+    async def first(self, db: AsyncSession, query):
+        rows = await self.all(db, query.limit(1))
+        return rows[0] if rows else None
+
+row_plans = {schema: RowPlan(schema, plan) for schema, plan in plans.items()}
+tuple_plans = {schema: TuplePlan(schema) for schema in plans}
+
+def row_plan_for(schema) -> RowPlan:
+    return row_plans[schema]
+
+def tuple_plan_for(schema) -> TuplePlan:
+    return tuple_plans[schema]
+
+_adapters: dict = {}
+
+# JSON for value as the response schema renders it: ORM objects are validated
+# against the schema, RowPlan records (also inside pages) are encoded as they are.
+def render(schema, value, as_rows: bool = False) -> bytes:
+    if as_rows:
+        return orjson.dumps(value)
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
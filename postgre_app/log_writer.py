@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Union
+from sqlalchemy import insert
+from . import models, response_cache
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# Flush once this many rows are waiting, or every interval, whichever is first.
+LOG_WRITER_BATCH_SIZE = int(os.environ.get("LOG_WRITER_BATCH_SIZE", 500))
+LOG_WRITER_FLUSH_INTERVAL = float(os.environ.get("LOG_WRITER_FLUSH_INTERVAL", 1.0))
+# Rows kept for retry while the database is unreachable; the oldest are dropped beyond this.
+LOG_WRITER_MAX_PENDING = int(os.environ.get("LOG_WRITER_MAX_PENDING", 100000))
+# Write every row before returning, for tests and single-shot scripts.
+LOG_WRITER_SYNC = os.environ.get("LOG_WRITER_SYNC", "false").lower() in ("1", "true", "yes")
+
+# Append-only buffer for UserActivityLog and UserLoginLog rows. Rows are
+# written with one multi-row INSERT per table per flush instead of a
+# transaction (and a refresh SELECT) per row.
+class LogWriter:
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int, sync: bool = False):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.sync = sync
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self._pending: dict[type, list[dict]] = {models.UserActivityLog: [], models.UserLoginLog: []}
+        self._wakeup: Union[asyncio.Event, None] = None
+        self._flush_lock: Union[asyncio.Lock, None] = None
+        self._task: Union[asyncio.Task, None] = None
+        self._stopping = False
+
+    def pending(self) -> int:
+        return sum(len(rows) for rows in self._pending.values())
+
+    async def log_activity(self, user_id: int, description: str, when: Union[datetime, None] = None):
+        await self._append(models.UserActivityLog, user_id, description, when)
+
+    async def log_login(self, user_id: int, description: str, when: Union[datetime, None] = None):
+        await self._append(models.UserLoginLog, user_id, description, when)
+
+    async def _append(self, model, user_id: int, description: str, when: Union[datetime, None]):
+        self._pending[model].append({
+            "user_id": user_id,
+            "user_date_time_of_activity": when or datetime.now(),
+            "activity_description": description,
+        })
+        if self.sync or self._task is None:
+            # A failed flush is logged and its rows kept for the next one; it
+            # must not fail the request that appended the row.
+            try:
+                await self.flush()
+            except Exception:
+                pass
+        elif self.pending() >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batches = [(model, rows) for model, rows in self._pending.items() if rows]
+            if not batches:
+                return
+            for model, _ in batches:
+                self._pending[model] = []
+            try:
+                async with engine.begin() as conn:
+                    for model, rows in batches:
+                        await conn.execute(insert(model), rows)
+            except Exception:
+                logger.exception("Failed to write %d log rows, keeping them for retry",
+                                 sum(len(rows) for _, rows in batches))
+                for model, rows in batches:
+                    self._pending[model] = rows + self._pending[model]
+                self._trim()
+                raise
+            self.flushes += 1
+            self.rows_written += sum(len(rows) for _, rows in batches)
+            # Users nest their recent logs in cached responses.
+            for user_id in {row["user_id"] for _, rows in batches for row in rows}:
+                response_cache.invalidate_user(user_id)
+
+    def _trim(self):
+        for model, rows in self._pending.items():
+            overflow = len(rows) - self.max_pending
+            if overflow > 0:
+                del rows[:overflow]
+                self.rows_dropped += overflow
+                logger.error("Dropped %d buffered %s rows", overflow, model.__tablename__)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                if not self._stopping:
+                    await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        if self.sync or self._task is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    # Let the background flusher finish its last flush rather than cancelling
+    # it mid-write, then write anything appended since.
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "sync": self.sync,
+            "pending": self.pending(),
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "flushes": self.flushes,
+        }
+
+writer = LogWriter(LOG_WRITER_BATCH_SIZE, LOG_WRITER_FLUSH_INTERVAL, LOG_WRITER_MAX_PENDING, LOG_WRITER_SYNC)
@@ -0,0 +1,151 @@
+import os
+import re
+from datetime import date
+from difflib import SequenceMatcher
+from typing import Union
+from sqlalchemy import Float, and_, case, cast, func, literal, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+# Candidates fetched per criterion before scoring. Each is one index probe:
+# last names one typo away, last names starting with a name word (partial
+# names), exact date of birth (closest name first), trailing phone digits.
+LOOKUP_CANDIDATES = int(os.environ.get("LOOKUP_CANDIDATES", 100))
+# Score at or above which a candidate is reported as a likely duplicate.
+LOOKUP_DUPLICATE_SCORE = float(os.environ.get("LOOKUP_DUPLICATE_SCORE", 0.8))
+# Partial phone numbers shorter than this are ignored (too many matches).
+LOOKUP_MIN_PHONE_DIGITS = 4
+# Name words shorter than this are scored but not searched for.
+LOOKUP_MIN_WORD_LENGTH = 3
+# Shorter names only match exactly; dropping a letter from them matches too
+# many other names. Migration 0006 has the same cutoff.
+LOOKUP_MIN_VARIANT_LENGTH = 4
+# Relative weight of each criterion in the score, scaled by the criteria given.
+WEIGHTS = {"name": 0.6, "date_of_birth": 0.25, "phone": 0.15}
+
+CANDIDATE_COLUMNS = [
+    models.User.user_id, models.User.username, models.User.user_first_name, models.User.user_last_name,
+    models.User.user_date_of_birth, models.User.user_phone_number, models.User.facility_id,
+]
+
+def normalize_name(name: Union[str, None]) -> str:
+    return " ".join((name or "").lower().split())
+
+def normalize_phone(phone: Union[str, None]) -> str:
+    return re.sub(r"[^0-9]", "", phone or "")
+
+# The name and every spelling with one letter removed. Two names share a
+# variant when they are one insertion, deletion, substitution or transposition
+# apart. Postgres computes the same with lookup_name_variants().
+def name_variants(name: str) -> list[str]:
+    if len(name) < LOOKUP_MIN_VARIANT_LENGTH:
+        return [name]
+    return [name, *(name[:i] + name[i + 1:] for i in range(len(name)))]
+
+# LIKE 'prefix%' as the range the text_pattern_ops indexes scan. Unlike LIKE
+# with a bound pattern, it stays indexable when Postgres switches the prepared
+# statement to a generic plan.
+def _starts_with(expression, prefix: str):
+    return and_(expression.op("~>=~")(prefix), expression.op("~<~")(prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+
+def phone_score(query_digits: str, digits: str) -> float:
+    if not query_digits or not digits:
+        return 0.0
+    if digits == query_digits:
+        return 1.0
+    return 0.5 if digits.endswith(query_digits) else 0.0
+
+# Similarity of the query to the best matching run of words in the name, on a
+# 0-1 scale, like pg_trgm's word_similarity but character based.
+def name_similarity(query_name: str, name: str) -> float:
+    words = name.split()
+    width = len(query_name.split())
+    runs = [" ".join(words[start:start + width]) for start in range(max(1, len(words) - width + 1))]
+    return max(SequenceMatcher(None, query_name, run).ratio() for run in runs)
+
+def _weights(name: str, date_of_birth: Union[date, None], digits: str) -> dict:
+    given = {"name": bool(name), "date_of_birth": date_of_birth is not None, "phone": bool(digits)}
+    return {criterion: weight for criterion, weight in WEIGHTS.items() if given[criterion]}
+
+# Users ranked by how well they match a typo-prone name, date of birth and
+# trailing phone digits (any combination). On Postgres each given criterion
+# pulls a bounded set of candidates from its index, and only their union is
+# scored with pg_trgm word similarity. Any name word may be the last name, so
+# each is tried against the last name indexes; first names are too common to
+# narrow anything at scale and only count towards the score.
+async def lookup(db: AsyncSession, name: Union[str, None] = None, date_of_birth: Union[date, None] = None,
+                 phone: Union[str, None] = None, limit: int = 20) -> list[dict]:
+    name = normalize_name(name)
+    digits = normalize_phone(phone)
+    if len(digits) < LOOKUP_MIN_PHONE_DIGITS:
+        digits = ""
+    weights = _weights(name, date_of_birth, digits)
+    if not weights:
+        return []
+    if db.get_bind().dialect.name != "postgresql":
+        return await _lookup_scan(db, name, date_of_birth, digits, weights, limit)
+
+    user = models.User
+    query_name = literal(name)
+    name_match = cast(func.word_similarity(query_name, models.user_search_name), Float) if name else literal(0.0)
+    branches = []
+    words = [word for word in name.split() if len(word) >= LOOKUP_MIN_WORD_LENGTH]
+    if words:
+        variants = sorted({variant for word in words for variant in name_variants(word)})
+        branches.append(select(user.user_id).where(models.user_last_name_variants.overlap(variants))
+                        .order_by(name_match.desc()).limit(LOOKUP_CANDIDATES))
+        branches.append(select(user.user_id)
+                        .where(or_(*(_starts_with(models.user_last_name_key, word) for word in words)))
+                        .limit(LOOKUP_CANDIDATES))
+    if date_of_birth is not None:
+        branches.append(select(user.user_id).where(user.user_date_of_birth == date_of_birth)
+                        .order_by(name_match.desc()).limit(LOOKUP_CANDIDATES))
+    if digits:
+        branches.append(select(user.user_id).where(_starts_with(models.user_phone_suffix, digits[::-1]))
+                        .limit(LOOKUP_CANDIDATES))
+    if not branches:
+        return []
+    candidates = (branches[0] if len(branches) == 1 else union(*branches)).subquery()
+
+    birth_match = case((user.user_date_of_birth == date_of_birth, 1.0), else_=0.0) if date_of_birth else literal(0.0)
+    phone_match = case((models.user_phone_digits == digits, 1.0), (models.user_phone_digits.endswith(digits), 0.5),
+                       else_=0.0) if digits else literal(0.0)
+    score = ((weights.get("name", 0) * name_match + weights.get("date_of_birth", 0) * birth_match
+              + weights.get("phone", 0) * phone_match) / sum(weights.values())).label("score")
+    result = await db.execute(
+        select(*CANDIDATE_COLUMNS, score, name_match.label("name_similarity"),
+               (birth_match == 1.0).label("date_of_birth_match"), phone_match.label("phone_match"))
+        .join(candidates, candidates.c.user_id == user.user_id)
+        .order_by(score.desc(), user.user_id).limit(limit))
+    return [dict(row) for row in result.mappings()]
+
+# Fallback without pg_trgm: prefilter on name fragments, date of birth or any
+# phone number and score the rows in Python.
+async def _lookup_scan(db: AsyncSession, name: str, date_of_birth: Union[date, None], digits: str,
+                       weights: dict, limit: int) -> list[dict]:
+    user = models.User
+    conditions = [models.user_search_name.contains(word[:3]) for word in name.split()]
+    if date_of_birth is not None:
+        conditions.append(user.user_date_of_birth == date_of_birth)
+    if digits:
+        conditions.append(user.user_phone_number.is_not(None))
+    result = await db.execute(select(*CANDIDATE_COLUMNS).where(or_(*conditions)))
+    candidates = []
+    for row in result.mappings():
+        candidate = dict(row)
+        similarity = name_similarity(name, normalize_name(f"{row['user_first_name']} {row['user_last_name']}")) if name else 0.0
+        birth_match = date_of_birth is not None and row["user_date_of_birth"] == date_of_birth
+        phone_match = phone_score(digits, normalize_phone(row["user_phone_number"]))
+        candidate.update(
+            score=(weights.get("name", 0) * similarity + weights.get("date_of_birth", 0) * birth_match
+                   + weights.get("phone", 0) * phone_match) / sum(weights.values()),
+            name_similarity=similarity, date_of_birth_match=birth_match, phone_match=phone_match)
+        candidates.append(candidate)
+    candidates.sort(key=lambda candidate: (-candidate["score"], candidate["user_id"]))
+    return candidates[:limit]
+
+# Existing users that are probably the same person as a new registration.
+async def find_duplicates(db: AsyncSession, user, limit: int = 10) -> list[dict]:
+    candidates = await lookup(db, name=f"{user.user_first_name} {user.user_last_name}",
+                              date_of_birth=user.user_date_of_birth, phone=user.user_phone_number, limit=limit)
+    return [candidate for candidate in candidates if candidate["score"] >= LOOKUP_DUPLICATE_SCORE]
@@ -0,0 +1,49 @@
+import asyncio
+import os
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from .database import engine
+
+# Upgrade the schema to the latest migration when the app starts. Turn this off
+# when migrations are run as a separate deploy step (python -m postgre_app.migrate).
+DB_AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+ROOT = Path(__file__).resolve().parent.parent
+# Databases created by the old create_all startup match this revision.
+BASELINE_REVISION = "0001"
+# Serializes app instances that start at the same time against one Postgres.
+MIGRATION_LOCK_KEY = 0x656D7273
+
+def _config(connection) -> Config:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    config.attributes["connection"] = connection
+    return config
+
+def _upgrade(connection):
+    config = _config(connection)
+    tables = inspect(connection).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+async def upgrade_database():
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        await conn.run_sync(_upgrade)
+
+# Record a schema built with create_all as up to date, so that
+# upgrade_database leaves it alone (SQLite, benchmarks.synthetic).
+async def stamp_database():
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda connection: command.stamp(_config(connection), "head"))
+
+async def _main():
+    await upgrade_database()
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,9 +1,42 @@
-from sqlalchemy import Column, Boolean, ForeignKey, Integer, BigInteger, Double, String, DateTime, Date
+from sqlalchemy import Column, Boolean, ForeignKey, Index, Integer, BigInteger, Double, PrimaryKeyConstraint, String, DateTime, Date, Text, false, func, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateColumn
 from .database import Base
 
+# SQLite only generates ids for a lone INTEGER PRIMARY KEY column (an alias of
+# the rowid), so BigInteger keys are created as INTEGER there; SQLite integers
+# are 64 bit either way.
+@compiles(BigInteger, "sqlite")
+def _sqlite_big_integer(type_, compiler, **kw):
+    return "INTEGER"
+
+# The partitioned log tables have the partition key in their Postgres primary
+# key. SQLite cannot generate ids for a composite key, so there the generated
+# id alone is the key.
+def _sqlite_generated_key(table):
+    if table.dialect_options["postgresql"]["partition_by"] and table.autoincrement_column is not None:
+        return table.autoincrement_column
+    return None
+
+@compiles(CreateColumn, "sqlite")
+def _sqlite_create_column(create, compiler, **kw):
+    column = create.element
+    if column is _sqlite_generated_key(column.table):
+        return f"{compiler.preparer.format_column(column)} INTEGER NOT NULL"
+    return compiler.visit_create_column(create, **kw)
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _sqlite_primary_key(constraint, compiler, **kw):
+    column = _sqlite_generated_key(constraint.table)
+    if column is not None:
+        return f"PRIMARY KEY ({compiler.preparer.format_column(column)})"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
 class Admission(Base):
     __tablename__ = "admissions"
+    __table_args__ = (Index("ix_admissions_medical_record_id_date_of_admission", "medical_record_id", "date_of_admission"),)
 
     admission_id = Column(BigInteger, primary_key=True, nullable=False)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
@@ -16,7 +49,7 @@ class Allergy(Base):
     __tablename__ = "allergies"
 
     allergy_id = Column(BigInteger, primary_key=True, nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     allergy_name = Column(String(75), nullable=False)
     allergy_severity = Column(String(75))
     additional_information = Column(String)
@@ -25,6 +58,7 @@ class Allergy(Base):
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (Index("ix_appointments_medical_record_id_appointment_date", "medical_record_id", "appointment_date"),)
 
     appointment_id = Column(BigInteger, primary_key=True, nullable=False)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
@@ -38,8 +72,8 @@ class Assessment(Base):
     __tablename__ = "assessments"
 
     assessment_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     assessments_summation = Column(String, nullable=False)
 
     chief_complaint = relationship("ChiefComplaint", back_populates="assessments")
@@ -49,7 +83,7 @@ class BloodRelative(Base):
     __tablename__ = "blood_relatives"
 
     blood_relatives_id = Column(BigInteger, primary_key=True, nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     mother_status = Column(String(45), nullable=False)
     father_status = Column(String(45), nullable=False)
     mother_deceased_age = Column(Integer)
@@ -65,6 +99,7 @@ class BloodRelative(Base):
 
 class ChiefComplaint(Base):
     __tablename__ = "chief_complaints"
+    __table_args__ = (Index("ix_chief_complaints_medical_record_id_chief_complaint_date", "medical_record_id", "chief_complaint_date"),)
 
     chief_complaint_id = Column(BigInteger, primary_key=True, nullable=False)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
@@ -84,10 +119,24 @@ class ChiefComplaint(Base):
     diagnoses = relationship("Diagnosis", back_populates="chief_complaint")
     medical_record = relationship("MedicalRecord", back_populates="chief_complaints") # One to many relationship with chief complaints.
 
+# Full-text search documents for clinical free text, one per source row, kept
+# current by search.py. The document is a tsvector on Postgres; other
+# databases use the in-process index in search.py instead.
+class ClinicalTextIndex(Base):
+    __tablename__ = "clinical_text_index"
+    __table_args__ = (Index("ix_clinical_text_index_document", "document", postgresql_using="gin"),)
+
+    source = Column(String(20), primary_key=True, nullable=False)
+    source_id = Column(BigInteger, primary_key=True, autoincrement=False, nullable=False)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
+    recorded_at = Column(DateTime)
+    document = Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=False)
+
 class Diagnosis(Base):
     __tablename__ = "diagnoses"
+    __table_args__ = (Index("ix_diagnoses_medical_record_id_diagnosis_date", "medical_record_id", "diagnosis_date"),)
     diagnosis_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     diagnosis_title = Column(String(45), nullable=False)
     diagnosis_date = Column(DateTime, nullable=False)
@@ -96,11 +145,29 @@ class Diagnosis(Base):
     chief_complaint = relationship("ChiefComplaint", back_populates="diagnoses")
     medical_record = relationship("MedicalRecord", back_populates="diagnoses")
 
+# NEWS2 score of each medical record's latest vitals, kept current by news2.py.
+class EarlyWarningScore(Base):
+    __tablename__ = "early_warning_scores"
+
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), primary_key=True, autoincrement=False, nullable=False)
+    vitals_id = Column(BigInteger, ForeignKey("vitals.vitals_id"), nullable=False, index=True)
+    vitals_date_taken = Column(DateTime, nullable=False)
+    respiratory_rate_score = Column(Integer, nullable=False)
+    oxygen_saturation_score = Column(Integer, nullable=False)
+    systolic_blood_pressure_score = Column(Integer, nullable=False)
+    pulse_score = Column(Integer, nullable=False)
+    temperature_score = Column(Integer, nullable=False)
+    total_score = Column(Integer, nullable=False)
+    max_parameter_score = Column(Integer, nullable=False)
+    missing_parameters = Column(Integer, nullable=False)
+    risk_level = Column(String(10), nullable=False)
+    scored_at = Column(DateTime, nullable=False)
+
 class EmergencyContact(Base):
     __tablename__ = "emergency_contacts"
 
     emergency_contact_id = Column(BigInteger, primary_key=True, nullable=False)
-    user_id = Column(BigInteger, ForeignKey("patients.user_id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("patients.user_id"), nullable=False, index=True)
     emergency_contact_given_name = Column(String(50), nullable=False)
     emergency_contact_middle_initial = Column(String(1))
     emergency_contact_last_name = Column(String(50), nullable=False)
@@ -113,7 +180,7 @@ class FamilyIllness(Base):
     __tablename__ = "family_illnesses"
 
     family_illness_id = Column(BigInteger, primary_key=True, nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     illness = Column(String(75), nullable=False)
     father = Column(Boolean)
     mother = Column(Boolean)
@@ -129,8 +196,8 @@ class HistoryPresentIllness(Base):
     __tablename__ = "histories_present_illness"
 
     history_present_illness_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     hpi_location = Column(String)
     hpi_character = Column(String)
     hpi_duration = Column(String)
@@ -146,9 +213,10 @@ class HistoryPresentIllness(Base):
 
 class Illness(Base):
     __tablename__ = "illnesses"
+    __table_args__ = (Index("ix_illnesses_medical_record_id_illnesses_diagnosis_date", "medical_record_id", "illnesses_diagnosis_date"),)
 
     illness_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     illnesses_diagnosis_date = Column(DateTime)
     illnesses_diagnosis_id = Column(BigInteger)
@@ -164,16 +232,27 @@ class Immunization(Base):
     __tablename__ = "immunizations"
 
     immunization_id = Column(BigInteger, primary_key=True, nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     immunization = Column(String(85), nullable=False)
 
     medical_record = relationship("MedicalRecord", back_populates="immunizations")
 
+# Failed login counters shared between processes by the "database" login
+# throttle backend (see throttle.py). Created UNLOGGED on Postgres: losing the
+# counts in a crash only resets the throttle.
+class LoginThrottleWindow(Base):
+    __tablename__ = "login_throttle_windows"
+
+    throttle_key = Column(String(100), primary_key=True, nullable=False)
+    window_index = Column(BigInteger, nullable=False)
+    current_count = Column(Integer, nullable=False)
+    previous_count = Column(Integer, nullable=False)
+
 class MedicalRecord(Base):
     __tablename__ = "medical_records"
 
     medical_record_id = Column(BigInteger, primary_key=True, nullable=False)
-    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
     patient_condition = Column(String, nullable=False)
     medical_record_created = Column(DateTime, nullable=False)
     is_active = Column(Boolean, nullable=False)
@@ -182,7 +261,7 @@ class MedicalRecord(Base):
     user = relationship("User", back_populates="medical_record")
     illnesses = relationship("Illness", back_populates="medical_record")
     nurse_notes = relationship("NurseNote", back_populates="medical_record")
-    social_history = relationship("SocialHistory", back_populates="medical_record")
+    social_history = relationship("SocialHistory", back_populates="medical_record", uselist=False)
     appointments = relationship("Appointment", back_populates="medical_record")
     family_illnesses = relationship("FamilyIllness", back_populates="medical_record")
     medications = relationship("Medication", back_populates="medical_record")
@@ -204,9 +283,10 @@ class MedicalRecord(Base):
 
 class Medication(Base):
     __tablename__ = "medications"
+    __table_args__ = (Index("ix_medications_medical_record_id_medication_start_date", "medical_record_id", "medication_start_date"),)
 
     medication_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"))
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     medication_name = Column(String(150), nullable=False)
     medication_is_current = Column(Boolean, nullable=False)
@@ -234,6 +314,7 @@ class Nonpatient(Base):
 
 class NurseNote(Base):
     __tablename__ = "nurse_notes"
+    __table_args__ = (Index("ix_nurse_notes_medical_record_id_nurse_note_date_posted", "medical_record_id", "nurse_note_date_posted"),)
 
     nurse_note_id = Column(BigInteger, primary_key=True, nullable=False)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
@@ -273,16 +354,17 @@ class PatientRace(Base):
     __tablename__ = "patient_races"
 
     patient_race_id = Column(BigInteger, primary_key=True, nullable=False)
-    user_id = Column(BigInteger, ForeignKey("patients.user_id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("patients.user_id"), nullable=False, index=True)
     patient_race = Column(String(254), nullable=False)
 
     patient = relationship("Patient", back_populates="patient_race")
 
 class PhysicalExam(Base):
     __tablename__ = "physical_exams"
+    __table_args__ = (Index("ix_physical_exams_medical_record_id_physical_exam_date", "medical_record_id", "physical_exam_date"),)
 
     physical_exam_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     physical_exam_heent = Column(String)
     physical_exam_respiratory = Column(String)
@@ -299,7 +381,7 @@ class PhysicianAssignedPatient(Base):
     __tablename__ = "physician_assigned_patients"
 
     staff_user_id = Column(BigInteger, ForeignKey("users.user_id"), primary_key=True, nullable=False)
-    patient_user_id = Column(BigInteger, nullable=False)
+    patient_user_id = Column(BigInteger, primary_key=True, nullable=False, index=True)
 
     user = relationship("User", back_populates="physician_assigned_patients")
 
@@ -307,18 +389,37 @@ class Plan(Base):
     __tablename__ = "plans"
 
     plan_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     plans_summation = Column(String)
 
     chief_complaint = relationship("ChiefComplaint", back_populates="plans")
     medical_record = relationship("MedicalRecord", back_populates="plans")
 
+# Refresh tokens are stored as SHA-256 digests. Each refresh marks the token
+# used and issues a successor in the same family; presenting a used token
+# again revokes the whole family, along with the unexpired access tokens issued
+# with it (see tokens.py).
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    refresh_token_id = Column(BigInteger, primary_key=True, nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    access_token_jti = Column(String(32), nullable=False)
+    access_token_expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime)
+    revoked_at = Column(DateTime)
+
 class ReviewOfSystems(Base):
     __tablename__ = "review_of_systems"
+    __table_args__ = (Index("ix_review_of_systems_medical_record_id_review_of_systems_date", "medical_record_id", "review_of_systems_date"),)
 
     review_of_systems_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     review_of_systems_constitutional_symptoms = Column(String)
     review_of_systems_eyes = Column(String)
@@ -339,11 +440,21 @@ class ReviewOfSystems(Base):
     chief_complaint = relationship("ChiefComplaint", back_populates="reviews_of_systems")
     medical_record = relationship("MedicalRecord", back_populates="reviews_of_systems")
 
+# Access tokens revoked before they expire, by JWT ID. Rows are only needed
+# until expires_at, after which the token is rejected anyway.
+class RevokedAccessToken(Base):
+    __tablename__ = "revoked_access_tokens"
+
+    jti = Column(String(32), primary_key=True, nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 class SocialHistory(Base):
     __tablename__ = "social_histories"
 
     social_history_id = Column(BigInteger, primary_key=True, nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"))
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), index=True)
     substances = Column(String)
     occupation = Column(String)
     sexual_behavior = Column(String)
@@ -359,8 +470,8 @@ class SurgicalRelatedProblem(Base):
     __tablename__ = "surgical_related_problems"
 
     surgical_related_problem_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
-    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
+    medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False, index=True)
     surgical_related_problem = Column(String(105), nullable=False)
     surgical_related_problem_area = Column(String(75), nullable=False)
     surgical_related_problem_procedure = Column(String(225))
@@ -371,9 +482,10 @@ class SurgicalRelatedProblem(Base):
 
 class Treatment(Base):
     __tablename__ = "treatments"
+    __table_args__ = (Index("ix_treatments_medical_record_id_treatment_date_created", "medical_record_id", "treatment_date_created"),)
 
     treatment_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     treatment_healthcare_provider = Column(String(105))
     treatment_type = Column(String(75), nullable=False)
@@ -400,11 +512,13 @@ class User(Base):
     user_first_name = Column(String(35), nullable=False)
     user_middle_initial = Column(String(1))
     user_last_name = Column(String(50), nullable=False)
-    user_date_of_birth = Column(Date, nullable=False)
+    user_date_of_birth = Column(Date, nullable=False, index=True)
     email = Column(String(254), unique=True)
     user_date_created = Column(DateTime, nullable=False)
-    facility_id = Column(String(75), nullable=False)
+    facility_id = Column(String(75), nullable=False, index=True)
     is_active = Column(Boolean, nullable=False)
+    # Admins may import users and run exports (see authorization.py).
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=false())
     hashed_password = Column(String(68), nullable=False)
     user_street_address = Column(String(100))
     user_city = Column(String(45))
@@ -420,12 +534,35 @@ class User(Base):
     nonpatients = relationship("Nonpatient", back_populates="user")
     medical_record = relationship("MedicalRecord", back_populates="user")
 
+# Normalized name and phone number expressions used by lookup.py. Literals
+# stay in the SQL (not bound parameters) so queries repeat the indexed
+# expressions exactly. Last names are indexed for exact and prefix matches and,
+# through lookup_name_variants() (created by migration 0006), by every spelling
+# one deletion away, which catches single typos. Phone digits are indexed
+# reversed so a trailing-digits search is a btree prefix scan.
+user_search_name = func.lower(User.user_first_name.op("||", return_type=String)(literal_column("' '")) + User.user_last_name)
+user_last_name_key = func.lower(User.user_last_name, type_=String)
+user_last_name_variants = func.lookup_name_variants(user_last_name_key, type_=ARRAY(Text))
+user_phone_digits = func.regexp_replace(User.user_phone_number, literal_column("'[^0-9]'"), literal_column("''"), literal_column("'g'"))
+user_phone_suffix = func.reverse(user_phone_digits, type_=String)
+Index("ix_users_last_name_prefix", user_last_name_key.label("last_name"),
+      postgresql_ops={"last_name": "text_pattern_ops"}).ddl_if(dialect="postgresql")
+Index("ix_users_last_name_variants", user_last_name_variants, postgresql_using="gin").ddl_if(dialect="postgresql")
+Index("ix_users_phone_suffix", user_phone_suffix.label("phone_suffix"),
+      postgresql_ops={"phone_suffix": "text_pattern_ops"}).ddl_if(dialect="postgresql")
+
 class UserActivityLog(Base):
     __tablename__ = "user_activity_logs"
-
-    user_activity_log_id = Column(BigInteger, primary_key=True, nullable=False)
+    # Range partitioned by month on Postgres (see partitions.py), which needs the
+    # partition key in the primary key.
+    __table_args__ = (
+        Index("ix_user_activity_logs_user_id_user_date_time_of_activity", "user_id", "user_date_time_of_activity"),
+        {"postgresql_partition_by": "RANGE (user_date_time_of_activity)"},
+    )
+
+    user_activity_log_id = Column(BigInteger, primary_key=True, autoincrement=True, nullable=False)
     user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
-    user_date_time_of_activity = Column(DateTime, nullable=False)
+    user_date_time_of_activity = Column(DateTime, primary_key=True, nullable=False, index=True)
     activity_description = Column(String, nullable=False)
 
     user = relationship("User", back_populates="user_activity_logs")
@@ -434,23 +571,29 @@ class UserAuthorizedFacility(Base):
     __tablename__ = "user_authorized_facilities"
 
     user_authorized_facility_id = Column(BigInteger, primary_key=True, nullable=False)
-    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False, index=True)
     facility_id = Column(String(75), nullable=False)
 
     user = relationship("User", back_populates="user_authorized_facilities")
 
 class UserLoginLog(Base):
     __tablename__ = "user_login_logs"
+    # Range partitioned by month on Postgres, like user_activity_logs.
+    __table_args__ = (
+        Index("ix_user_login_logs_user_id_user_date_time_of_activity", "user_id", "user_date_time_of_activity"),
+        {"postgresql_partition_by": "RANGE (user_date_time_of_activity)"},
+    )
 
-    user_login_log_id = Column(BigInteger, primary_key=True, nullable=False)
+    user_login_log_id = Column(BigInteger, primary_key=True, autoincrement=True, nullable=False)
     user_id = Column(BigInteger, ForeignKey("users.user_id"), nullable=False)
-    user_date_time_of_activity = Column(DateTime, nullable=False) 
+    user_date_time_of_activity = Column(DateTime, primary_key=True, nullable=False) 
     activity_description = Column(String, nullable=False)
 
     user = relationship("User", back_populates="user_login_logs")
 
 class Visit(Base):
     __tablename__ = "visits"
+    __table_args__ = (Index("ix_visits_medical_record_id_visits_date", "medical_record_id", "visits_date"),)
 
     visit_id = Column(BigInteger, primary_key=True, nullable=False)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
@@ -462,9 +605,10 @@ class Visit(Base):
 
 class Vital(Base):
     __tablename__ = "vitals"
+    __table_args__ = (Index("ix_vitals_medical_record_id_vitals_date_taken", "medical_record_id", "vitals_date_taken"),)
 
     vitals_id = Column(BigInteger, primary_key=True, nullable=False)
-    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False)
+    chief_complaint_id = Column(BigInteger, ForeignKey("chief_complaints.chief_complaint_id"), nullable=False, index=True)
     medical_record_id = Column(BigInteger, ForeignKey("medical_records.medical_record_id"), nullable=False)
     vitals_date_taken = Column(DateTime)
     vitals_height = Column(Double)
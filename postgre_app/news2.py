@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Union
+import numpy as np
+from sqlalchemy import and_, bindparam, event, func, select, true, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import SessionLocal, engine
+
+# NEWS2 scoring bands per parameter: the inclusive upper bound of every band
+# but the last, and the points for each band. Patients are assumed to be alert
+# and breathing room air (SpO2 scale 1), since neither consciousness nor
+# supplemental oxygen is recorded in vitals.
+PARAMETERS = {
+    "respiratory_rate_score": (models.Vital.vitals_respiratory_rate, (8, 11, 20, 24), (3, 1, 0, 2, 3)),
+    "oxygen_saturation_score": (models.Vital.vitals_arterial_blood_oxygen_saturation, (91, 93, 95), (3, 2, 1, 0)),
+    "systolic_blood_pressure_score": (models.Vital.vitals_blood_pressure_systolic, (90, 100, 110, 219), (3, 2, 1, 0, 3)),
+    "pulse_score": (models.Vital.vitals_pulse, (40, 50, 90, 110, 130), (3, 1, 0, 1, 2, 3)),
+    "temperature_score": (models.Vital.vitals_temperature, (35.0, 36.0, 38.0, 39.0), (3, 1, 0, 1, 2)),
+}
+VITAL_COLUMNS = [column for column, _, _ in PARAMETERS.values()]
+
+# Score any number of readings at once. `values` maps each vital column name to
+# a float array (NaN where not measured); a missing parameter scores 0 and is
+# counted in missing_parameters.
+def score_arrays(values: dict) -> dict:
+    scores = {}
+    missing = 0
+    for name, (column, bounds, points) in PARAMETERS.items():
+        measured = np.asarray(values[column.key], dtype=np.float64)
+        absent = np.isnan(measured)
+        band = np.searchsorted(np.asarray(bounds, dtype=np.float64), np.where(absent, 0, measured), side="left")
+        scores[name] = np.where(absent, 0, np.asarray(points, dtype=np.int64)[band])
+        missing = missing + absent
+    parameter_scores = np.stack(list(scores.values()))
+    total = parameter_scores.sum(axis=0)
+    highest = parameter_scores.max(axis=0)
+    scores["total_score"] = total
+    scores["max_parameter_score"] = highest
+    scores["missing_parameters"] = np.asarray(missing, dtype=np.int64)
+    scores["risk_level"] = np.select(
+        [total >= 7, total >= 5, highest == 3], ["high", "medium", "low_medium"], default="low")
+    return scores
+
+def score_rows(medical_record_ids, vitals_ids, taken, scores: dict) -> list:
+    scored_at = datetime.now()
+    columns = {name: column.tolist() for name, column in scores.items()}
+    return [
+        {"medical_record_id": medical_record_id, "vitals_id": vitals_id, "vitals_date_taken": date_taken,
+         "scored_at": scored_at, **{name: column[n] for name, column in columns.items()}}
+        for n, (medical_record_id, vitals_id, date_taken) in enumerate(zip(medical_record_ids, vitals_ids, taken))
+    ]
+
+# Insert or replace scores, unless the stored score comes from a later reading
+# than the new one. With changed_only, a stored score for the same reading is
+# left alone instead of being rewritten with identical values.
+def _replace_older(statement, changed_only: bool = False):
+    table = models.EarlyWarningScore.__table__
+    condition = table.c.vitals_date_taken <= statement.excluded.vitals_date_taken
+    if changed_only:
+        compared = [column.name for column in table.columns if column.name not in ("medical_record_id", "scored_at")]
+        condition = and_(condition, tuple_(*(table.c[name] for name in compared)).is_distinct_from(
+            tuple_(*(statement.excluded[name] for name in compared))))
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.medical_record_id],
+        set_={column.name: statement.excluded[column.name] for column in table.columns if not column.primary_key},
+        where=condition,
+    )
+
+def upsert_statement(dialect_name: str):
+    insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}[dialect_name]
+    return _replace_older(insert(models.EarlyWarningScore.__table__))
+
+# The batch upsert for Postgres, with every column bound as one array and
+# unnested server side, so a whole batch is a single statement with no
+# per-row parameters. Records whose score did not change are not rewritten.
+def unnest_upsert_statement(columns: dict):
+    table = models.EarlyWarningScore.__table__
+    arrays = [bindparam(f"{name}_values", values, type_=postgresql.ARRAY(table.c[name].type))
+              for name, values in columns.items()]
+    rows = func.unnest(*arrays).table_valued(*columns).render_derived()
+    return _replace_older(postgresql.insert(table).from_select(list(columns), select(*rows.c)), changed_only=True)
+
+# Keep a record's score current as vitals come in: score only the inserted
+# reading and replace the stored score if the reading is newer, without
+# looking at the record's history. Runs in the inserting transaction.
+@event.listens_for(models.Vital, "after_insert")
+def _score_inserted_vital(mapper, connection, target):
+    if target.vitals_date_taken is None:
+        return
+    scores = score_arrays({
+        column.key: [np.nan if getattr(target, column.key) is None else getattr(target, column.key)]
+        for column in VITAL_COLUMNS})
+    rows = score_rows([target.medical_record_id], [target.vitals_id], [target.vitals_date_taken], scores)
+    connection.execute(upsert_statement(connection.dialect.name), rows)
+
+# The latest reading of every record (or of one facility's records). On
+# Postgres each record's reading is one backward probe of the
+# (medical_record_id, vitals_date_taken) index, however long its history is.
+def latest_vitals_query(dialect_name: str, facility_id: Union[str, None] = None):
+    vital = models.Vital
+    columns = [vital.medical_record_id, vital.vitals_id, vital.vitals_date_taken, *VITAL_COLUMNS]
+    if dialect_name == "postgresql":
+        latest = (
+            select(*columns)
+            .where(vital.medical_record_id == models.MedicalRecord.medical_record_id, vital.vitals_date_taken.is_not(None))
+            .order_by(vital.vitals_date_taken.desc(), vital.vitals_id.desc()).limit(1).lateral()
+        )
+        query = select(*(latest.c[column.key] for column in columns)).select_from(models.MedicalRecord).join(latest, true())
+    else:
+        rank = func.row_number().over(
+            partition_by=vital.medical_record_id, order_by=[vital.vitals_date_taken.desc(), vital.vitals_id.desc()])
+        query = select(*columns, rank.label("rank")).join(
+            models.MedicalRecord, models.MedicalRecord.medical_record_id == vital.medical_record_id
+        ).where(vital.vitals_date_taken.is_not(None))
+    if facility_id is not None:
+        query = query.join(models.User, models.User.user_id == models.MedicalRecord.user_id).where(
+            models.User.facility_id == facility_id)
+    if dialect_name != "postgresql":
+        ranked = query.subquery()
+        query = select(*(ranked.c[column.key] for column in columns)).where(ranked.c.rank == 1)
+    return query
+
+# Batch mode: score the latest reading of every record (or of one facility's
+# records) in a single vectorized pass and store the results. On Postgres the
+# readings come back as one array per column and go out the same way.
+async def rescore(db: AsyncSession, facility_id: Union[str, None] = None) -> dict:
+    started = time.perf_counter()
+    dialect_name = db.get_bind().dialect.name
+    latest = latest_vitals_query(dialect_name, facility_id)
+    width = 3 + len(VITAL_COLUMNS)
+    if dialect_name == "postgresql":
+        latest = latest.subquery()
+        result = await db.execute(select(*(func.array_agg(column) for column in latest.c)))
+        columns = [column or [] for column in result.one()]
+    else:
+        result = await db.execute(latest)
+        columns = list(zip(*result.all())) or [[] for _ in range(width)]
+    medical_record_ids, vitals_ids, taken, *measurements = columns
+    loaded = time.perf_counter()
+    if not medical_record_ids:
+        return {"records": 0, "load_seconds": round(loaded - started, 3), "score_seconds": 0.0, "write_seconds": 0.0}
+
+    scores = score_arrays({column.key: measured for column, measured in zip(VITAL_COLUMNS, measurements)})
+    scored = time.perf_counter()
+    if dialect_name == "postgresql":
+        await db.execute(unnest_upsert_statement({
+            "medical_record_id": list(medical_record_ids), "vitals_id": list(vitals_ids),
+            "vitals_date_taken": list(taken), "scored_at": [datetime.now()] * len(medical_record_ids),
+            **{name: column.tolist() for name, column in scores.items()},
+        }))
+    else:
+        await db.execute(upsert_statement(dialect_name), score_rows(medical_record_ids, vitals_ids, taken, scores))
+    await db.commit()
+    return {
+        "records": len(medical_record_ids),
+        "load_seconds": round(loaded - started, 3),
+        "score_seconds": round(scored - loaded, 3),
+        "write_seconds": round(time.perf_counter() - scored, 3),
+    }
+
+async def highest_risk(db: AsyncSession, facility_id: str, limit: int = 20) -> list:
+    score = models.EarlyWarningScore
+    result = await db.execute(
+        select(*score.__table__.columns, models.MedicalRecord.user_id)
+        .join(models.MedicalRecord, models.MedicalRecord.medical_record_id == score.medical_record_id)
+        .join(models.User, models.User.user_id == models.MedicalRecord.user_id)
+        .where(models.User.facility_id == facility_id)
+        .order_by(score.total_score.desc(), score.max_parameter_score.desc(), score.vitals_date_taken.desc())
+        .limit(limit))
+    return result.mappings().all()
+
+async def _main(args):
+    async with SessionLocal() as db:
+        report = await rescore(db, args.facility)
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore every medical record's latest vitals.")
+    parser.add_argument("--facility", help="only records of patients at this facility")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+import re
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions created ahead of the current month, so inserts never land
+# in the default partition.
+LOG_PARTITION_MONTHS_AHEAD = int(os.environ.get("LOG_PARTITION_MONTHS_AHEAD", 3))
+# Partitions whose whole month is older than this many months are detached.
+# 0 keeps every partition.
+LOG_RETENTION_MONTHS = int(os.environ.get("LOG_RETENTION_MONTHS", 0))
+# "archive" moves detached partitions into LOG_ARCHIVE_SCHEMA, where they can be
+# dumped and dropped; "drop" drops them straight away.
+LOG_RETENTION_ACTION = os.environ.get("LOG_RETENTION_ACTION", "archive")
+LOG_ARCHIVE_SCHEMA = os.environ.get("LOG_ARCHIVE_SCHEMA", "log_archive")
+LOG_PARTITION_CHECK_SECONDS = float(os.environ.get("LOG_PARTITION_CHECK_SECONDS", 6 * 3600))
+
+# Tables range partitioned by month on user_date_time_of_activity
+# (migrations/versions/0003_*).
+PARTITIONED_TABLES = ("user_activity_logs", "user_login_logs")
+# Only one app instance maintains partitions at a time.
+MAINTENANCE_LOCK_KEY = 0x706C6F67
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+def partition_month(name: str):
+    match = _PARTITION_NAME.match(name)
+    if match is None or match["table"] not in PARTITIONED_TABLES:
+        return None
+    return date(int(match["year"]), int(match["month"]), 1)
+
+def is_partition(name: str) -> bool:
+    if name.endswith("_default"):
+        return name[:-len("_default")] in PARTITIONED_TABLES
+    return partition_month(name) is not None
+
+async def _partitions(conn, table: str) -> list:
+    result = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits"
+        " JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"
+        " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+        " JOIN pg_namespace ON pg_namespace.oid = parent.relnamespace"
+        " WHERE parent.relname = :table AND pg_namespace.nspname = current_schema()"), {"table": table})
+    return result.scalars().all()
+
+# Create the partitions for this month and the next LOG_PARTITION_MONTHS_AHEAD.
+async def ensure_partitions(conn, today: date) -> list:
+    created = []
+    current = today.replace(day=1)
+    for table in PARTITIONED_TABLES:
+        existing = set(await _partitions(conn, table))
+        for ahead in range(LOG_PARTITION_MONTHS_AHEAD + 1):
+            month = add_months(current, ahead)
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(text(
+                        f'CREATE TABLE "{name}" PARTITION OF "{table}"'
+                        f" FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"))
+            except DBAPIError:
+                # Rows for that month are already sitting in the default partition.
+                logger.exception("Could not create partition %s", name)
+                continue
+            created.append(name)
+    return created
+
+# Detach partitions older than LOG_RETENTION_MONTHS, then archive or drop them.
+async def apply_retention(conn, today: date) -> list:
+    if LOG_RETENTION_MONTHS <= 0:
+        return []
+    cutoff = add_months(today.replace(day=1), -LOG_RETENTION_MONTHS)
+    retired = []
+    for table in PARTITIONED_TABLES:
+        for name in await _partitions(conn, table):
+            month = partition_month(name)
+            if month is None or add_months(month, 1) > cutoff:
+                continue
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if LOG_RETENTION_ACTION == "drop":
+                await conn.execute(text(f'DROP TABLE "{name}"'))
+            else:
+                await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{LOG_ARCHIVE_SCHEMA}"'))
+                await conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{LOG_ARCHIVE_SCHEMA}"'))
+            retired.append(name)
+    return retired
+
+async def maintain(today: date = None) -> dict:
+    today = today or date.today()
+    async with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            return {"created": [], "retired": []}
+        result = await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+        if not result.scalar():
+            return {"created": [], "retired": []}
+        summary = {"created": await ensure_partitions(conn, today), "retired": await apply_retention(conn, today)}
+    if summary["created"] or summary["retired"]:
+        logger.info("Log partitions created %s, retired %s", summary["created"], summary["retired"])
+    return summary
+
+async def watch():
+    if engine.dialect.name != "postgresql":
+        return
+    while True:
+        try:
+            await maintain()
+        except Exception:
+            logger.exception("Log partition maintenance failed")
+        await asyncio.sleep(LOG_PARTITION_CHECK_SECONDS)
@@ -0,0 +1,99 @@
+import asyncio
+import os
+from typing import Union
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+import bcrypt
+
+# bcrypt releases the GIL, so a thread pool already hashes on several cores.
+# Set PASSWORD_POOL_KIND=process to isolate the work in separate processes.
+PASSWORD_POOL_KIND = os.environ.get("PASSWORD_POOL_KIND", "thread")
+PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", os.cpu_count() or 1))
+# Requests allowed to wait for a free worker before new ones get a 503.
+PASSWORD_POOL_QUEUE_LIMIT = int(os.environ.get("PASSWORD_POOL_QUEUE_LIMIT", 64))
+
+# Hash a password using bcrypt.
+def hash_password(password):
+    pwd_bytes = password.encode('utf-8')
+    salt = bcrypt.gensalt()
+    hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
+    string_password = hashed_password.decode('utf-8')
+    return string_password
+
+# Check if the provided password matches the stored password (hashed)
+def verify_password(plain_password, hashed_password):
+    password_byte_enc = plain_password.encode('utf-8')
+    hashed_password = hashed_password.encode('utf-8')
+    return bcrypt.checkpw(password_byte_enc, hashed_password)
+
+def hash_passwords(passwords: list) -> list:
+    return [hash_password(password) for password in passwords]
+
+class PasswordPool:
+    def __init__(self, kind: str, workers: int, queue_limit: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor: Union[Executor, None] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password")
+        return self._executor
+
+    # Run fn in the pool, shedding load once every worker is busy and the
+    # wait queue is full instead of letting requests pile up behind bcrypt.
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    # Hash a batch in one chunk per worker, so a large import keeps every core
+    # busy while taking at most `workers` slots from interactive requests.
+    async def hash_many(self, passwords: list) -> list:
+        if not passwords:
+            return []
+        size = -(-len(passwords) // self.workers)
+        chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+        results = await asyncio.gather(*(self._run(hash_passwords, chunk) for chunk in chunks))
+        return [hashed for chunk in results for hashed in chunk]
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+pool = PasswordPool(PASSWORD_POOL_KIND, PASSWORD_POOL_WORKERS, PASSWORD_POOL_QUEUE_LIMIT)
@@ -0,0 +1,142 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Union
+from sqlalchemy import event, inspect
+from . import models
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get("PRINCIPAL_CACHE_MAX_ENTRIES", 10000))
+
+# Roles, from the user's rows: users.is_admin makes an admin, a nonpatients
+# row makes staff, and everyone else is a patient.
+PATIENT = "patient"
+STAFF = "staff"
+ADMIN = "admin"
+
+# The authenticated user as seen by request handlers. Only the columns needed
+# for authorization and /users/me are kept, so cached entries stay small and
+# are never tied to a session. facility_ids and patient_ids are what the user
+# may read (see authorization.py).
+class Principal:
+    __slots__ = (
+        "user_id",
+        "username",
+        "user_first_name",
+        "user_last_name",
+        "email",
+        "facility_id",
+        "is_active",
+        "role",
+        "facility_ids",
+        "patient_ids",
+    )
+
+    def __init__(self, user_id, username, user_first_name, user_last_name, email, facility_id, is_active,
+                 role: str = PATIENT, facility_ids: frozenset = frozenset(), patient_ids: frozenset = frozenset()):
+        self.user_id = user_id
+        self.username = username
+        self.user_first_name = user_first_name
+        self.user_last_name = user_last_name
+        self.email = email
+        self.facility_id = facility_id
+        self.is_active = is_active
+        self.role = role
+        self.facility_ids = facility_ids
+        self.patient_ids = patient_ids
+
+    @classmethod
+    def from_user(cls, user: models.User, role: str = PATIENT, facility_ids: frozenset = frozenset(),
+                  patient_ids: frozenset = frozenset()) -> "Principal":
+        return cls(
+            user.user_id,
+            user.username,
+            user.user_first_name,
+            user.user_last_name,
+            user.email,
+            user.facility_id,
+            user.is_active,
+            role,
+            facility_ids,
+            patient_ids,
+        )
+
+# LRU cache of principals keyed by token subject (the username), with a TTL
+# so changes made outside this process are picked up eventually.
+class PrincipalCache:
+    def __init__(self, ttl: float, max_entries: int, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+
+    def get(self, username: str) -> Union[Principal, None]:
+        entry = self._entries.get(username)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, principal = entry
+        if expires_at <= self._clock():
+            del self._entries[username]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return principal
+
+    def put(self, principal: Principal):
+        self._entries[principal.username] = (self._clock() + self.ttl, principal)
+        self._entries.move_to_end(principal.username)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        self._entries.pop(username, None)
+
+    # For changes that only know the user id. Scans the cache, which is fine
+    # for the assignment edits that call it.
+    def invalidate_user_id(self, user_id: int):
+        for username in [username for username, (_, principal) in self._entries.items()
+                         if principal.user_id == user_id]:
+            del self._entries[username]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+cache = PrincipalCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES)
+
+# Drop cached principals whenever a user row is updated (including being
+# disabled) or deleted through the ORM, under both the old and new username.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    cache.invalidate(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        cache.invalidate(old_username)
+
+# Drop a user's cached principal when their facility authorizations, patient
+# assignments or staff row change through the ORM, so their role and
+# permission sets are reloaded.
+def _invalidate_assignment(user_id_attribute: str):
+    def invalidate(mapper, connection, target):
+        cache.invalidate_user_id(getattr(target, user_id_attribute))
+        for old_user_id in inspect(target).attrs[user_id_attribute].history.deleted:
+            cache.invalidate_user_id(old_user_id)
+    return invalidate
+
+for _model, _user_id_attribute in ((models.UserAuthorizedFacility, "user_id"),
+                                   (models.PhysicianAssignedPatient, "staff_user_id"),
+                                   (models.Nonpatient, "user_id")):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _invalidate_assignment(_user_id_attribute))
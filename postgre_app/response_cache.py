@@ -0,0 +1,203 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Union
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from . import formats, models, principals
+
+# Rendered bytes kept across all entries; least recently used entries are
+# dropped beyond this. Larger single responses are not cached.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024 * 1024))
+# Entries are dropped on writes made in this process; this bounds how long a
+# write made by another process can go unnoticed.
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 30))
+
+class CachedResponse:
+    __slots__ = ("body", "media_type", "encoding", "etag", "last_modified", "expires_at", "tags")
+
+    def __init__(self, body: bytes, media_type: str, encoding: Union[str, None], etag: str, last_modified: str,
+                 expires_at: float, tags: tuple):
+        self.body = body
+        self.media_type = media_type
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.tags = tags
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Last-Modified": self.last_modified, "Cache-Control": "private, no-cache",
+                   **formats.headers(self.encoding)}
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or self.etag in (tag.strip() for tag in if_none_match.split(","))):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
+
+# Rendered bodies for read endpoints, keyed by path and query string, the
+# negotiated formats.Variant and the principal's permission sets, since scoped
+# queries return different rows to different principals. Bodies are stored
+# compressed as sent. The ETag is a digest of the body, so it
+# changes exactly when the rows it was rendered from do and is the same in
+# every worker. A hit (or a 304 for a matching If-None-Match) is answered
+# without touching the session. Entries are tagged with the rows they were
+# rendered from and dropped by the crud writes that change them.
+class ResponseCache:
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._clock = clock
+        self._bytes = 0
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self._tagged: dict[str, set] = {}
+
+    @staticmethod
+    def _key(request: Request, principal: principals.Principal, variant: formats.Variant) -> tuple:
+        return (request.url.path, request.url.query, variant.key,
+                principal.user_id, principal.facility_ids, principal.patient_ids)
+
+    # The cached response for this request, or None if it must be rendered.
+    def get(self, request: Request, principal: principals.Principal,
+            variant: formats.Variant = formats.PLAIN_JSON) -> Union[Response, None]:
+        key = self._key(request, principal, variant)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= self._clock():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._respond(entry, request)
+
+    # Compress and cache a rendered body (see loading.render and
+    # formats.render_columns) under the given tags and return the response.
+    def put(self, request: Request, principal: principals.Principal, body: bytes, tags: tuple,
+            variant: formats.Variant = formats.PLAIN_JSON) -> Response:
+        body, encoding = formats.compress(body, variant.encoding)
+        entry = CachedResponse(body, variant.media_type, encoding, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+                               formatdate(usegmt=True), self._clock() + self.ttl, tags)
+        if len(body) <= self.max_entry_bytes:
+            key = self._key(request, principal, variant)
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return self._respond(entry, request)
+
+    def _respond(self, entry: CachedResponse, request: Request) -> Response:
+        response = entry.response(request)
+        if response.status_code == 304:
+            self.not_modified += 1
+        return response
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def invalidate(self, *tags: str):
+        for tag in tags:
+            for key in list(self._tagged.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._tagged.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+        }
+
+cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES, RESPONSE_CACHE_TTL_SECONDS)
+
+# Tags for the rows behind cached responses. A user's entry nests their
+# assignments and recent logs, and every user list may include the user.
+USER_LISTS = "users"
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def medical_record_tag(medical_record_id: int) -> str:
+    return f"medical_record:{medical_record_id}"
+
+def invalidate_user(user_id: int):
+    cache.invalidate(USER_LISTS, user_tag(user_id))
+
+# Drop entries when the rows they were rendered from are written through the
+# ORM, which covers the crud functions. Tags are collected from the rows as
+# the session flushes and invalidated once it commits, or discarded if it
+# rolls back: invalidating at flush would let a read made before the commit
+# cache the old rows again. Core inserts (bulk user creation and the log
+# writer) call invalidate themselves after committing.
+def _collect(target, *tags: str):
+    object_session(target).info.setdefault("response_cache_tags", set()).update(tags)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    tags = session.info.pop("response_cache_tags", None)
+    if tags:
+        cache.invalidate(*tags)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("response_cache_tags", None)
+
+@event.listens_for(models.User, "after_insert")
+def _invalidate_user_lists(mapper, connection, target):
+    _collect(target, USER_LISTS)
+
+def _invalidate_users(user_id_attribute: str):
+    def invalidate(mapper, connection, target):
+        user_ids = [getattr(target, user_id_attribute), *inspect(target).attrs[user_id_attribute].history.deleted]
+        _collect(target, USER_LISTS, *(user_tag(user_id) for user_id in user_ids))
+    return invalidate
+
+for _model, _user_id_attribute, _events in (
+        (models.User, "user_id", ("after_update", "after_delete")),
+        (models.UserAuthorizedFacility, "user_id", ("after_insert", "after_update", "after_delete")),
+        (models.PhysicianAssignedPatient, "staff_user_id", ("after_insert", "after_update", "after_delete")),
+        (models.UserLoginLog, "user_id", ("after_insert", "after_update", "after_delete")),
+        (models.UserActivityLog, "user_id", ("after_insert", "after_update", "after_delete"))):
+    for _event in _events:
+        event.listen(_model, _event, _invalidate_users(_user_id_attribute))
+
+# Every chart section (and the medical record itself) carries medical_record_id.
+def _invalidate_medical_record(mapper, connection, target):
+    medical_record_ids = [target.medical_record_id, *inspect(target).attrs.medical_record_id.history.deleted]
+    _collect(target, *(medical_record_tag(medical_record_id) for medical_record_id in medical_record_ids))
+
+for _mapper in models.Base.registry.mappers:
+    if "medical_record_id" in _mapper.attrs:
+        for _event in ("after_insert", "after_update", "after_delete"):
+            event.listen(_mapper, _event, _invalidate_medical_record)
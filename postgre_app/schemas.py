@@ -1,6 +1,7 @@
-from typing import Union, List
-from pydantic import BaseModel
+from typing import Union
+from pydantic import BaseModel, Field, model_validator
 from datetime import date, datetime
+from .bmi import calculate_bmi
 
 class AdmissionBase(BaseModel):
     date_of_admission: datetime
@@ -271,12 +272,12 @@ class ReviewOfSystemsBase(BaseModel):
     review_of_systems_date: Union[datetime, None] = None
 
 class ReviewOfSystemsCreate(ReviewOfSystemsBase):
-    chief_complaints_id: int
+    chief_complaint_id: int
     medical_record_id: int
 
 class ReviewOfSystems(ReviewOfSystemsBase):
     review_of_systems_id: int
-    chief_complaints_id: int
+    chief_complaint_id: int
     medical_record_id: int
 
 class SocialHistoryBase(BaseModel):
@@ -395,11 +396,36 @@ class VitalCreate(VitalBase):
     chief_complaint_id: int
     medical_record_id: int
 
+    # BMI is derived from height (cm) and weight (kg) whenever both are given;
+    # a client-supplied value is only kept when it cannot be computed.
+    @model_validator(mode="after")
+    def compute_bmi(self):
+        bmi = calculate_bmi(self.vitals_height, self.vitals_weight)
+        if bmi is not None:
+            self.vitals_calculated_bmi = bmi
+        return self
+
 class Vital(VitalBase):
     vitals_id: int
     chief_complaint_id: int
     medical_record_id: int
 
+class EarlyWarningScore(BaseModel):
+    medical_record_id: int
+    user_id: int
+    vitals_id: int
+    vitals_date_taken: datetime
+    respiratory_rate_score: int
+    oxygen_saturation_score: int
+    systolic_blood_pressure_score: int
+    pulse_score: int
+    temperature_score: int
+    total_score: int
+    max_parameter_score: int
+    missing_parameters: int
+    risk_level: str
+    scored_at: datetime
+
 class ChiefComplaintBase(BaseModel):
     chief_complaint_statement: str
     chief_complaint_date: datetime
@@ -414,7 +440,7 @@ class ChiefComplaint(ChiefComplaintBase):
     surgical_related_problems: list[SurgicalRelatedProblem] = []
     vitals: list[Vital] = []
     treatments: list[Treatment] = []
-    review_of_systems: list[ReviewOfSystems] = []
+    reviews_of_systems: list[ReviewOfSystems] = []
     physical_exams: list[PhysicalExam] = []
     assessments: list[Assessment] = []
     plans: list[Plan] = []
@@ -437,7 +463,7 @@ class MedicalRecord(MedicalRecordBase):
     is_active: bool
 
     nurse_notes: list[NurseNote] = []
-    social_history: SocialHistory
+    social_history: Union[SocialHistory, None] = None
     appointments: list[Appointment] = []
     family_illnesses: list[FamilyIllness] = []
     medications: list[Medication] = []
@@ -489,19 +515,20 @@ class Patient(PatientBase):
     patient_race: str
     emergency_contacts: list[EmergencyContact] = []
 
+# Lengths match the users columns.
 class UserBase(BaseModel):
-    username: str
-    user_first_name: str
-    user_middle_initial: Union[str, None] = None
-    user_last_name: str
+    username: str = Field(max_length=75)
+    user_first_name: str = Field(max_length=35)
+    user_middle_initial: Union[str, None] = Field(None, max_length=1)
+    user_last_name: str = Field(max_length=50)
     user_date_of_birth: date
-    email: Union[str, None] = None
-    facility_id: str
-    user_street_address: Union[str, None] = None
-    user_city: Union[str, None] = None
-    user_state: Union[str, None] = None
-    user_country: Union[str, None] = None
-    user_phone_number: Union[List[str], None] = None
+    email: Union[str, None] = Field(None, max_length=254)
+    facility_id: str = Field(max_length=75)
+    user_street_address: Union[str, None] = Field(None, max_length=100)
+    user_city: Union[str, None] = Field(None, max_length=45)
+    user_state: Union[str, None] = Field(None, max_length=50)
+    user_country: Union[str, None] = Field(None, max_length=55)
+    user_phone_number: Union[str, None] = Field(None, max_length=15)
 
 class UserCreate(UserBase):
     hashed_password: str
@@ -517,4 +544,63 @@ class User(UserBase):
     user_activity_logs: list[UserActivityLog] = []
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class UserLookupCandidate(BaseModel):
+    user_id: int
+    username: str
+    user_first_name: str
+    user_last_name: str
+    user_date_of_birth: date
+    user_phone_number: Union[str, None] = None
+    facility_id: str
+    score: float
+    name_similarity: float
+    date_of_birth_match: bool
+    phone_match: float
+
+class BulkUserCreated(BaseModel):
+    index: int
+    user_id: int
+    username: str
+
+class BulkUserError(BaseModel):
+    index: int
+    username: Union[str, None] = None
+    detail: str
+
+class BulkUserReport(BaseModel):
+    created: list[BulkUserCreated] = []
+    errors: list[BulkUserError] = []
+    elapsed_seconds: float
+    users_per_second: float
+
+class UserPage(BaseModel):
+    items: list[User]
+    next_cursor: Union[str, None] = None
+
+class UserActivityLogPage(BaseModel):
+    items: list[UserActivityLog]
+    next_cursor: Union[str, None] = None
+
+class SearchHit(BaseModel):
+    source: str
+    source_id: int
+    medical_record_id: int
+    recorded_at: Union[datetime, None] = None
+    rank: float
+    snippet: str
+
+class SearchPage(BaseModel):
+    items: list[SearchHit]
+    next_cursor: Union[str, None] = None
+
+class Principal(BaseModel):
+    user_id: int
+    username: str
+    user_first_name: str
+    user_last_name: str
+    email: Union[str, None] = None
+    facility_id: str
+    is_active: bool
+    role: str
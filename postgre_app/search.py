@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Union
+from sqlalchemy import Engine, and_, cast, delete, event, func, literal, null, or_, select, tuple_, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# Postgres text search configuration (stemming and stop words) used for both
+# documents and queries. Run a rebuild after changing it.
+SEARCH_TEXT_CONFIG = os.environ.get("SEARCH_TEXT_CONFIG", "english")
+# ts_rank normalization: 1 divides by 1 + log(document length) so long notes
+# do not outrank short ones just by repeating a term.
+SEARCH_RANK_NORMALIZATION = 1
+SEARCH_HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=8"
+
+# Indexed free text: source name -> (model, key, text column, date column).
+# Assessments and plans carry no date of their own.
+SOURCES = {
+    "nurse_note": (models.NurseNote, models.NurseNote.nurse_note_id, models.NurseNote.nurse_note_text,
+                   models.NurseNote.nurse_note_date_posted),
+    "diagnosis": (models.Diagnosis, models.Diagnosis.diagnosis_id, models.Diagnosis.diagnosis_description,
+                  models.Diagnosis.diagnosis_date),
+    "chief_complaint": (models.ChiefComplaint, models.ChiefComplaint.chief_complaint_id,
+                        models.ChiefComplaint.chief_complaint_statement, models.ChiefComplaint.chief_complaint_date),
+    "assessment": (models.Assessment, models.Assessment.assessment_id, models.Assessment.assessments_summation, None),
+    "plan": (models.Plan, models.Plan.plan_id, models.Plan.plans_summation, None),
+}
+SOURCE_NAMES = {model: name for name, (model, _, _, _) in SOURCES.items()}
+
+def to_document(text):
+    return func.to_tsvector(cast(literal(SEARCH_TEXT_CONFIG), postgresql.REGCONFIG), func.coalesce(text, ""))
+
+def to_query(query_text: str):
+    return func.websearch_to_tsquery(cast(literal(SEARCH_TEXT_CONFIG), postgresql.REGCONFIG), query_text)
+
+# In-process fallback for databases without Postgres text search (tests on
+# SQLite). Same query syntax as websearch_to_tsquery minus stemming: terms are
+# ANDed, "or" separates alternatives and a leading "-" excludes a term. The
+# index lives in the process only and is loaded at startup (load_memory_index).
+STOP_WORDS = frozenset("a an and are as at be by for from has have he her his in is it of on she that the "
+                       "their they this to was were with".split())
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Union[str, None]) -> list[str]:
+    return [token for token in _TOKEN.findall((text or "").lower()) if token not in STOP_WORDS]
+
+def parse_query(query_text: str) -> list[tuple[list[str], list[str]]]:
+    clauses = []
+    for clause in re.split(r"\s+or\s+", query_text.lower()):
+        required, excluded = [], []
+        for word in clause.split():
+            (excluded if word.startswith("-") else required).extend(tokenize(word))
+        if required:
+            clauses.append((required, excluded))
+    return clauses
+
+def excerpt(text: str, terms: set, words: int = 20) -> str:
+    tokens = text.split()
+    matches = [n for n, token in enumerate(tokens) if set(tokenize(token)) & terms]
+    start = max(0, matches[0] - words // 4) if matches else 0
+    return " ".join(f"<b>{token}</b>" if n in matches else token
+                    for n, token in enumerate(tokens[start:start + words], start))
+
+class MemoryIndex:
+    def __init__(self):
+        self._postings: dict[str, dict[tuple, int]] = defaultdict(dict)
+        self._documents: dict[tuple, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, source: str, source_id: int, medical_record_id: int, recorded_at, text: Union[str, None]):
+        self.remove(source, source_id)
+        terms = tokenize(text)
+        for term in terms:
+            postings = self._postings[term]
+            postings[(source, source_id)] = postings.get((source, source_id), 0) + 1
+        self._documents[(source, source_id)] = (medical_record_id, recorded_at, text or "", len(terms))
+
+    def remove(self, source: str, source_id: int):
+        document = self._documents.pop((source, source_id), None)
+        if document is None:
+            return
+        for term in set(tokenize(document[2])):
+            postings = self._postings[term]
+            postings.pop((source, source_id), None)
+            if not postings:
+                del self._postings[term]
+
+    def remove_source(self, source: str):
+        for key in [key for key in self._documents if key[0] == source]:
+            self.remove(*key)
+
+    def clear(self):
+        self._postings.clear()
+        self._documents.clear()
+
+    # Hits ordered like the Postgres search: rank descending, then key.
+    def search(self, query_text: str, medical_record_ids: Union[set, None] = None,
+               sources: Union[list, None] = None, after: Union[tuple, None] = None, limit: int = 20) -> list[dict]:
+        total = len(self._documents)
+        ranks = {}
+        matched_terms = set()
+        for required, excluded in parse_query(query_text):
+            postings = [self._postings.get(term, {}) for term in required]
+            candidates = set.intersection(*(set(posting) for posting in postings))
+            for term in excluded:
+                candidates -= self._postings.get(term, {}).keys()
+            for key in candidates:
+                medical_record_id, _, _, length = self._documents[key]
+                if medical_record_ids is not None and medical_record_id not in medical_record_ids:
+                    continue
+                if sources is not None and key[0] not in sources:
+                    continue
+                rank = sum(posting[key] * math.log(1 + total / len(posting)) for posting in postings)
+                ranks[key] = max(ranks.get(key, 0.0), rank / (1 + math.log(1 + length)))
+            matched_terms.update(required)
+        ordered = sorted(ranks, key=lambda key: (-ranks[key], key))
+        if after is not None:
+            after_rank, *after_key = after
+            ordered = [key for key in ordered if (-ranks[key], key) > (-after_rank, tuple(after_key))]
+        hits = []
+        for key in ordered[:limit]:
+            medical_record_id, recorded_at, text, _ = self._documents[key]
+            hits.append({"source": key[0], "source_id": key[1], "medical_record_id": medical_record_id,
+                         "recorded_at": recorded_at, "rank": ranks[key], "snippet": excerpt(text, matched_terms)})
+        return hits
+
+memory_index = MemoryIndex()
+
+def source_document(name: str, target) -> tuple:
+    model, key, text, recorded_at = SOURCES[name]
+    return (name, getattr(target, key.key), target.medical_record_id,
+            getattr(target, recorded_at.key) if recorded_at is not None else None, getattr(target, text.key))
+
+def upsert_document(source: str, source_id: int, medical_record_id: int, recorded_at, text: Union[str, None]):
+    table = models.ClinicalTextIndex.__table__
+    statement = postgresql.insert(table).values(
+        source=source, source_id=source_id, medical_record_id=medical_record_id, recorded_at=recorded_at,
+        document=to_document(text))
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.source, table.c.source_id],
+        set_={name: statement.excluded[name] for name in ("medical_record_id", "recorded_at", "document")})
+
+# Keep the index current as source rows are written through the ORM. On
+# Postgres the document is written in the same transaction; otherwise the
+# change is applied to the in-process index once the transaction commits.
+_PENDING = "search_pending"
+
+def _index_row(mapper, connection, target):
+    document = source_document(SOURCE_NAMES[mapper.class_], target)
+    if connection.dialect.name == "postgresql":
+        connection.execute(upsert_document(*document))
+    else:
+        connection.info.setdefault(_PENDING, []).append((memory_index.add, document))
+
+def _unindex_row(mapper, connection, target):
+    name = SOURCE_NAMES[mapper.class_]
+    source_id = getattr(target, SOURCES[name][1].key)
+    if connection.dialect.name == "postgresql":
+        index = models.ClinicalTextIndex
+        connection.execute(delete(index).where(index.source == name, index.source_id == source_id))
+    else:
+        connection.info.setdefault(_PENDING, []).append((memory_index.remove, (name, source_id)))
+
+for _model in SOURCE_NAMES:
+    event.listen(_model, "after_insert", _index_row)
+    event.listen(_model, "after_update", _index_row)
+    event.listen(_model, "after_delete", _unindex_row)
+
+@event.listens_for(Engine, "commit")
+def _apply_pending(connection):
+    for change, arguments in connection.info.pop(_PENDING, ()):
+        change(*arguments)
+
+@event.listens_for(Engine, "rollback")
+def _discard_pending(connection):
+    connection.info.pop(_PENDING, None)
+
+def facility_records(facility_id: str):
+    return select(models.MedicalRecord.medical_record_id).join(
+        models.User, models.User.user_id == models.MedicalRecord.user_id).where(models.User.facility_id == facility_id)
+
+# Ranked hits for query_text within one medical record or one facility,
+# starting after the (rank, source, source_id) key of the previous page.
+async def search(db: AsyncSession, query_text: str, medical_record_id: Union[int, None] = None,
+                 facility_id: Union[str, None] = None, sources: Union[list, None] = None,
+                 after: Union[tuple, None] = None, limit: int = 20) -> list[dict]:
+    if db.get_bind().dialect.name != "postgresql":
+        medical_record_ids = None
+        if medical_record_id is not None:
+            medical_record_ids = {medical_record_id}
+        elif facility_id is not None:
+            medical_record_ids = set((await db.execute(facility_records(facility_id))).scalars())
+        return memory_index.search(query_text, medical_record_ids, sources, after, limit)
+
+    index = models.ClinicalTextIndex
+    tsquery = to_query(query_text)
+    rank = func.ts_rank(index.document, tsquery, SEARCH_RANK_NORMALIZATION)
+    query = select(index.source, index.source_id, index.medical_record_id, index.recorded_at, rank.label("rank")).where(
+        index.document.bool_op("@@")(tsquery))
+    if medical_record_id is not None:
+        query = query.where(index.medical_record_id == medical_record_id)
+    elif facility_id is not None:
+        query = query.where(index.medical_record_id.in_(facility_records(facility_id)))
+    if sources is not None:
+        query = query.where(index.source.in_(sources))
+    if after is not None:
+        after_rank, after_source, after_id = after
+        query = query.where(or_(rank < after_rank, and_(
+            rank == after_rank, tuple_(index.source, index.source_id) > tuple_(after_source, after_id))))
+    result = await db.execute(query.order_by(rank.desc(), index.source, index.source_id).limit(limit))
+    hits = [dict(row) for row in result.mappings()]
+    snippets = await headlines(db, query_text, hits)
+    for hit in hits:
+        hit["snippet"] = snippets.get((hit["source"], hit["source_id"]), "")
+    return hits
+
+# Highlighted fragments for a page of hits, read back from the source rows in
+# one query.
+async def headlines(db: AsyncSession, query_text: str, hits: list[dict]) -> dict:
+    by_source = defaultdict(list)
+    for hit in hits:
+        by_source[hit["source"]].append(hit["source_id"])
+    if not by_source:
+        return {}
+    selects = []
+    for name, source_ids in by_source.items():
+        _, key, text, _ = SOURCES[name]
+        snippet = func.ts_headline(cast(literal(SEARCH_TEXT_CONFIG), postgresql.REGCONFIG), text,
+                                   to_query(query_text), SEARCH_HEADLINE_OPTIONS)
+        selects.append(select(literal(name).label("source"), key.label("source_id"), snippet.label("snippet"))
+                       .where(key.in_(source_ids)))
+    result = await db.execute(selects[0] if len(selects) == 1 else union_all(*selects))
+    return {(source, source_id): snippet for source, source_id, snippet in result}
+
+# Re-index every row of the given sources from scratch, for data written with
+# Core statements (which bypass the ORM listeners) or after changing the text
+# search configuration.
+async def rebuild(db: AsyncSession, sources: Union[list, None] = None) -> dict:
+    counts = {}
+    postgres = db.get_bind().dialect.name == "postgresql"
+    index = models.ClinicalTextIndex
+    for name in sources or SOURCES:
+        model, key, text, recorded_at = SOURCES[name]
+        started = time.perf_counter()
+        if postgres:
+            await db.execute(delete(index).where(index.source == name))
+            result = await db.execute(postgresql.insert(index).from_select(
+                ["source", "source_id", "medical_record_id", "recorded_at", "document"],
+                select(literal(name), key, model.medical_record_id,
+                       recorded_at if recorded_at is not None else null(), to_document(text))))
+            indexed = result.rowcount
+        else:
+            memory_index.remove_source(name)
+            result = await db.execute(select(model))
+            indexed = 0
+            for row in result.scalars():
+                memory_index.add(*source_document(name, row))
+                indexed += 1
+        counts[name] = {"indexed": indexed, "seconds": round(time.perf_counter() - started, 3)}
+    await db.commit()
+    return counts
+
+# Fill the in-memory index from the source rows when the app starts; Postgres
+# keeps its index in the database. A failure is logged and leaves search
+# empty rather than stopping the app.
+async def load_memory_index():
+    if engine.dialect.name == "postgresql":
+        return
+    try:
+        async with SessionLocal() as db:
+            await rebuild(db)
+    except Exception:
+        logger.exception("Loading the in-memory search index failed")
+
+async def _main(args):
+    async with SessionLocal() as db:
+        report = await rebuild(db, args.source)
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the clinical text search index.")
+    parser.add_argument("--source", action="append", choices=list(SOURCES), help="only this source (repeatable)")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Union
+from fastapi import HTTPException, Request, status
+from sqlalchemy import Float, case, cast, delete, literal, update
+from sqlalchemy.dialects import postgresql, sqlite
+from . import models
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# Failed logins allowed per username and per client address within a sliding
+# window. 0 disables that limit.
+LOGIN_THROTTLE_WINDOW_SECONDS = float(os.environ.get("LOGIN_THROTTLE_WINDOW_SECONDS", 900))
+LOGIN_MAX_FAILURES_PER_USER = int(os.environ.get("LOGIN_MAX_FAILURES_PER_USER", 10))
+LOGIN_MAX_FAILURES_PER_CLIENT = int(os.environ.get("LOGIN_MAX_FAILURES_PER_CLIENT", 50))
+# Logins for one username from one client checked at the same time in this
+# process; further attempts get a 429 straight away. 0 disables the cap.
+LOGIN_MAX_CONCURRENT_PER_USER = int(os.environ.get("LOGIN_MAX_CONCURRENT_PER_USER", 2))
+# "memory" counts per process; "database" shares counts between processes
+# through the login_throttle_windows table.
+LOGIN_THROTTLE_BACKEND = os.environ.get("LOGIN_THROTTLE_BACKEND", "memory")
+# Keys kept by the memory backend; the least recently used are dropped beyond this.
+LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get("LOGIN_THROTTLE_MAX_KEYS", 100000))
+# Header holding the client address when running behind a proxy, such as
+# X-Forwarded-For. The last address in it (the one the proxy added) is used.
+# Required behind a proxy (see README.Docker.md): without it every client has
+# the proxy's address, and the per-client limit locks everyone out at once.
+LOGIN_THROTTLE_FORWARDED_HEADER = os.environ.get("LOGIN_THROTTLE_FORWARDED_HEADER", "")
+# Headers that show a request came through a proxy, for the warning above.
+PROXY_HEADERS = ("x-forwarded-for", "forwarded", "x-real-ip")
+
+USERNAME_MAX_LENGTH = models.User.username.type.length
+
+# Sliding window counters are approximated from the count in the current fixed
+# window plus the previous window's count, weighted by how much of it still
+# overlaps the sliding window. Two integers per key, whatever the traffic.
+def _window(now: float, window: float) -> tuple[int, float]:
+    index, offset = divmod(now, window)
+    return int(index), 1 - offset / window
+
+class MemoryBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._counts: OrderedDict[str, list] = OrderedDict()
+
+    def _rolled(self, key: str, index: int) -> list:
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [index, 0, 0]
+        elif counts[0] != index:
+            counts[:] = [index, 0, counts[1] if counts[0] == index - 1 else 0]
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_keys:
+            self._counts.popitem(last=False)
+        return counts
+
+    # Count an attempt and return the estimate including it, or None without
+    # counting if the key is already at its limit.
+    async def hit(self, key: str, limit: int, window: float, now: float) -> Union[float, None]:
+        index, weight = _window(now, window)
+        counts = self._rolled(key, index)
+        estimate = counts[2] * weight + counts[1]
+        if estimate >= limit:
+            return None
+        counts[1] += 1
+        return estimate + 1
+
+    async def undo(self, key: str, window: float, now: float):
+        counts = self._counts.get(key)
+        if counts is not None and counts[0] == _window(now, window)[0] and counts[1] > 0:
+            counts[1] -= 1
+
+    async def purge(self, window: float, now: float):
+        index, _ = _window(now, window)
+        for key in [key for key, counts in self._counts.items() if counts[0] < index - 1]:
+            del self._counts[key]
+
+# The same counters in a table, updated with one upsert per key so concurrent
+# attempts from any process are counted atomically.
+class DatabaseBackend:
+    async def hit(self, key: str, limit: int, window: float, now: float) -> Union[float, None]:
+        index, weight = _window(now, window)
+        table = models.LoginThrottleWindow.__table__
+        previous = case((table.c.window_index == index, table.c.previous_count),
+                        (table.c.window_index == index - 1, table.c.current_count), else_=0)
+        current = case((table.c.window_index == index, table.c.current_count), else_=0)
+        weight = cast(literal(weight), Float)
+        async with engine.begin() as conn:
+            insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}[conn.dialect.name]
+            statement = insert(table).values(throttle_key=key, window_index=index, current_count=1, previous_count=0)
+            result = await conn.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.throttle_key],
+                set_={"window_index": index, "current_count": current + 1, "previous_count": previous},
+                where=previous * weight + current < limit,
+            ).returning(table.c.previous_count * weight + table.c.current_count))
+            return result.scalar()
+
+    async def undo(self, key: str, window: float, now: float):
+        table = models.LoginThrottleWindow.__table__
+        async with engine.begin() as conn:
+            await conn.execute(update(table).where(
+                table.c.throttle_key == key, table.c.window_index == _window(now, window)[0], table.c.current_count > 0,
+            ).values(current_count=table.c.current_count - 1))
+
+    async def purge(self, window: float, now: float):
+        table = models.LoginThrottleWindow.__table__
+        async with engine.begin() as conn:
+            await conn.execute(delete(table).where(table.c.window_index < _window(now, window)[0] - 1))
+
+# Limits failed logins per username and per client. Every attempt is counted
+# before the password is checked and uncounted unless it fails, so a burst of
+# concurrent guesses is cut off at the limit too, and attempts over it are
+# rejected without a database lookup or any bcrypt work. Each client may also
+# have only a few passwords being checked at once per username in this
+# process, so one client cannot queue up the password pool with guesses at
+# one account ahead of everyone else.
+class LoginThrottle:
+    def __init__(self, backend, window: float, max_user_failures: int, max_client_failures: int,
+                 max_concurrent_per_user: int, clock=time.time):
+        self.backend = backend
+        self.window = window
+        self.max_user_failures = max_user_failures
+        self.max_client_failures = max_client_failures
+        self.max_concurrent_per_user = max_concurrent_per_user
+        self.rejected = 0
+        self.lockouts = 0
+        self._clock = clock
+        self._in_flight: Counter[str] = Counter()
+
+    def attempt(self, username: str, client: str) -> "LoginAttempt":
+        return LoginAttempt(self, username, client)
+
+    def _limits(self, username: str, client: str) -> list[tuple[str, int]]:
+        limits = [(f"user:{username[:USERNAME_MAX_LENGTH]}", self.max_user_failures), (f"client:{client}", self.max_client_failures)]
+        return [(key, limit) for key, limit in limits if limit > 0]
+
+    def _reject(self, retry_after: float):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                await self.backend.purge(self.window, self._clock())
+            except Exception:
+                logger.exception("Login throttle purge failed")
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "window_seconds": self.window,
+            "max_user_failures": self.max_user_failures,
+            "max_client_failures": self.max_client_failures,
+            "max_concurrent_per_user": self.max_concurrent_per_user,
+            "in_flight": sum(self._in_flight.values()),
+            "rejected": self.rejected,
+            "lockouts": self.lockouts,
+        }
+
+# One login attempt, counted on entry (or rejected with a 429) and uncounted
+# on exit unless failed() was called.
+class LoginAttempt:
+    def __init__(self, throttle: LoginThrottle, username: str, client: str):
+        self.throttle = throttle
+        self.username = username
+        self.client = client
+        self.in_flight_key = f"{client}|{username[:USERNAME_MAX_LENGTH]}"
+        self.keys = []
+        self.locks_user = False
+        self._failed = False
+
+    async def __aenter__(self) -> "LoginAttempt":
+        throttle = self.throttle
+        if 0 < throttle.max_concurrent_per_user <= throttle._in_flight[self.in_flight_key]:
+            throttle._reject(1)
+        self.started_at = now = throttle._clock()
+        throttle._in_flight[self.in_flight_key] += 1
+        try:
+            for key, limit in throttle._limits(self.username, self.client):
+                estimate = await throttle.backend.hit(key, limit, throttle.window, now)
+                if estimate is None:
+                    throttle._reject(throttle.window - now % throttle.window)
+                self.keys.append(key)
+                self.locks_user |= key.startswith("user:") and estimate >= limit
+        except BaseException:
+            await self._release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._release()
+
+    async def _release(self):
+        throttle = self.throttle
+        throttle._in_flight[self.in_flight_key] -= 1
+        if not throttle._in_flight[self.in_flight_key]:
+            del throttle._in_flight[self.in_flight_key]
+        if not self._failed:
+            for key in self.keys:
+                await throttle.backend.undo(key, throttle.window, self.started_at)
+
+    # Keep the attempt counted. Returns whether it used up the username's last
+    # allowed failure, so the caller can record the lockout.
+    def failed(self) -> bool:
+        self._failed = True
+        if self.locks_user:
+            self.throttle.lockouts += 1
+        return self.locks_user
+
+_proxy_warned = False
+
+def client_address(request: Request) -> str:
+    global _proxy_warned
+    if LOGIN_THROTTLE_FORWARDED_HEADER:
+        forwarded = request.headers.get(LOGIN_THROTTLE_FORWARDED_HEADER)
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    elif not _proxy_warned and any(header in request.headers for header in PROXY_HEADERS):
+        _proxy_warned = True
+        logger.warning("Logins arrive through a proxy but LOGIN_THROTTLE_FORWARDED_HEADER is not set; "
+                       "the login throttle sees every client as the proxy")
+    return request.client.host if request.client else "unknown"
+
+def _backend(kind: str):
+    if kind == "memory":
+        return MemoryBackend(LOGIN_THROTTLE_MAX_KEYS)
+    if kind == "database":
+        return DatabaseBackend()
+    raise ValueError(f"Unknown login throttle backend: {kind}")
+
+logins = LoginThrottle(_backend(LOGIN_THROTTLE_BACKEND), LOGIN_THROTTLE_WINDOW_SECONDS,
+                       LOGIN_MAX_FAILURES_PER_USER, LOGIN_MAX_FAILURES_PER_CLIENT, LOGIN_MAX_CONCURRENT_PER_USER)
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Union
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+# How often each process picks up access tokens revoked by other processes.
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get("TOKEN_REVOCATION_SYNC_SECONDS", 5))
+# How often expired refresh tokens and revocations are deleted.
+TOKEN_PURGE_SECONDS = float(os.environ.get("TOKEN_PURGE_SECONDS", 3600))
+
+def new_jti() -> str:
+    return secrets.token_hex(16)
+
+# Refresh tokens are 256 random bits, so unlike passwords they need no slow
+# hash: a SHA-256 digest cannot be reversed either, and checking one costs
+# microseconds instead of a bcrypt round.
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Add a refresh token for the access token just issued to user_id and return
+# it. A new family is started unless the token replaces one being rotated.
+# The caller commits.
+def add_refresh_token(db: AsyncSession, user_id: int, access_token_jti: str, access_token_expires_at: datetime,
+                      family_id: Union[str, None] = None) -> str:
+    token = secrets.token_urlsafe(32)
+    now = datetime.now()
+    db.add(models.RefreshToken(
+        user_id=user_id,
+        family_id=family_id or secrets.token_hex(16),
+        token_hash=hash_refresh_token(token),
+        access_token_jti=access_token_jti,
+        access_token_expires_at=access_token_expires_at,
+        created_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+# Mark a refresh token used and return its user and family, or None if the
+# token is unknown, expired, revoked or belongs to an inactive user. A token
+# that was already used means it leaked (or a client replayed it), so its
+# whole family is revoked. The row is locked until the caller commits, so
+# concurrent refreshes with one token cannot both succeed.
+async def use_refresh_token(db: AsyncSession, token: str) -> Union[tuple[models.User, str], None]:
+    refresh_token, user = models.RefreshToken, models.User
+    result = await db.execute(
+        select(refresh_token, user).join(user, user.user_id == refresh_token.user_id)
+        .where(refresh_token.token_hash == hash_refresh_token(token))
+        .with_for_update(of=refresh_token))
+    row = result.first()
+    if row is None:
+        return None
+    stored, owner = row
+    now = datetime.now()
+    if stored.revoked_at is not None:
+        return None
+    if stored.used_at is not None:
+        logger.warning("Refresh token reused for user %s, revoking its family", owner.user_id)
+        await revoke_family(db, stored.family_id)
+        await db.commit()
+        return None
+    if stored.expires_at <= now or not owner.is_active:
+        return None
+    stored.used_at = now
+    return owner, stored.family_id
+
+# Revoke every refresh token of a family and the access tokens issued with
+# them that have not expired yet. The caller commits.
+async def revoke_family(db: AsyncSession, family_id: str):
+    refresh_token = models.RefreshToken
+    now = datetime.now()
+    result = await db.execute(
+        select(refresh_token.access_token_jti, refresh_token.user_id, refresh_token.access_token_expires_at)
+        .where(refresh_token.family_id == family_id, refresh_token.access_token_expires_at > now))
+    await revoke_access_tokens(db, result.all())
+    await db.execute(update(refresh_token).where(refresh_token.family_id == family_id, refresh_token.revoked_at.is_(None))
+                     .values(revoked_at=now))
+
+async def revoke_refresh_token(db: AsyncSession, token: str, user_id: int) -> bool:
+    result = await db.execute(select(models.RefreshToken.family_id).where(
+        models.RefreshToken.token_hash == hash_refresh_token(token), models.RefreshToken.user_id == user_id))
+    family_id = result.scalar()
+    if family_id is None:
+        return False
+    await revoke_family(db, family_id)
+    return True
+
+# Record (jti, user_id, expires_at) tuples as revoked and reject them in this
+# process straight away; other processes pick them up on their next sync.
+# The caller commits.
+async def revoke_access_tokens(db: AsyncSession, tokens: list):
+    if not tokens:
+        return
+    now = datetime.now()
+    insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}[db.get_bind().dialect.name]
+    await db.execute(insert(models.RevokedAccessToken).on_conflict_do_nothing(), [
+        {"jti": jti, "user_id": user_id, "revoked_at": now, "expires_at": expires_at}
+        for jti, user_id, expires_at in tokens])
+    revocations.add({jti: expires_at for jti, _, expires_at in tokens})
+
+# In-memory copy of the unexpired revoked access tokens, checked on every
+# authenticated request with one dict lookup. Access tokens are short lived,
+# so the copy stays small and is reloaded whole on each sync instead of
+# tracking what changed.
+class RevocationList:
+    def __init__(self, sync_interval: float, purge_interval: float):
+        self.sync_interval = sync_interval
+        self.purge_interval = purge_interval
+        self.syncs = 0
+        self.sync_failures = 0
+        self.last_synced_at: Union[datetime, None] = None
+        self._expires: dict[str, datetime] = {}
+
+    def is_revoked(self, jti: Union[str, None]) -> bool:
+        return jti in self._expires
+
+    def add(self, expires: dict):
+        self._expires.update(expires)
+
+    # Merged rather than replaced, so a revocation added here while the query
+    # ran is not dropped until the next sync.
+    async def sync(self):
+        now = datetime.now()
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(models.RevokedAccessToken.jti, models.RevokedAccessToken.expires_at)
+                .where(models.RevokedAccessToken.expires_at > now))
+            loaded = dict(result.all())
+        self._expires = {jti: expires_at for jti, expires_at in {**self._expires, **loaded}.items() if expires_at > now}
+        self.syncs += 1
+        self.last_synced_at = now
+
+    async def purge(self):
+        now = datetime.now()
+        async with engine.begin() as conn:
+            await conn.execute(delete(models.RevokedAccessToken).where(models.RevokedAccessToken.expires_at <= now))
+            await conn.execute(delete(models.RefreshToken).where(models.RefreshToken.expires_at <= now))
+
+    async def watch(self):
+        purged_at = None
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await self.sync()
+                if purged_at is None or loop.time() - purged_at >= self.purge_interval:
+                    await self.purge()
+                    purged_at = loop.time()
+            except Exception:
+                self.sync_failures += 1
+                logger.exception("Token revocation sync failed")
+            await asyncio.sleep(self.sync_interval)
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._expires),
+            "syncs": self.syncs,
+            "sync_failures": self.sync_failures,
+            "last_synced_at": self.last_synced_at,
+        }
+
+revocations = RevocationList(TOKEN_REVOCATION_SYNC_SECONDS, TOKEN_PURGE_SECONDS)
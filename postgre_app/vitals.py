@@ -0,0 +1,158 @@
+import io
+import os
+from datetime import datetime
+from typing import Union
+import numpy as np
+import orjson
+from sqlalchemy import Double, cast, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+# Points returned by /medical_records/{id}/vitals/series unless asked otherwise,
+# and the most a client may ask for.
+VITALS_SERIES_DEFAULT_POINTS = int(os.environ.get("VITALS_SERIES_DEFAULT_POINTS", 300))
+VITALS_SERIES_MAX_POINTS = int(os.environ.get("VITALS_SERIES_MAX_POINTS", 5000))
+
+# Measurements that can be charted, in table order.
+SERIES_COLUMNS = {
+    column.name: column for column in models.Vital.__table__.columns if isinstance(column.type, Double)
+}
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "npz": "application/octet-stream",
+}
+
+def _window(query, medical_record_id: int, since, until):
+    taken = models.Vital.vitals_date_taken
+    query = query.where(models.Vital.medical_record_id == medical_record_id, taken.is_not(None))
+    if since is not None:
+        query = query.where(taken >= since)
+    if until is not None:
+        query = query.where(taken < until)
+    return query
+
+# Read the readings of a record taken in [since, until) into a vector of epoch
+# milliseconds and one float64 vector per field, with NaN where a reading
+# left the field empty. On Postgres each column comes back as a single array,
+# which the driver decodes far faster than one row object per reading.
+async def load_series(
+    db: AsyncSession, medical_record_id: int, fields: list,
+    since: Union[datetime, None] = None, until: Union[datetime, None] = None,
+):
+    taken = models.Vital.vitals_date_taken
+    columns = [SERIES_COLUMNS[field] for field in fields]
+    if db.get_bind().dialect.name == "postgresql":
+        epoch_ms = cast(func.extract("epoch", taken) * 1000, Double)
+        query = select(*(func.array_agg(aggregate_order_by(column, taken)) for column in [epoch_ms, *columns]))
+        result = await db.execute(_window(query, medical_record_id, since, until))
+        epochs, *measurements = result.one()
+        if epochs is None:
+            epochs, measurements = [], [[] for _ in fields]
+        times = np.rint(np.array(epochs, dtype=np.float64)).astype(np.int64)
+    else:
+        result = await db.execute(_window(select(taken, *columns), medical_record_id, since, until).order_by(taken))
+        taken_at, *measurements = list(zip(*result.all())) or [[] for _ in range(len(fields) + 1)]
+        times = np.array(taken_at, dtype="datetime64[ms]").astype(np.int64)
+    return times, {field: np.array(values, dtype=np.float64) for field, values in zip(fields, measurements)}
+
+# Split the window into `points` equal-width time buckets and reduce each field
+# to its min, max and mean per bucket. Buckets with no readings at all are left
+# out; a bucket where only some fields were measured has NaN for the others.
+def bucket_series(times, values: dict, points: int) -> dict:
+    if not len(times):
+        return {"method": "buckets", "bucket_ms": 0, "t": times, "series": {
+            field: {"min": series, "max": series, "mean": series} for field, series in values.items()}}
+    start = times[0]
+    width = max(-(-(int(times[-1]) + 1 - int(start)) // points), 1)
+    index = (times - start) // width
+    occupied = np.unique(index)
+    series = {}
+    for field, column in values.items():
+        measured = ~np.isnan(column)
+        column_index, column = index[measured], column[measured]
+        stats = {name: np.full(len(occupied), np.nan) for name in ("min", "max", "mean")}
+        if len(column):
+            starts = np.flatnonzero(np.r_[True, column_index[1:] != column_index[:-1]])
+            slots = np.searchsorted(occupied, column_index[starts])
+            stats["min"][slots] = np.minimum.reduceat(column, starts)
+            stats["max"][slots] = np.maximum.reduceat(column, starts)
+            stats["mean"][slots] = np.add.reduceat(column, starts) / np.diff(np.r_[starts, len(column)])
+        series[field] = stats
+    return {"method": "buckets", "bucket_ms": width, "t": start + occupied * width, "series": series}
+
+# Largest-Triangle-Three-Buckets: keep the first and last reading and, from each
+# bucket in between, the one forming the largest triangle with the point kept
+# before it and the average of the next bucket. Preserves peaks and troughs that
+# averaging would flatten.
+def lttb(times, column, points: int):
+    count = len(times)
+    if points >= count or points < 3:
+        return times, column
+    x = times.astype(np.float64)
+    edges = np.floor(np.arange(points - 1) * ((count - 2) / (points - 2))).astype(np.int64) + 1
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[high:edges[bucket + 2]].mean()
+            next_y = column[high:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], column[-1]
+        area = np.abs((x[previous] - next_x) * (column[low:high] - column[previous])
+                      - (x[previous] - x[low:high]) * (next_y - column[previous]))
+        previous = low + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return times[kept], column[kept]
+
+# LTTB applied to each field on its own readings, so every field has its own
+# time vector.
+def lttb_series(times, values: dict, points: int) -> dict:
+    series = {}
+    for field, column in values.items():
+        measured = ~np.isnan(column)
+        field_times, field_values = lttb(times[measured], column[measured], points)
+        series[field] = {"t": field_times, "v": field_values}
+    return {"method": "lttb", "series": series}
+
+DOWNSAMPLERS = {
+    "buckets": bucket_series,
+    "lttb": lttb_series,
+}
+
+async def get_series(
+    db: AsyncSession, medical_record_id: int, fields: list, method: str, points: int,
+    since: Union[datetime, None] = None, until: Union[datetime, None] = None,
+):
+    times, values = await load_series(db, medical_record_id, fields, since, until)
+    if not len(times):
+        result = await db.execute(
+            select(models.MedicalRecord.medical_record_id)
+            .where(models.MedicalRecord.medical_record_id == medical_record_id))
+        if result.scalar() is None:
+            return None
+    return {"medical_record_id": medical_record_id, "readings": len(times),
+            **DOWNSAMPLERS[method](times, values, points)}
+
+# Columnar JSON: one array per column, epoch milliseconds for times and null
+# for missing values.
+def render_json(payload: dict) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+# The same columns as a NumPy .npz archive, keyed "t" or "<field>.<stat>".
+def render_npz(payload: dict) -> bytes:
+    arrays = {"t": payload["t"]} if "t" in payload else {}
+    for field, columns in payload["series"].items():
+        for name, column in columns.items():
+            arrays[f"{field}.{name}"] = column
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+RENDERERS = {
+    "json": render_json,
+    "npz": render_npz,
+}